@@ -22,6 +22,12 @@ contract OwnershipRegistrationContract {
     // 新增：所有者到数据哈希的映射，便于查询
     mapping(address => mapping(bytes32 => bool)) public ownerToDataHashes;
 
+    // Incremented whenever the owner of a dataId changes, invalidating the rights checkpoints on it
+    mapping(bytes32 => uint256) public rightsEpoch;
+
+    // keccak256(abi.encode(metadata, watermarkFeatures)) of records registered in event-only mode
+    mapping(bytes32 => bytes32) public metadataCommitments;
+
     event DataRegistered(
         bytes32 indexed dataId,
         address indexed owner,
@@ -36,11 +42,45 @@ contract OwnershipRegistrationContract {
         address indexed to
     );
 
+    // Carries the watermark features of an event-only record; the metadata is in DataRegistered
+    event DataMetadataCommitted(
+        bytes32 indexed dataId,
+        string watermarkFeatures
+    );
+
     function registerDataResource(
         bytes32 _dataHash,
         string memory _metadata,
         string memory _watermarkFeatures
     ) external returns (bytes32) {
+        bytes32 dataId = _registerDataResource(_dataHash, _metadata);
+
+        DataResource storage resource = dataResources[dataId];
+        resource.metadata = _metadata;
+        resource.watermarkFeatures = _watermarkFeatures;
+
+        return dataId;
+    }
+
+    // Event-only mode: stores a commitment to the strings, which are only kept in the logs.
+    // getDataResource returns empty metadata and watermarkFeatures for these records.
+    function registerDataResourceCommitted(
+        bytes32 _dataHash,
+        string memory _metadata,
+        string memory _watermarkFeatures
+    ) external returns (bytes32) {
+        bytes32 dataId = _registerDataResource(_dataHash, _metadata);
+
+        metadataCommitments[dataId] = keccak256(abi.encode(_metadata, _watermarkFeatures));
+        emit DataMetadataCommitted(dataId, _watermarkFeatures);
+
+        return dataId;
+    }
+
+    function _registerDataResource(bytes32 _dataHash, string memory _metadata)
+        internal
+        returns (bytes32)
+    {
         require(_dataHash != bytes32(0), "Invalid data hash");
         require(hashToDataId[_dataHash] == bytes32(0), "Data already registered");
 
@@ -48,17 +88,13 @@ contract OwnershipRegistrationContract {
             abi.encodePacked(_dataHash, _metadata, block.timestamp, msg.sender)
         );
 
-        DataResource memory newResource = DataResource({
-            dataHash: _dataHash,
-            metadata: _metadata,
-            watermarkFeatures: _watermarkFeatures,
-            owner: msg.sender,
-            registrationTime: block.timestamp,
-            dataId: dataId,
-            isRegistered: true
-        });
-
-        dataResources[dataId] = newResource;
+        DataResource storage resource = dataResources[dataId];
+        resource.dataHash = _dataHash;
+        resource.owner = msg.sender;
+        resource.registrationTime = block.timestamp;
+        resource.dataId = dataId;
+        resource.isRegistered = true;
+
         hashToDataId[_dataHash] = dataId;
         dataIdToHash[dataId] = _dataHash; // 新增反向映射
         ownerToDataHashes[msg.sender][_dataHash] = true; // 新增所有者映射
@@ -107,6 +143,23 @@ contract OwnershipRegistrationContract {
         return hashes;
     }
 
+    // Bounded read of the dataIds registered by an owner
+    function getOwnerDataIdsPage(address _owner, uint256 _offset, uint256 _limit)
+        external
+        view
+        returns (bytes32[] memory page, uint256 total)
+    {
+        bytes32[] storage dataIds = ownerDataIds[_owner];
+        total = dataIds.length;
+        uint256 start = _offset < total ? _offset : total;
+        uint256 end = _limit < total - start ? start + _limit : total;
+
+        page = new bytes32[](end - start);
+        for (uint256 i = start; i < end; i++) {
+            page[i - start] = dataIds[i];
+        }
+    }
+
     // 保持原有函数不变
     function verifyOwnershipByHash(bytes32 _dataHash, address _checkAddress)
         external
@@ -131,6 +184,7 @@ contract OwnershipRegistrationContract {
         ownerToDataHashes[_newOwner][dataHash] = true;
         
         dataResources[_dataId].owner = _newOwner;
+        rightsEpoch[_dataId]++;
         emit OwnershipTransferred(_dataId, msg.sender, _newOwner);
     }
 
@@ -23,6 +23,12 @@ contract ProcessingRightGrantingContract {
     mapping(bytes32 => bytes32[]) public dataAuthorizations;
     mapping(address => bytes32[]) public granteeAuthorizations;
     
+    // Incremented whenever a grant on a dataId is revoked before expiry, invalidating the rights checkpoints on it
+    mapping(bytes32 => uint256) public rightsEpoch;
+    
+    // keccak256(abi.encode(purpose, scope, constraints)) of grants made in event-only mode
+    mapping(bytes32 => bytes32) public authorizationCommitments;
+    
     event AuthorizationGranted(
         bytes32 indexed authId,
         bytes32 indexed dataId,
@@ -38,6 +44,13 @@ contract ProcessingRightGrantingContract {
         address indexed grantor
     );
     
+    // Carries the scope and constraints of an event-only grant; the purpose is in AuthorizationGranted
+    event AuthorizationTermsCommitted(
+        bytes32 indexed authId,
+        string scope,
+        string constraints
+    );
+    
     constructor(address _ownershipContractAddress) {
         ownershipContract = OwnershipRegistrationContract(_ownershipContractAddress);
     }
@@ -50,6 +63,40 @@ contract ProcessingRightGrantingContract {
         string memory _scope,
         string memory _constraints
     ) external returns (bytes32) {
+        bytes32 authId = _grantProcessingRight(_dataId, _grantee, _duration, _purpose);
+        
+        Authorization storage auth = authorizations[authId];
+        auth.purpose = _purpose;
+        auth.scope = _scope;
+        auth.constraints = _constraints;
+        
+        return authId;
+    }
+    
+    // Event-only mode: stores a commitment to the terms, which are only kept in the logs.
+    // authorizations() returns empty purpose, scope and constraints for these grants.
+    function grantProcessingRightCommitted(
+        bytes32 _dataId,
+        address _grantee,
+        uint256 _duration,
+        string memory _purpose,
+        string memory _scope,
+        string memory _constraints
+    ) external returns (bytes32) {
+        bytes32 authId = _grantProcessingRight(_dataId, _grantee, _duration, _purpose);
+        
+        authorizationCommitments[authId] = keccak256(abi.encode(_purpose, _scope, _constraints));
+        emit AuthorizationTermsCommitted(authId, _scope, _constraints);
+        
+        return authId;
+    }
+    
+    function _grantProcessingRight(
+        bytes32 _dataId,
+        address _grantee,
+        uint256 _duration,
+        string memory _purpose
+    ) internal returns (bytes32) {
         require(
             ownershipContract.verifyOwnership(_dataId, msg.sender),
             "Not data owner"
@@ -61,20 +108,15 @@ contract ProcessingRightGrantingContract {
             abi.encodePacked(_dataId, _grantee, block.timestamp, msg.sender)
         );
         
-        Authorization memory newAuth = Authorization({
-            authId: authId,
-            dataId: _dataId,
-            grantor: msg.sender,
-            grantee: _grantee,
-            grantTime: block.timestamp,
-            expirationTime: block.timestamp + _duration,
-            purpose: _purpose,
-            scope: _scope,
-            constraints: _constraints,
-            isValid: true
-        });
-        
-        authorizations[authId] = newAuth;
+        Authorization storage auth = authorizations[authId];
+        auth.authId = authId;
+        auth.dataId = _dataId;
+        auth.grantor = msg.sender;
+        auth.grantee = _grantee;
+        auth.grantTime = block.timestamp;
+        auth.expirationTime = block.timestamp + _duration;
+        auth.isValid = true;
+        
         dataAuthorizations[_dataId].push(authId);
         granteeAuthorizations[_grantee].push(authId);
         
@@ -84,7 +126,7 @@ contract ProcessingRightGrantingContract {
             msg.sender,
             _grantee,
             _purpose,
-            newAuth.expirationTime
+            auth.expirationTime
         );
         
         return authId;
@@ -98,6 +140,7 @@ contract ProcessingRightGrantingContract {
         );
         
         authorizations[_authId].isValid = false;
+        rightsEpoch[authorizations[_authId].dataId]++;
         
         emit AuthorizationRevoked(
             _authId,
@@ -123,6 +166,24 @@ contract ProcessingRightGrantingContract {
         return false;
     }
     
+    // Latest expiration time of the grantee's active authorizations on the data, 0 if none
+    function authorizationExpiry(
+        bytes32 _dataId,
+        address _grantee
+    ) external view returns (uint256 expiry) {
+        bytes32[] storage auths = dataAuthorizations[_dataId];
+        
+        for (uint i = 0; i < auths.length; i++) {
+            Authorization storage auth = authorizations[auths[i]];
+            if (auth.grantee == _grantee && 
+                auth.isValid && 
+                auth.expirationTime > block.timestamp &&
+                auth.expirationTime > expiry) {
+                expiry = auth.expirationTime;
+            }
+        }
+    }
+    
     function getActiveAuthorizations(bytes32 _dataId)
         external
         view
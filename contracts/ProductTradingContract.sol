@@ -26,6 +26,22 @@ contract ProductTradingContract {
         uint256 transactionTime;
     }
     
+    // Rights of a product's creator to its original data, verified under the
+    // rights epochs of that dataId in both contracts and valid until validUntil
+    struct RightsCheckpoint {
+        uint64 ownershipEpoch;
+        uint64 authEpoch;
+        uint64 validUntil;
+    }
+    
+    // Rights epochs of the dataId last looked up while validating one rights chain
+    struct EpochCache {
+        bytes32 dataId;
+        uint64 ownershipEpoch;
+        uint64 authEpoch;
+        bool loaded;
+    }
+    
     OwnershipRegistrationContract public ownershipContract;
     ProcessingRightGrantingContract public authContract;
     
@@ -33,6 +49,22 @@ contract ProductTradingContract {
     mapping(bytes32 => Transaction) public transactions;
     mapping(address => bytes32[]) public userTransactions;
     
+    // Indexes behind the paginated reads: sales per product, products per current owner
+    mapping(bytes32 => bytes32[]) public productTransactions;
+    mapping(address => bytes32[]) private userProductIds;
+    // Position + 1 of a product in its owner's userProductIds list, 0 if absent
+    mapping(bytes32 => uint256) private userProductPosition;
+    
+    // Written by purchaseProductCheckpointed only; purchaseProduct always runs the full validation
+    mapping(bytes32 => RightsCheckpoint) public rightsCheckpoints;
+    
+    // Sale proceeds credited by purchaseProductDeferred, paid out by withdrawProceeds or settleProceeds
+    mapping(address => uint256) public pendingProceeds;
+    
+    // Gas forwarded to each seller by settleProceeds: enough for contract wallets that log or
+    // store incoming payments, bounded so one seller cannot use up the whole batch
+    uint256 public constant SETTLE_PAYOUT_GAS = 50000;
+    
     event ProductCreated(
         bytes32 indexed productId,
         bytes32 indexed originalDataId,
@@ -55,6 +87,11 @@ contract ProductTradingContract {
         bytes32 transactionId
     );
     
+    event ProceedsWithdrawn(
+        address indexed seller,
+        uint256 amount
+    );
+    
     constructor(address _ownershipContract, address _authContract) {
         ownershipContract = OwnershipRegistrationContract(_ownershipContract);
         authContract = ProcessingRightGrantingContract(_authContract);
@@ -88,6 +125,7 @@ contract ProductTradingContract {
         });
         
         dataProducts[productId] = newProduct;
+        _addUserProduct(msg.sender, productId);
         
         emit ProductCreated(
             productId,
@@ -111,6 +149,71 @@ contract ProductTradingContract {
     }
     
     function purchaseProduct(bytes32 _productId) external payable {
+        address payable seller = _transferProduct(_productId, false);
+        bytes32 txId = _recordTransaction(_productId, seller);
+        
+        // Transfer funds
+        seller.transfer(msg.value);
+        
+        emit ProductSold(_productId, seller, msg.sender, msg.value, txId);
+    }
+    
+    // Same sale, but links whose rights checkpoint is still valid are not re-validated
+    function purchaseProductCheckpointed(bytes32 _productId) external payable {
+        address payable seller = _transferProduct(_productId, true);
+        bytes32 txId = _recordTransaction(_productId, seller);
+        
+        seller.transfer(msg.value);
+        
+        emit ProductSold(_productId, seller, msg.sender, msg.value, txId);
+    }
+    
+    // Sale without the payout or the stored transaction record: the price is credited to the
+    // seller's pending proceeds and ProductSold is the only record, so the sale does not show
+    // in the transaction history reads
+    function purchaseProductDeferred(bytes32 _productId) external payable {
+        address payable seller = _transferProduct(_productId, false);
+        
+        pendingProceeds[seller] += msg.value;
+        
+        emit ProductSold(_productId, seller, msg.sender, msg.value, _transactionId(_productId));
+    }
+    
+    function withdrawProceeds() external {
+        uint256 amount = pendingProceeds[msg.sender];
+        require(amount > 0, "No proceeds to withdraw");
+        
+        pendingProceeds[msg.sender] = 0;
+        // Forwards all gas, so contract wallets with costly receive logic can withdraw
+        (bool ok, ) = payable(msg.sender).call{value: amount}("");
+        require(ok, "Withdrawal failed");
+        
+        emit ProceedsWithdrawn(msg.sender, amount);
+    }
+    
+    // Pays out many sellers in one transaction. Proceeds only ever go to the seller, so anyone
+    // may call it; a seller whose payout fails or needs more than SETTLE_PAYOUT_GAS keeps its
+    // balance for withdrawProceeds and does not block the others.
+    function settleProceeds(address[] calldata _sellers) external {
+        for (uint256 i = 0; i < _sellers.length; i++) {
+            address seller = _sellers[i];
+            uint256 amount = pendingProceeds[seller];
+            if (amount == 0) {
+                continue;
+            }
+            
+            pendingProceeds[seller] = 0;
+            (bool sent, ) = payable(seller).call{value: amount, gas: SETTLE_PAYOUT_GAS}("");
+            if (sent) {
+                emit ProceedsWithdrawn(seller, amount);
+            } else {
+                pendingProceeds[seller] = amount;
+            }
+        }
+    }
+    
+    // Checks the sale and moves the product to the buyer; returns the seller
+    function _transferProduct(bytes32 _productId, bool _checkpointed) internal returns (address payable seller) {
         DataProduct storage product = dataProducts[_productId];
         
         require(product.isListed, "Product not listed for sale");
@@ -118,41 +221,106 @@ contract ProductTradingContract {
         require(msg.value == product.price, "Incorrect payment amount");
         
         // Validate rights chain
-        require(validateRightsChain(_productId), "Invalid rights chain");
+        require(
+            _checkpointed ? validateRightsChain(_productId) : verifyRightsChain(_productId),
+            "Invalid rights chain"
+        );
         
-        address payable seller = payable(product.currentOwner);
+        seller = payable(product.currentOwner);
         
-        // Create transaction record
-        bytes32 txId = keccak256(
-            abi.encodePacked(_productId, msg.sender, block.timestamp, msg.value)
-        );
+        // Transfer ownership
+        _removeUserProduct(seller, _productId);
+        _addUserProduct(msg.sender, _productId);
+        product.currentOwner = msg.sender;
+        product.isListed = false;
+        product.price = 0;
+    }
+    
+    function _transactionId(bytes32 _productId) internal view returns (bytes32) {
+        return keccak256(abi.encodePacked(_productId, msg.sender, block.timestamp, msg.value));
+    }
+    
+    // Stores the sale and indexes it for the buyer, the seller and the product
+    function _recordTransaction(bytes32 _productId, address _seller) internal returns (bytes32 txId) {
+        txId = _transactionId(_productId);
         
-        Transaction memory newTransaction = Transaction({
+        transactions[txId] = Transaction({
             txId: txId,
             productId: _productId,
-            seller: product.currentOwner,
+            seller: _seller,
             buyer: msg.sender,
             price: msg.value,
             transactionTime: block.timestamp
         });
-        
-        transactions[txId] = newTransaction;
         userTransactions[msg.sender].push(txId);
-        userTransactions[product.currentOwner].push(txId);
+        userTransactions[_seller].push(txId);
+        productTransactions[_productId].push(txId);
+    }
+    
+    function validateRightsChain(bytes32 _productId) 
+        internal 
+        returns (bool) 
+    {
+        // Links usually derive from the same data, so its epochs are read once per chain
+        EpochCache memory epochs;
         
-        // Transfer ownership
-        product.currentOwner = msg.sender;
-        product.isListed = false;
-        product.price = 0;
+        if (!_checkCreatorRights(_productId, epochs)) {
+            return false;
+        }
         
-        // Transfer funds
-        seller.transfer(msg.value);
+        // Links are products themselves, so links validated for an earlier purchase are skipped
+        bytes32[] storage chain = dataProducts[_productId].derivativeChain;
+        for (uint i = 0; i < chain.length; i++) {
+            if (!_checkCreatorRights(chain[i], epochs)) {
+                return false;
+            }
+        }
         
-        emit ProductSold(_productId, seller, msg.sender, msg.value, txId);
+        return true;
     }
     
-    function validateRightsChain(bytes32 _productId) 
-        internal 
+    function _checkCreatorRights(bytes32 _productId, EpochCache memory _epochs)
+        internal
+        returns (bool)
+    {
+        DataProduct storage product = dataProducts[_productId];
+        bytes32 dataId = product.originalDataId;
+        
+        // Checkpoints made before the last ownership transfer or revocation on the data are stale
+        if (!_epochs.loaded || _epochs.dataId != dataId) {
+            _epochs.dataId = dataId;
+            _epochs.ownershipEpoch = uint64(ownershipContract.rightsEpoch(dataId));
+            _epochs.authEpoch = uint64(authContract.rightsEpoch(dataId));
+            _epochs.loaded = true;
+        }
+        
+        RightsCheckpoint memory checkpoint = rightsCheckpoints[_productId];
+        if (checkpoint.ownershipEpoch == _epochs.ownershipEpoch &&
+            checkpoint.authEpoch == _epochs.authEpoch &&
+            checkpoint.validUntil > block.timestamp) {
+            return true;
+        }
+        
+        uint256 validUntil;
+        if (ownershipContract.verifyOwnership(dataId, product.creator)) {
+            validUntil = type(uint64).max;
+        } else {
+            validUntil = authContract.authorizationExpiry(dataId, product.creator);
+            if (validUntil <= block.timestamp) {
+                return false;
+            }
+            if (validUntil > type(uint64).max) {
+                validUntil = type(uint64).max;
+            }
+        }
+        
+        rightsCheckpoints[_productId] = RightsCheckpoint(_epochs.ownershipEpoch, _epochs.authEpoch, uint64(validUntil));
+        return true;
+    }
+    
+    // Full validation without checkpoints, run by purchaseProduct and purchaseProductDeferred
+    function verifyRightsChain(bytes32 _productId) 
+        public 
         view 
         returns (bool) 
     {
@@ -186,20 +354,95 @@ contract ProductTradingContract {
         return hasRights;
     }
     
-    // 修改这两个函数，添加 pure 修饰符并移除未使用的参数
-    function getProductTransactionHistory(bytes32 /*_productId*/)
-        external
+    function _addUserProduct(address _user, bytes32 _productId) internal {
+        if (userProductPosition[_productId] != 0) {
+            return;
+        }
+        userProductIds[_user].push(_productId);
+        userProductPosition[_productId] = userProductIds[_user].length;
+    }
+    
+    function _removeUserProduct(address _user, bytes32 _productId) internal {
+        uint256 position = userProductPosition[_productId];
+        if (position == 0) {
+            return;
+        }
+        bytes32[] storage ids = userProductIds[_user];
+        bytes32 last = ids[ids.length - 1];
+        ids[position - 1] = last;
+        userProductPosition[last] = position;
+        ids.pop();
+        delete userProductPosition[_productId];
+    }
+    
+    function _pageBounds(uint256 _total, uint256 _offset, uint256 _limit)
+        internal
         pure
-        returns (Transaction[] memory)
+        returns (uint256 start, uint256 end)
+    {
+        start = _offset < _total ? _offset : _total;
+        end = _limit < _total - start ? start + _limit : _total;
+    }
+    
+    function getProductTransactionHistoryPage(bytes32 _productId, uint256 _offset, uint256 _limit)
+        public
+        view
+        returns (Transaction[] memory page, uint256 total)
+    {
+        bytes32[] storage txIds = productTransactions[_productId];
+        total = txIds.length;
+        (uint256 start, uint256 end) = _pageBounds(total, _offset, _limit);
+        
+        page = new Transaction[](end - start);
+        for (uint256 i = start; i < end; i++) {
+            page[i - start] = transactions[txIds[i]];
+        }
+    }
+    
+    function getUserProductsPage(address _user, uint256 _offset, uint256 _limit)
+        public
+        view
+        returns (DataProduct[] memory page, uint256 total)
     {
-        return new Transaction[](0);
+        bytes32[] storage ids = userProductIds[_user];
+        total = ids.length;
+        (uint256 start, uint256 end) = _pageBounds(total, _offset, _limit);
+        
+        page = new DataProduct[](end - start);
+        for (uint256 i = start; i < end; i++) {
+            page[i - start] = dataProducts[ids[i]];
+        }
+    }
+    
+    function getUserTransactionsPage(address _user, uint256 _offset, uint256 _limit)
+        external
+        view
+        returns (Transaction[] memory page, uint256 total)
+    {
+        bytes32[] storage txIds = userTransactions[_user];
+        total = txIds.length;
+        (uint256 start, uint256 end) = _pageBounds(total, _offset, _limit);
+        
+        page = new Transaction[](end - start);
+        for (uint256 i = start; i < end; i++) {
+            page[i - start] = transactions[txIds[i]];
+        }
+    }
+    
+    // Unbounded reads; use the paginated variants for long histories
+    function getProductTransactionHistory(bytes32 _productId)
+        external
+        view
+        returns (Transaction[] memory page)
+    {
+        (page, ) = getProductTransactionHistoryPage(_productId, 0, type(uint256).max);
     }
 
-    function getUserProducts(address /*_user*/)
+    function getUserProducts(address _user)
         external
-        pure
-        returns (DataProduct[] memory)
+        view
+        returns (DataProduct[] memory page)
     {
-        return new DataProduct[](0);
+        (page, ) = getUserProductsPage(_user, 0, type(uint256).max);
     }
 }
\ No newline at end of file
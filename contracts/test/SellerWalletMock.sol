@@ -0,0 +1,34 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.19;
+
+// Contract-wallet seller for the settlement tests. It trades through execute and
+// accepts, rejects or spends extra gas on incoming payments, depending on receiveMode.
+contract SellerWalletMock {
+    enum ReceiveMode { Accept, Reject, Expensive }
+
+    ReceiveMode public receiveMode;
+    // Written on every payment in Expensive mode; a storage write costs more than the 2300 gas stipend
+    uint256 public totalReceived;
+
+    function setReceiveMode(ReceiveMode _mode) external {
+        receiveMode = _mode;
+    }
+
+    // Calls _target as this wallet, bubbling up its revert reason
+    function execute(address _target, bytes calldata _data) external returns (bytes memory) {
+        (bool ok, bytes memory result) = _target.call(_data);
+        if (!ok) {
+            assembly {
+                revert(add(result, 32), mload(result))
+            }
+        }
+        return result;
+    }
+
+    receive() external payable {
+        require(receiveMode != ReceiveMode.Reject, "Wallet rejects payments");
+        if (receiveMode == ReceiveMode.Expensive) {
+            totalReceived += msg.value;
+        }
+    }
+}
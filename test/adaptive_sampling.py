@@ -0,0 +1,171 @@
+"""Adaptive sample sizing with warm-up removal and confidence-interval stopping
+
+The fixed operation counts of performance_test.py (10 to 200) are too small
+to be statistically meaningful at the low end. They also include the node's
+warm-up (connection setup, caches, JIT) in the first measurements.
+AdaptiveSampler instead runs a test function in batches and:
+
+1. detects the warm-up period with the MSER rule on the per-batch mean
+   latency and discards it;
+2. computes distribution-free confidence intervals of the median
+   per-operation latency and the median batch throughput from the
+   remaining steady-state samples (order statistics of the binomial
+   distribution, so no normality is assumed);
+3. stops once both intervals are narrower than a target width relative
+   to their median, when the time budget or operation cap is reached, or
+   when several batches in a row have no successful operation (e.g. a
+   purchase test that has run out of listed products).
+
+The TPS, duration, successful operations, latency and failure counts of
+the result row cover the steady-state batches only.
+
+Per-operation latencies are the spans that contract_call and
+send_transaction record on a trace_export.SpanRecorder. The result fields
+report the achieved precision and why sampling stopped.
+
+Usage:
+    python performance_test.py --adaptive --target-width 0.05 --time-budget 120
+"""
+import math
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from trace_export import OPERATION_CATEGORIES
+
+
+def mser_truncation(series):
+    """Number of leading observations to drop as warm-up, by the MSER rule over the first half"""
+    x = np.asarray(series, dtype=float)
+    n = len(x)
+    if n < 4:
+        return 0
+    best, best_d = np.inf, 0
+    for d in range(n // 2 + 1):
+        tail = x[d:]
+        score = ((tail - tail.mean()) ** 2).sum() / len(tail) ** 2
+        if score < best:
+            best, best_d = score, d
+    return best_d
+
+
+def median_ci(samples, confidence=0.95):
+    """(median, low, high) with a distribution-free CI of the median; NaN bounds if n is too small"""
+    x = np.sort(np.asarray(samples, dtype=float))
+    n = len(x)
+    if n == 0:
+        return np.nan, np.nan, np.nan
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    # 1-based ranks of the order statistics bounding the median
+    low_rank = math.floor(n / 2 - z * math.sqrt(n) / 2)
+    high_rank = math.ceil(n / 2 + 1 + z * math.sqrt(n) / 2)
+    if low_rank < 1 or high_rank > n:
+        return float(np.median(x)), np.nan, np.nan
+    return float(np.median(x)), float(x[low_rank - 1]), float(x[high_rank - 1])
+
+
+def relative_width(median, low, high):
+    if np.isnan(low) or np.isnan(high) or median == 0:
+        return np.inf
+    return (high - low) / abs(median)
+
+
+class AdaptiveSampler:
+    """Runs a test function in batches until the median latency and throughput are precise enough"""
+
+    def __init__(self, batch_size=20, target_width=0.1, confidence=0.95, time_budget=60.0,
+                 max_operations=5000, min_steady_batches=8, max_idle_batches=3):
+        self.batch_size = batch_size
+        self.target_width = target_width
+        self.confidence = confidence
+        self.time_budget = time_budget
+        self.max_operations = max_operations
+        self.min_steady_batches = min_steady_batches
+        self.max_idle_batches = max_idle_batches
+
+    def describe(self):
+        return (f"adaptive (batches of {self.batch_size}, ±{self.target_width / 2:.1%} at "
+                f"{self.confidence:.0%} confidence, {self.time_budget:g}s budget)")
+
+    @staticmethod
+    def _latencies(recorder, first, operation):
+        return [(end - start) / 1e6 for _, name, category, _, _, start, end, outcome, _ in recorder.spans[first:]
+                if name == operation and category in OPERATION_CATEGORIES and outcome == "ok"]
+
+    def run(self, test_function, operation, recorder, failure_log):
+        """Sample test_function(batch_size) adaptively
+
+        Returns (tps, duration, successful_ops, avg_latency) over the steady-state batches, like
+        the test functions, the number of operations requested in those batches, their failure
+        counts in the form of FailureLog.take, and the precision fields of the result row.
+        """
+        batch_tps, batch_latencies, batch_durations, batch_successful, batch_failures = [], [], [], [], []
+        requested = idle_batches = 0
+        started = time.time()
+        stop_reason = "max operations"
+        warmup = 0
+        latency = tps = (np.nan, np.nan, np.nan)
+
+        while requested < self.max_operations:
+            first = len(recorder.spans)
+            tps_b, duration_b, successful_b, avg_latency_b = test_function(self.batch_size)
+            requested += self.batch_size
+            latencies = self._latencies(recorder, first, operation)
+            if not latencies and successful_b:
+                # No per-operation spans for this test; fall back to the batch average
+                latencies = [avg_latency_b]
+            batch_tps.append(tps_b)
+            batch_latencies.append(latencies)
+            batch_durations.append(duration_b)
+            batch_successful.append(successful_b)
+            batch_failures.append(failure_log.take(operation))
+            idle_batches = 0 if successful_b else idle_batches + 1
+
+            batch_means = np.array([np.mean(values) if values else np.nan for values in batch_latencies])
+            # Batches without a successful operation do not move the truncation point
+            batch_means[np.isnan(batch_means)] = np.nanmean(batch_means) if not np.isnan(batch_means).all() else 0
+            warmup = mser_truncation(batch_means)
+            steady_latencies = [value for values in batch_latencies[warmup:] for value in values]
+            latency = median_ci(steady_latencies, self.confidence)
+            tps = median_ci(batch_tps[warmup:], self.confidence)
+
+            steady_batches = len(batch_tps) - warmup
+            if steady_batches >= self.min_steady_batches and \
+                    relative_width(*latency) <= self.target_width and relative_width(*tps) <= self.target_width:
+                stop_reason = "converged"
+                break
+            if time.time() - started >= self.time_budget:
+                stop_reason = "time budget"
+                break
+            if idle_batches >= self.max_idle_batches:
+                stop_reason = "no successful operations"
+                break
+
+        steady_duration = sum(batch_durations[warmup:])
+        steady_successful = sum(batch_successful[warmup:])
+        steady_requested = (len(batch_tps) - warmup) * self.batch_size
+        failures = {key: sum(batch[key] for batch in batch_failures[warmup:]) for key in batch_failures[0]}
+        fields = {
+            "Sampling": "adaptive",
+            "Batch_Size": self.batch_size,
+            "Batches": len(batch_tps),
+            "Warmup_Operations": warmup * self.batch_size,
+            "Steady_Operations": steady_requested,
+            "Warmup_Failed_Operations": sum(batch["Failed_Operations"] for batch in batch_failures[:warmup]),
+            "Median_Latency_(ms)": latency[0],
+            "Latency_CI_Low_(ms)": latency[1],
+            "Latency_CI_High_(ms)": latency[2],
+            "Latency_CI_Rel_Width": relative_width(*latency),
+            "Median_TPS": tps[0],
+            "TPS_CI_Low": tps[1],
+            "TPS_CI_High": tps[2],
+            "TPS_CI_Rel_Width": relative_width(*tps),
+            "Target_Rel_Width": self.target_width,
+            "Confidence": self.confidence,
+            "Converged": stop_reason == "converged",
+            "Stop_Reason": stop_reason
+        }
+        overall_tps = steady_successful / steady_duration if steady_duration > 0 else 0
+        avg_latency = (steady_duration / steady_successful * 1000) if steady_successful > 0 else 0
+        return (overall_tps, steady_duration, steady_successful, avg_latency), steady_requested, failures, fields
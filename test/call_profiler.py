@@ -0,0 +1,186 @@
+"""Client-side cost breakdown and profiling helpers for contract RPC calls
+
+Each profiled call is split into four phases:
+
+* encode    - building the call data through web3's contract ABI machinery
+* transport - the HTTP round trip of the JSON-RPC request, minus node execution
+* node      - time spent inside the node, estimated as the eth_call round trip
+              minus the round trip of a no-op RPC (eth_chainId) measured on the
+              same connection
+* decode    - decoding the returned bytes with the function's output types
+"""
+import cProfile
+import collections
+import os
+import pstats
+import statistics
+import sys
+import threading
+import time
+
+import pandas as pd
+from hexbytes import HexBytes
+
+
+def abi_type_string(param):
+    """Return the canonical ABI type string of an ABI input/output entry, expanding tuples"""
+    abi_type = param["type"]
+    if abi_type.startswith("tuple"):
+        inner = ",".join(abi_type_string(component) for component in param["components"])
+        return f"({inner}){abi_type[len('tuple'):]}"
+    return abi_type
+
+
+class CallProfiler:
+    """Times the encode / transport / node / decode phases of contract view calls"""
+
+    def __init__(self, w3, ping_every=20, ping_samples=3):
+        self.w3 = w3
+        self.ping_every = ping_every
+        self.ping_samples = ping_samples
+        self.records = []
+        self._output_types = {}
+        self._calls_since_ping = ping_every
+        self._ping_ns = 0
+
+    def _output_types_for(self, contract, fn_name):
+        key = (contract.address, fn_name)
+        if key not in self._output_types:
+            fn_abi = next(entry for entry in contract.abi
+                          if entry.get("type") == "function" and entry.get("name") == fn_name)
+            self._output_types[key] = [abi_type_string(output) for output in fn_abi["outputs"]]
+        return self._output_types[key]
+
+    def _refresh_ping(self):
+        """Measure the round trip of a no-op RPC used as the transport baseline"""
+        samples = []
+        for _ in range(self.ping_samples):
+            start = time.perf_counter_ns()
+            self.w3.provider.make_request("eth_chainId", [])
+            samples.append(time.perf_counter_ns() - start)
+        self._ping_ns = statistics.median(samples)
+        self._calls_since_ping = 0
+
+    def call(self, contract, fn_name, *args, operation=None):
+        """Execute contract.fn_name(*args) as an eth_call and record its phase timings"""
+        if self._calls_since_ping >= self.ping_every:
+            self._refresh_ping()
+        self._calls_since_ping += 1
+
+        t0 = time.perf_counter_ns()
+        encode = getattr(contract, "encode_abi", None) or contract.encodeABI
+        data = encode(fn_name, args=list(args))
+        t1 = time.perf_counter_ns()
+        response = self.w3.provider.make_request(
+            "eth_call", [{"to": contract.address, "data": data}, "latest"]
+        )
+        t2 = time.perf_counter_ns()
+        if "error" in response:
+            self._record(operation or fn_name, t1 - t0, t2 - t1, 0, False)
+            raise RuntimeError(f"{fn_name} reverted: {response['error']}")
+        output_types = self._output_types_for(contract, fn_name)
+        decoded = self.w3.codec.decode(output_types, HexBytes(response["result"]))
+        t3 = time.perf_counter_ns()
+
+        self._record(operation or fn_name, t1 - t0, t2 - t1, t3 - t2, True)
+        return decoded[0] if len(decoded) == 1 else decoded
+
+    def _record(self, operation, encode_ns, rtt_ns, decode_ns, success):
+        node_ns = max(0, rtt_ns - self._ping_ns)
+        self.records.append({
+            "Operation": operation,
+            "Encode_(ms)": encode_ns / 1e6,
+            "Transport_(ms)": (rtt_ns - node_ns) / 1e6,
+            "Node_(ms)": node_ns / 1e6,
+            "Decode_(ms)": decode_ns / 1e6,
+            "Total_(ms)": (encode_ns + rtt_ns + decode_ns) / 1e6,
+            "Success": success
+        })
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.records)
+
+    def summary(self):
+        """Return mean / median / p95 of each phase per operation"""
+        df = self.to_dataframe()
+        if df.empty:
+            return df
+        phases = ["Encode_(ms)", "Transport_(ms)", "Node_(ms)", "Decode_(ms)", "Total_(ms)"]
+        return df.groupby("Operation")[phases].agg(
+            ["mean", "median", lambda s: s.quantile(0.95)]
+        ).rename(columns={"<lambda_0>": "p95"}).round(4)
+
+    def save(self, path="rpc_call_breakdown.csv"):
+        self.to_dataframe().to_csv(path, index=False)
+        self.summary().to_csv(path.replace(".csv", "_summary.csv"))
+
+
+class StackSampler(threading.Thread):
+    """Sampling profiler that periodically captures the stack of one thread
+
+    Samples are aggregated as collapsed stacks ("frame;frame;frame count"),
+    the input format of flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval=0.005, target_thread_id=None):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.target_thread_id = target_thread_id or threading.get_ident()
+        self.stacks = collections.Counter()
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _frame_label(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_collapsed(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def profile_run(func, *args, profiler="cprofile", output_prefix="benchmark_profile",
+                sample_interval=0.005, **kwargs):
+    """Run func(*args, **kwargs) under cProfile or the sampling profiler and save the output
+
+    cProfile writes ``<prefix>.prof`` (pstats, for snakeviz/gprof2dot) and a
+    ``<prefix>_stats.txt`` cumulative-time listing. The sampling profiler writes
+    ``<prefix>.collapsed`` for flamegraphs.
+    """
+    if profiler == "cprofile":
+        prof = cProfile.Profile()
+        result = prof.runcall(func, *args, **kwargs)
+        prof.dump_stats(f"{output_prefix}.prof")
+        with open(f"{output_prefix}_stats.txt", "w") as f:
+            pstats.Stats(prof, stream=f).sort_stats("cumulative").print_stats(50)
+        print(f"cProfile output saved to '{output_prefix}.prof'")
+        return result
+
+    if profiler == "sampling":
+        sampler = StackSampler(interval=sample_interval)
+        sampler.start()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            sampler.stop()
+            sampler.write_collapsed(f"{output_prefix}.collapsed")
+        print(f"Collapsed stacks saved to '{output_prefix}.collapsed'")
+        return result
+
+    raise ValueError(f"Unknown profiler '{profiler}', expected 'cprofile' or 'sampling'")
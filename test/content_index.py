@@ -0,0 +1,335 @@
+"""Local content-hash index of registered data resources
+
+The index maps the on-chain dataHash (keccak256 of the file contents, as
+BlockchainManager.generateDataHash) to its dataId and current owner. It is
+built from the DataRegistered and OwnershipTransferred events of the
+ownership contract and persisted in SQLite. Each sync only fetches the blocks
+mined since the previous one. Lookups are served from an in-memory dict, so
+"is this file registered, and by whom?" needs no chain round trip per file.
+
+Files are hashed with a chunked reader, and the hashes are cached by
+(path, size, mtime) so unchanged files are not read again. Optionally, a
+64-bit DCT perceptual hash of the raster can be attached to a dataHash.
+Watermarked or re-encoded copies, whose bytes no longer match the registered
+hash, can then be matched by Hamming distance.
+
+Usage:
+    python content_index.py --sync
+    python content_index.py --check ../tif ../dataset --perceptual
+    python content_index.py --benchmark
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from web3 import Web3
+
+import dct_watermark
+from contract_events import DATA_REGISTERED_TOPIC, OWNERSHIP_TRANSFERRED_TOPIC
+
+DEFAULT_INDEX_PATH = "content_hash_index.sqlite"
+
+PHASH_SIZE = 32
+PHASH_BITS = 8
+DEFAULT_MAX_DISTANCE = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS resources (
+    data_hash TEXT PRIMARY KEY,
+    data_id TEXT NOT NULL UNIQUE,
+    owner TEXT NOT NULL,
+    registration_time INTEGER,
+    block_number INTEGER,
+    tx_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS perceptual_hashes (
+    phash INTEGER NOT NULL,
+    data_hash TEXT NOT NULL,
+    PRIMARY KEY (phash, data_hash)
+);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT,
+    data_hash TEXT
+);
+"""
+
+
+def perceptual_hash(image_path):
+    """64-bit DCT perceptual hash of the luminance, robust to watermarking and re-encoding"""
+    with Image.open(image_path) as image:
+        image.draft("L", (PHASH_SIZE * 4, PHASH_SIZE * 4))
+        small = image.convert("L").resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.BOX)
+    basis = dct_watermark.dct_matrix(PHASH_SIZE)
+    coeffs = basis @ np.asarray(small, dtype=np.float64) @ basis.T
+    low = coeffs[:PHASH_BITS, :PHASH_BITS].ravel()
+    bits = low > np.median(low[1:])
+    # Stored as a signed 64-bit integer so it fits an SQLite INTEGER
+    return int(np.packbits(bits).view(">i8")[0])
+
+
+class ContentHashIndex:
+    """Persistent dataHash -> (dataId, owner) index synchronized from contract events"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self._by_hash = {}
+        self._hash_by_id = {}
+        self._phashes = np.empty(0, dtype=np.int64)
+        self._phash_targets = []
+        self._load()
+
+    def _load(self):
+        self._by_hash.clear()
+        self._hash_by_id.clear()
+        for data_hash, data_id, owner, registration_time, block_number, tx_hash in self.db.execute(
+                "SELECT data_hash, data_id, owner, registration_time, block_number, tx_hash FROM resources"):
+            self._by_hash[data_hash] = {
+                "data_id": data_id, "owner": owner, "registration_time": registration_time,
+                "block_number": block_number, "tx_hash": tx_hash
+            }
+            self._hash_by_id[data_id] = data_hash
+        rows = self.db.execute("SELECT phash, data_hash FROM perceptual_hashes").fetchall()
+        self._phashes = np.array([row[0] for row in rows], dtype=np.int64)
+        self._phash_targets = [row[1] for row in rows]
+
+    def __len__(self):
+        return len(self._by_hash)
+
+    def data_hashes(self):
+        return list(self._by_hash)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def reset(self):
+        """Drop all indexed resources, perceptual hashes and sync state (file hashes are kept)"""
+        with self.db:
+            self.db.execute("DELETE FROM resources")
+            self.db.execute("DELETE FROM perceptual_hashes")
+            self.db.execute("DELETE FROM meta")
+        self._load()
+
+    # -------------------------------------------------------------------------
+    # Event synchronization
+    # -------------------------------------------------------------------------
+
+    def _start_block(self, w3, contract_address):
+        """Return the first block to scan, rebuilding if the contract or chain changed"""
+        last_block = self._meta("last_block")
+        if self._meta("contract") != contract_address or last_block is None:
+            if last_block is not None:
+                print("Index belongs to another contract, rebuilding")
+            self.reset()
+            return 0
+        last_block = int(last_block)
+        # A restarted development chain reuses contract addresses but not block hashes
+        if last_block > w3.eth.block_number or \
+                Web3.to_hex(w3.eth.get_block(last_block)["hash"]) != self._meta("last_block_hash"):
+            print("Chain history changed since the last sync, rebuilding")
+            self.reset()
+            return 0
+        return last_block + 1
+
+    def sync(self, w3, contract_address, chunk_size=5000):
+        """Apply the events mined since the last sync and return the number processed"""
+        contract_address = Web3.to_checksum_address(contract_address)
+        from_block = self._start_block(w3, contract_address)
+        head = w3.eth.block_number
+        processed = 0
+
+        for start in range(from_block, head + 1, chunk_size):
+            end = min(start + chunk_size - 1, head)
+            logs = w3.eth.get_logs({
+                "fromBlock": start, "toBlock": end, "address": contract_address,
+                "topics": [[DATA_REGISTERED_TOPIC, OWNERSHIP_TRANSFERRED_TOPIC]]
+            })
+            with self.db:
+                for log in sorted(logs, key=lambda l: (l["blockNumber"], l["logIndex"])):
+                    self._apply_log(w3, log)
+                processed += len(logs)
+                self._set_meta("contract", contract_address)
+                self._set_meta("last_block", end)
+                self._set_meta("last_block_hash", Web3.to_hex(w3.eth.get_block(end)["hash"]))
+        return processed
+
+    def _apply_log(self, w3, log):
+        topics = log["topics"]
+        data_id = Web3.to_hex(topics[1])
+        if Web3.to_hex(topics[0]) == DATA_REGISTERED_TOPIC:
+            data_hash, _, timestamp = w3.codec.decode(["bytes32", "string", "uint256"], bytes(log["data"]))
+            record = {
+                "data_id": data_id,
+                "owner": Web3.to_checksum_address(bytes(topics[2])[-20:]),
+                "registration_time": timestamp,
+                "block_number": log["blockNumber"],
+                "tx_hash": Web3.to_hex(log["transactionHash"])
+            }
+            data_hash = Web3.to_hex(data_hash)
+            self.db.execute(
+                "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?)",
+                (data_hash, data_id, record["owner"], timestamp, record["block_number"], record["tx_hash"])
+            )
+            self._by_hash[data_hash] = record
+            self._hash_by_id[data_id] = data_hash
+            return
+
+        data_hash = self._hash_by_id.get(data_id)
+        if data_hash is None:
+            return
+        new_owner = Web3.to_checksum_address(bytes(topics[3])[-20:])
+        self.db.execute("UPDATE resources SET owner = ? WHERE data_hash = ?", (new_owner, data_hash))
+        self._by_hash[data_hash]["owner"] = new_owner
+
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+
+    def lookup(self, data_hash):
+        """Return the indexed record of a 0x-prefixed dataHash, or None"""
+        return self._by_hash.get(data_hash.lower())
+
+    def hash_file(self, path):
+        """Return (sha256, dataHash) of a file, reusing the cached hashes of unchanged files"""
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        cached = self.db.execute(
+            "SELECT size, mtime_ns, sha256, data_hash FROM file_hashes WHERE path = ?", (path,)
+        ).fetchone()
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2], cached[3]
+        sha256, data_hash = dct_watermark.hash_file(path)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?)",
+                            (path, stat.st_size, stat.st_mtime_ns, sha256, data_hash))
+        return sha256, data_hash
+
+    def lookup_file(self, path):
+        """Return (dataHash, record or None) for a file"""
+        _, data_hash = self.hash_file(path)
+        return data_hash, self.lookup(data_hash)
+
+    def add_perceptual_hash(self, data_hash, phash):
+        """Attach a perceptual hash to an indexed dataHash"""
+        data_hash = data_hash.lower()
+        with self.db:
+            inserted = self.db.execute(
+                "INSERT OR IGNORE INTO perceptual_hashes VALUES (?, ?)", (phash, data_hash)).rowcount
+        if inserted:
+            self._phashes = np.append(self._phashes, np.int64(phash))
+            self._phash_targets.append(data_hash)
+
+    def lookup_perceptual(self, phash, max_distance=DEFAULT_MAX_DISTANCE):
+        """Return (dataHash, record, distance) of the closest perceptual hash within max_distance"""
+        if not len(self._phashes):
+            return None
+        distances = np.bitwise_count((self._phashes ^ np.int64(phash)).view(np.uint64))
+        best = int(np.argmin(distances))
+        if distances[best] > max_distance:
+            return None
+        data_hash = self._phash_targets[best]
+        return data_hash, self.lookup(data_hash), int(distances[best])
+
+    def check_files(self, paths, perceptual=False, max_distance=DEFAULT_MAX_DISTANCE):
+        """Classify files as registered (exact), registered (perceptual) or unregistered
+
+        With perceptual=True, exact matches also record their perceptual hash so
+        later copies of the same raster are recognized.
+        """
+        rows = []
+        for path in paths:
+            start = time.perf_counter()
+            data_hash, record = self.lookup_file(path)
+            match, distance = ("exact", 0) if record else ("none", None)
+            if perceptual:
+                phash = perceptual_hash(path)
+                if record:
+                    self.add_perceptual_hash(data_hash, phash)
+                else:
+                    near = self.lookup_perceptual(phash, max_distance)
+                    if near:
+                        _, record, distance = near
+                        match = "perceptual"
+            rows.append({
+                "Image": path,
+                "Data_Hash": data_hash,
+                "Match": match,
+                "Hamming_Distance": distance,
+                "Data_Id": record["data_id"] if record else "",
+                "Owner": record["owner"] if record else "",
+                "Lookup_(ms)": (time.perf_counter() - start) * 1000
+            })
+        return pd.DataFrame(rows)
+
+
+def benchmark_lookup(index, data_hashes, contract):
+    """Compare per-hash lookup latency of the local index with isDataRegistered/getDataResourceByHash"""
+    rows = []
+    start = time.perf_counter()
+    for data_hash in data_hashes:
+        index.lookup(data_hash)
+    rows.append(("local_index", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for data_hash in data_hashes:
+        if contract.functions.isDataRegistered(data_hash).call():
+            contract.functions.getDataResourceByHash(data_hash).call()
+    rows.append(("on_chain", time.perf_counter() - start))
+
+    df = pd.DataFrame(rows, columns=["Method", "Total_(s)"])
+    df["Lookups"] = len(data_hashes)
+    df["Per_Lookup_(us)"] = df["Total_(s)"] / max(len(data_hashes), 1) * 1e6
+    df["Lookups_Per_Second"] = len(data_hashes) / df["Total_(s)"]
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local content-hash index of registered data resources")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="SQLite index file")
+    parser.add_argument("--sync", action="store_true", help="Sync the index from contract events")
+    parser.add_argument("--check", nargs="+", help="Image files or directories to look up")
+    parser.add_argument("--perceptual", action="store_true", help="Also match by perceptual hash")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE, help="Perceptual match threshold (bits)")
+    parser.add_argument("--benchmark", action="store_true", help="Compare local and on-chain lookup latency")
+    parser.add_argument("--output", default="content_index_check.csv", help="Result table for --check")
+    args = parser.parse_args()
+
+    with ContentHashIndex(args.index) as index:
+        if args.sync or args.benchmark:
+            import performance_test as pt
+            start = time.perf_counter()
+            n_events = index.sync(pt.w3, pt.ownership_contract.address)
+            print(f"Synced {n_events} events in {time.perf_counter() - start:.2f}s, {len(index)} resources indexed")
+
+        if args.check:
+            paths = [path for target in args.check for path in dct_watermark.list_images(target)]
+            results = index.check_files(paths, perceptual=args.perceptual, max_distance=args.max_distance)
+            results.to_csv(args.output, index=False)
+            print(results["Match"].value_counts().to_string())
+            print(f"Results saved to '{args.output}'")
+
+        if args.benchmark:
+            hashes = index.data_hashes()[:1000]
+            print(benchmark_lookup(index, hashes, pt.ownership_contract).to_string(index=False))
@@ -0,0 +1,17 @@
+"""Topic hashes of the events emitted by the ownership, processing-right and trading contracts"""
+from web3 import Web3
+
+DATA_REGISTERED_TOPIC = Web3.to_hex(Web3.keccak(text="DataRegistered(bytes32,address,bytes32,string,uint256)"))
+OWNERSHIP_TRANSFERRED_TOPIC = Web3.to_hex(Web3.keccak(text="OwnershipTransferred(bytes32,address,address)"))
+DATA_METADATA_COMMITTED_TOPIC = Web3.to_hex(Web3.keccak(text="DataMetadataCommitted(bytes32,string)"))
+
+AUTHORIZATION_GRANTED_TOPIC = Web3.to_hex(
+    Web3.keccak(text="AuthorizationGranted(bytes32,bytes32,address,address,string,uint256)"))
+AUTHORIZATION_REVOKED_TOPIC = Web3.to_hex(Web3.keccak(text="AuthorizationRevoked(bytes32,bytes32,address)"))
+AUTHORIZATION_TERMS_COMMITTED_TOPIC = Web3.to_hex(
+    Web3.keccak(text="AuthorizationTermsCommitted(bytes32,string,string)"))
+
+PRODUCT_CREATED_TOPIC = Web3.to_hex(Web3.keccak(text="ProductCreated(bytes32,bytes32,address,string,uint256)"))
+PRODUCT_LISTED_TOPIC = Web3.to_hex(Web3.keccak(text="ProductListed(bytes32,address,uint256)"))
+PRODUCT_SOLD_TOPIC = Web3.to_hex(Web3.keccak(text="ProductSold(bytes32,address,address,uint256,bytes32)"))
+PROCEEDS_WITHDRAWN_TOPIC = Web3.to_hex(Web3.keccak(text="ProceedsWithdrawn(address,uint256)"))
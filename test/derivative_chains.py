@@ -0,0 +1,221 @@
+"""Derivative-chain depth benchmark for purchaseProduct and purchaseProductCheckpointed
+
+A purchase validates the rights chain of the product it sells: the creator
+of the product, and of every product in its derivativeChain, must own or be
+authorized on the product's original data. purchaseProduct repeats all of
+these checks on every purchase through verifyRightsChain, which copies each
+link product into memory and calls verifyOwnership and then
+verifyAuthorization, which loops over every grant on the data.
+purchaseProductCheckpointed records a rights checkpoint per product instead.
+A checkpoint stays valid until the next ownership transfer or revocation on
+the product's original data, which bump that dataId's rights epoch in either
+contract, or until the authorization it relied on expires. A checkpointed
+purchase only re-checks the links without a valid checkpoint.
+
+For each chain depth the benchmark creates a product whose derivativeChain
+holds that many earlier products and measures:
+
+* Verify_Call     - full validation (verifyRightsChain), estimated gas and eth_call latency
+* Purchase_Full   - repeated purchaseProduct purchases, every link validated each time
+* Purchase_Cold   - first checkpointed purchase after the data's rights epoch was bumped
+* Purchase_Prefix - first checkpointed purchase of a new product whose links are already checkpointed
+* Purchase_Warm   - repeated checkpointed purchases with every checkpoint valid
+
+With ``--link-rights authorization`` the link creator holds a grant rather
+than ownership, behind ``--extra-grants`` grants to other accounts, so the
+cost of verifyAuthorization's linear scan shows up in the cold numbers.
+
+Usage:
+    python derivative_chains.py --depths 1 2 4 8 16 32 64 --repeats 5
+    python derivative_chains.py --link-rights authorization --extra-grants 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from web3 import Web3
+
+from contract_events import AUTHORIZATION_GRANTED_TOPIC, PRODUCT_CREATED_TOPIC
+from workload_model import GRANT_DURATION, FailureLog, transact_checked
+
+DEFAULT_DEPTHS = (1, 2, 4, 8, 16, 32, 64)
+LINK_RIGHTS = ("ownership", "authorization")
+PRICE = 1000000000000000
+# Margin over estimate_gas, since the node re-estimates on its own block state
+GAS_MARGIN = 1.25
+# Long enough that no grant expires during a run, which would turn warm purchases cold
+LINK_GRANT_DURATION = 365 * GRANT_DURATION
+
+
+class ChainBench:
+    """Builds derivative chains and times purchases of the products built on them"""
+
+    def __init__(self, w3, ownership, processing, trading, accounts, link_rights="ownership", extra_grants=0):
+        if link_rights not in LINK_RIGHTS:
+            raise ValueError(f"Unknown link rights '{link_rights}', expected one of {LINK_RIGHTS}")
+        if len(accounts) < 4:
+            raise ValueError("At least 4 accounts are needed: data owner, creator, buyer and grantee")
+        self.w3 = w3
+        self.ownership = ownership
+        self.processing = processing
+        self.trading = trading
+        self.owner, creator, self.buyer = accounts[:3]
+        self.others = accounts[3:]
+        self.creator = creator if link_rights == "authorization" else self.owner
+        self.link_rights = link_rights
+        self.extra_grants = extra_grants
+        self.failure_log = FailureLog()
+        self.data_id = None
+        self.links = []
+
+    def send(self, function, params, operation):
+        """Send a transaction with estimated gas; return (receipt, latency_ms) or raise on failure"""
+        params = {**params, "gas": int(function.estimate_gas(params) * GAS_MARGIN)}
+        start = time.perf_counter()
+        receipt = transact_checked(self.w3, function, params, operation, self.failure_log)
+        latency = (time.perf_counter() - start) * 1000
+        if receipt is None:
+            raise RuntimeError(f"{operation} failed while building derivative chains")
+        return receipt, latency
+
+    def _event_id(self, receipt, topic):
+        for log in receipt["logs"]:
+            if log["topics"] and Web3.to_hex(log["topics"][0]) == topic:
+                return bytes(log["topics"][1])
+        raise RuntimeError("Expected event not found in receipt")
+
+    def _grant(self, grantee):
+        receipt, _ = self.send(self.processing.functions.grantProcessingRight(
+            self.data_id, grantee, LINK_GRANT_DURATION, "derivative chain benchmark", "all", "none"
+        ), {"from": self.owner}, "Processing_GrantRight")
+        return self._event_id(receipt, AUTHORIZATION_GRANTED_TOPIC)
+
+    def setup(self):
+        """Register the source data and, for authorization links, grant the creator its rights"""
+        data_hash = Web3.keccak(text=f"derivative-chain-source-{time.time_ns()}")
+        self.send(self.ownership.functions.registerDataResource(
+            data_hash, "Derivative chain benchmark source", "chain"
+        ), {"from": self.owner}, "Ownership_Register")
+        self.data_id = self.ownership.functions.getDataResourceByHash(data_hash).call()[5]
+        if self.link_rights == "authorization":
+            # The creator's grant comes last, so verifyAuthorization scans all the others first
+            for i in range(self.extra_grants):
+                self._grant(self.others[i % len(self.others)])
+            self._grant(self.creator)
+
+    def create_product(self, chain):
+        """Create a product derived through chain; return (productId, gas_used)"""
+        receipt, _ = self.send(self.trading.functions.createDataProduct(
+            self.data_id, f"Derivative chain product {len(chain)}-{time.time_ns()}", list(chain)
+        ), {"from": self.creator}, "Trading_CreateProduct")
+        return self._event_id(receipt, PRODUCT_CREATED_TOPIC), receipt["gasUsed"]
+
+    def extend_links(self, depth):
+        """Grow the shared chain to depth links, each derived from all links before it"""
+        while len(self.links) < depth:
+            product_id, _ = self.create_product(self.links)
+            self.links.append(product_id)
+
+    def bump_rights_epoch(self):
+        """Revoke a throwaway grant on the source data, which invalidates the checkpoints of every product on it"""
+        auth_id = self._grant(self.others[0])
+        self.send(self.processing.functions.revokeAuthorization(auth_id), {"from": self.owner},
+                  "Processing_Revoke")
+
+    def sell(self, product_id, seller, buyer, checkpointed=True):
+        """List and purchase a product; return the purchase (gas_used, latency_ms)"""
+        self.send(self.trading.functions.listProductForSale(product_id, PRICE), {"from": seller},
+                  "Trading_ListProduct")
+        purchase = self.trading.functions.purchaseProductCheckpointed if checkpointed \
+            else self.trading.functions.purchaseProduct
+        receipt, latency = self.send(purchase(product_id), {"from": buyer, "value": PRICE},
+                                     "Trading_PurchaseProduct")
+        return receipt["gasUsed"], latency
+
+    def sell_repeatedly(self, product_id, repeats, checkpointed):
+        """Sell a product back and forth between creator and buyer; return (gas_used, latency_ms) arrays"""
+        owner = self.trading.functions.dataProducts(product_id).call()[5]
+        seller, buyer = (owner, self.creator if owner == self.buyer else self.buyer)
+        sales = []
+        for _ in range(repeats):
+            sales.append(self.sell(product_id, seller, buyer, checkpointed))
+            seller, buyer = buyer, seller
+        return np.array([gas for gas, _ in sales]), np.array([latency for _, latency in sales])
+
+    def measure(self, depth, repeats):
+        """One result row for products with a derivativeChain of the given depth"""
+        self.extend_links(depth)
+        chain = self.links[:depth]
+        product_id, create_gas = self.create_product(chain)
+
+        verify = self.trading.functions.verifyRightsChain(product_id)
+        verify_gas = verify.estimate_gas()
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            verify.call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        self.bump_rights_epoch()
+        cold_gas, cold_latency = self.sell(product_id, self.creator, self.buyer)
+
+        prefix_product, _ = self.create_product(chain)
+        prefix_gas, prefix_latency = self.sell(prefix_product, self.creator, self.buyer)
+
+        warm_gas, warm_latency = self.sell_repeatedly(product_id, repeats, checkpointed=True)
+        full_gas, full_latency = self.sell_repeatedly(product_id, repeats, checkpointed=False)
+
+        return {
+            "Depth": depth,
+            "Link_Rights": self.link_rights,
+            "Extra_Grants": self.extra_grants if self.link_rights == "authorization" else 0,
+            "Create_Gas": create_gas,
+            "Verify_Call_Gas": verify_gas,
+            "Verify_Call_Latency_(ms)": np.mean(latencies),
+            "Purchase_Full_Gas": full_gas.mean(),
+            "Purchase_Full_Latency_(ms)": full_latency.mean(),
+            "Purchase_Cold_Gas": cold_gas,
+            "Purchase_Cold_Latency_(ms)": cold_latency,
+            "Purchase_Prefix_Gas": prefix_gas,
+            "Purchase_Prefix_Latency_(ms)": prefix_latency,
+            "Purchase_Warm_Gas": warm_gas.mean(),
+            "Purchase_Warm_Latency_(ms)": warm_latency.mean(),
+            "Purchase_Warm_Latency_P95_(ms)": np.percentile(warm_latency, 95),
+            "Warm_Gas_Saving": 1 - warm_gas.mean() / full_gas.mean(),
+            "Cold_Gas_Overhead": cold_gas / full_gas.mean() - 1
+        }
+
+
+def run_chain_benchmark(w3, ownership, processing, trading, accounts, depths=DEFAULT_DEPTHS, repeats=5,
+                        link_rights="ownership", extra_grants=0):
+    """Measure validation and purchase cost for each derivative-chain depth"""
+    bench = ChainBench(w3, ownership, processing, trading, accounts, link_rights, extra_grants)
+    bench.setup()
+    rows = []
+    for depth in sorted(depths):
+        print(f"Derivative chain depth {depth}")
+        row = bench.measure(depth, repeats)
+        print(f"  purchase gas full {row['Purchase_Full_Gas']:.0f}; checkpointed cold {row['Purchase_Cold_Gas']}, "
+              f"prefix {row['Purchase_Prefix_Gas']}, warm {row['Purchase_Warm_Gas']:.0f}")
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import performance_test as pt
+
+    parser = argparse.ArgumentParser(description="Benchmark full and checkpointed purchases across derivative-chain depths")
+    parser.add_argument("--depths", nargs="+", type=int, default=list(DEFAULT_DEPTHS), help="Chain depths to measure")
+    parser.add_argument("--repeats", type=int, default=5, help="Warm purchases and validation calls per depth")
+    parser.add_argument("--link-rights", choices=LINK_RIGHTS, default="ownership",
+                        help="Whether link creators own the source data or hold a grant on it")
+    parser.add_argument("--extra-grants", type=int, default=0,
+                        help="Grants to other accounts ahead of the creator's (authorization links only)")
+    args = parser.parse_args()
+
+    results = run_chain_benchmark(pt.w3, pt.ownership_contract, pt.processing_right_contract,
+                                  pt.product_trading_contract, pt.w3.eth.accounts, args.depths, args.repeats,
+                                  args.link_rights, args.extra_grants)
+    results.to_csv("derivative_chain_benchmark.csv", index=False)
+    print(results.round(2).to_string(index=False))
@@ -0,0 +1,271 @@
+"""Event-only metadata mode: hash commitments on-chain, strings in the logs
+
+registerDataResource stores the metadata and watermark feature strings, and
+grantProcessingRight stores the purpose, scope and constraints. These
+storage writes dominate the gas of the two highest-volume transactions. The
+contracts now also offer an event-only mode:
+
+* registerDataResourceCommitted stores keccak256(abi.encode(metadata,
+  watermarkFeatures)) in metadataCommitments. The metadata is emitted in
+  DataRegistered as before, and the watermark features in
+  DataMetadataCommitted.
+* grantProcessingRightCommitted stores keccak256(abi.encode(purpose,
+  scope, constraints)) in authorizationCommitments. The purpose is emitted
+  in AuthorizationGranted, and the scope and constraints in
+  AuthorizationTermsCommitted.
+
+Everything else (owner, hashes, times, validity) is stored as before, so
+ownership and authorization checks are unchanged. EventRecordReader
+rebuilds the full records from the logs and checks each one against its
+on-chain commitment. A record whose logs were lost or altered shows up as
+unverified.
+
+The benchmark compares gas per transaction across payload sizes, and
+sustained write TPS, between the storage and event-only modes. It also
+measures how fast the reader rebuilds and verifies records.
+
+Usage:
+    python event_metadata.py --sizes 16 64 256 1024 --transactions 300
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from eth_abi import encode
+from web3 import Web3
+
+from contract_events import (AUTHORIZATION_GRANTED_TOPIC, AUTHORIZATION_TERMS_COMMITTED_TOPIC,
+                             DATA_METADATA_COMMITTED_TOPIC, DATA_REGISTERED_TOPIC)
+from fast_abi import FastContract, call_many
+
+STORAGE_MODES = ("storage", "event")
+DEFAULT_SIZES = (16, 64, 256, 1024)
+# Gas limits cover the largest default payload in storage mode
+REGISTER_GAS = 3000000
+GRANT_GAS = 3000000
+GRANT_DURATION_S = 86400
+MAX_GRANTS = 50
+
+
+def metadata_commitment(metadata, watermark_features):
+    """The commitment registerDataResourceCommitted stores for a record"""
+    return Web3.keccak(encode(["string", "string"], [metadata, watermark_features]))
+
+
+def terms_commitment(purpose, scope, constraints):
+    """The commitment grantProcessingRightCommitted stores for a grant"""
+    return Web3.keccak(encode(["string", "string", "string"], [purpose, scope, constraints]))
+
+
+# =============================================================================
+# Record reconstruction
+# =============================================================================
+
+def _address(topic):
+    return Web3.to_checksum_address(bytes(topic)[-20:])
+
+
+class EventRecordReader:
+    """Rebuilds event-only records from contract logs and verifies them against their commitments"""
+
+    def __init__(self, w3, ownership, processing, chunk_size=5000, batch_size=500):
+        self.w3 = w3
+        self.ownership = FastContract(w3, ownership.address, ownership.abi)
+        self.processing = FastContract(w3, processing.address, processing.abi)
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+
+    def _logs(self, address, topics, from_block, to_block):
+        to_block = self.w3.eth.block_number if to_block == "latest" else to_block
+        logs = []
+        for start in range(from_block, to_block + 1, self.chunk_size):
+            logs.extend(self.w3.eth.get_logs({
+                "fromBlock": start, "toBlock": min(start + self.chunk_size - 1, to_block),
+                "address": address, "topics": [topics]
+            }))
+        return sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
+
+    def _verify(self, contract, fn_name, records, key):
+        """Set Verified on each record by comparing its computed and on-chain commitments"""
+        for start in range(0, len(records), self.batch_size):
+            batch = records[start:start + self.batch_size]
+            stored = call_many(self.w3, [(contract, fn_name, (record[key],)) for record in batch])
+            for record, commitment in zip(batch, stored):
+                # Popped first, so records whose call failed do not keep the helper field
+                expected = record.pop("_commitment")
+                record["Verified"] = not isinstance(commitment, Exception) and bytes(commitment) == bytes(expected)
+
+    def data_records(self, from_block=0, to_block="latest"):
+        """Event-only data resources registered in the block range, with their full strings"""
+        registered = {}
+        records = []
+        for log in self._logs(self.ownership.address, [DATA_REGISTERED_TOPIC, DATA_METADATA_COMMITTED_TOPIC],
+                              from_block, to_block):
+            data_id = bytes(log["topics"][1])
+            if Web3.to_hex(log["topics"][0]) == DATA_REGISTERED_TOPIC:
+                data_hash, metadata, timestamp = self.w3.codec.decode(["bytes32", "string", "uint256"],
+                                                                      bytes(log["data"]))
+                registered[data_id] = {
+                    "dataId": data_id,
+                    "dataHash": data_hash,
+                    "owner": _address(log["topics"][2]),
+                    "metadata": metadata,
+                    "registrationTime": timestamp,
+                    "blockNumber": log["blockNumber"],
+                    "transactionHash": bytes(log["transactionHash"])
+                }
+                continue
+            # DataMetadataCommitted follows DataRegistered in the same transaction
+            record = registered.pop(data_id, None)
+            if record is None:
+                continue
+            (record["watermarkFeatures"],) = self.w3.codec.decode(["string"], bytes(log["data"]))
+            record["_commitment"] = metadata_commitment(record["metadata"], record["watermarkFeatures"])
+            records.append(record)
+        self._verify(self.ownership, "metadataCommitments", records, "dataId")
+        return records
+
+    def authorization_records(self, from_block=0, to_block="latest"):
+        """Event-only authorizations granted in the block range, with their full terms"""
+        granted = {}
+        records = []
+        for log in self._logs(self.processing.address,
+                              [AUTHORIZATION_GRANTED_TOPIC, AUTHORIZATION_TERMS_COMMITTED_TOPIC],
+                              from_block, to_block):
+            auth_id = bytes(log["topics"][1])
+            if Web3.to_hex(log["topics"][0]) == AUTHORIZATION_GRANTED_TOPIC:
+                grantee, purpose, expiration = self.w3.codec.decode(["address", "string", "uint256"],
+                                                                    bytes(log["data"]))
+                granted[auth_id] = {
+                    "authId": auth_id,
+                    "dataId": bytes(log["topics"][2]),
+                    "grantor": _address(log["topics"][3]),
+                    "grantee": Web3.to_checksum_address(grantee),
+                    "purpose": purpose,
+                    "expirationTime": expiration,
+                    "blockNumber": log["blockNumber"],
+                    "transactionHash": bytes(log["transactionHash"])
+                }
+                continue
+            record = granted.pop(auth_id, None)
+            if record is None:
+                continue
+            record["scope"], record["constraints"] = self.w3.codec.decode(["string", "string"], bytes(log["data"]))
+            record["_commitment"] = terms_commitment(record["purpose"], record["scope"], record["constraints"])
+            records.append(record)
+        self._verify(self.processing, "authorizationCommitments", records, "authId")
+        return records
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+def _payload(size, label):
+    return (label * (size // len(label) + 1))[:size]
+
+
+def _register(ownership, mode, index, size):
+    function = ownership.functions.registerDataResourceCommitted if mode == "event" \
+        else ownership.functions.registerDataResource
+    data_hash = Web3.keccak(text=f"event-metadata-{mode}-{size}-{index}-{time.time_ns()}")
+    return function(data_hash, _payload(size, "metadata;"), _payload(size, "features;"))
+
+
+def _grant(processing, mode, data_id, grantee, size):
+    function = processing.functions.grantProcessingRightCommitted if mode == "event" \
+        else processing.functions.grantProcessingRight
+    return function(data_id, grantee, GRANT_DURATION_S, _payload(size, "purpose;"), _payload(size, "scope;"),
+                    _payload(size, "constraints;"))
+
+
+def send_stream(w3, make_function, accounts, n_transactions, gas):
+    """Submit n transactions round-robin with local nonces, then wait for all receipts"""
+    nonces = {account: w3.eth.get_transaction_count(account, "pending") for account in accounts}
+    start = time.time()
+    tx_hashes = []
+    for i in range(n_transactions):
+        sender = accounts[i % len(accounts)]
+        tx_hashes.append(make_function(i).transact({"from": sender, "gas": gas, "nonce": nonces[sender]}))
+        nonces[sender] += 1
+    receipts = [w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300) for tx_hash in tx_hashes]
+    duration = time.time() - start
+    return receipts, duration
+
+
+def run_event_metadata_benchmark(w3, ownership, processing, accounts, sizes=DEFAULT_SIZES, n_transactions=300):
+    """Gas, sustained TPS and reader throughput of both storage modes for each payload size"""
+    owner, grantee = accounts[0], accounts[1]
+    reader = EventRecordReader(w3, ownership, processing)
+    rows = []
+    for size in sizes:
+        for mode in STORAGE_MODES:
+            first_block = w3.eth.block_number + 1
+            print(f"{mode} mode, {size}-character strings: {n_transactions} registrations")
+            receipts, duration = send_stream(w3, lambda i: _register(ownership, mode, i, size), accounts,
+                                             n_transactions, REGISTER_GAS)
+            ok = [receipt for receipt in receipts if receipt["status"] == 1]
+            register_gas = np.mean([receipt["gasUsed"] for receipt in ok]) if ok else np.nan
+
+            # authId hashes (dataId, grantee, timestamp, grantor), so each grant gets its own data resource
+            n_grants = min(n_transactions, MAX_GRANTS)
+            sources, _ = send_stream(w3, lambda i: _register(ownership, "storage", i, 0), [owner], n_grants,
+                                     REGISTER_GAS)
+            data_ids = [bytes(receipt["logs"][0]["topics"][1]) for receipt in sources if receipt["status"] == 1]
+            grant_receipts, _ = send_stream(w3, lambda i: _grant(processing, mode, data_ids[i], grantee, size),
+                                            [owner], len(data_ids), GRANT_GAS)
+            grant_ok = [receipt for receipt in grant_receipts if receipt["status"] == 1]
+
+            row = {
+                "Mode": mode,
+                "String_Length": size,
+                "Transactions": n_transactions,
+                "Successful": len(ok),
+                "Register_Gas": register_gas,
+                "Grant_Gas": np.mean([receipt["gasUsed"] for receipt in grant_ok]) if grant_ok else np.nan,
+                "Sustained_TPS": len(ok) / duration if duration > 0 else np.nan,
+                "Reader_Records_per_s": np.nan,
+                "Reader_Verified": np.nan
+            }
+            if mode == "event":
+                start = time.perf_counter()
+                records = reader.data_records(first_block)
+                elapsed = time.perf_counter() - start
+                row["Reader_Records_per_s"] = len(records) / elapsed if elapsed > 0 else np.nan
+                row["Reader_Verified"] = sum(record["Verified"] for record in records)
+            rows.append(row)
+            print(f"  register gas {row['Register_Gas']:.0f}, grant gas {row['Grant_Gas']:.0f}, "
+                  f"{row['Sustained_TPS']:.1f} TPS")
+
+    results = pd.DataFrame(rows)
+    storage = results[results["Mode"] == "storage"].set_index("String_Length")
+    for column in ("Register_Gas", "Grant_Gas"):
+        baseline = results["String_Length"].map(storage[column])
+        results[f"{column}_Saving"] = 1 - results[column] / baseline
+    return results
+
+
+if __name__ == "__main__":
+    import performance_test as pt
+
+    parser = argparse.ArgumentParser(description="Compare storage and event-only metadata modes")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES),
+                        help="Length of each metadata string")
+    parser.add_argument("--transactions", type=int, default=300, help="Registrations per mode and size")
+    parser.add_argument("--accounts", type=int, default=10, help="Number of sending accounts")
+    parser.add_argument("--read", action="store_true",
+                        help="Only rebuild and verify all event-only records and grants on the chain")
+    args = parser.parse_args()
+
+    if args.read:
+        reader = EventRecordReader(pt.w3, pt.ownership_contract, pt.processing_right_contract)
+        for name, records in (("data resources", reader.data_records()),
+                              ("authorizations", reader.authorization_records())):
+            verified = sum(record["Verified"] for record in records)
+            print(f"{len(records)} event-only {name}, {verified} verified against their commitments")
+    else:
+        results = run_event_metadata_benchmark(pt.w3, pt.ownership_contract, pt.processing_right_contract,
+                                               pt.w3.eth.accounts[:args.accounts], args.sizes, args.transactions)
+        results.to_csv("event_metadata_benchmark.csv", index=False)
+        print(results.round(3).to_string(index=False))
@@ -0,0 +1,65 @@
+const { expect } = require('chai');
+const { deployContracts, eventArgs } = require('./helpers/contractFixtures');
+
+contract('事件元数据承诺测试', (accounts) => {
+  const [alice, bob] = accounts;
+  const ZERO_BYTES32 = '0x' + '0'.repeat(64);
+
+  // 超过 32 字节并含多字节字符，覆盖 abi.encode 的动态长度与填充
+  const metadata = '遥感影像 2024-06 批次 ' + 'metadata;'.repeat(8);
+  const features = '{"dct":[3,1,4,1,5,9,2,6],"strength":0.05}';
+  const purpose = '模型训练';
+  const scope = 'scope;'.repeat(12);
+  const constraints = '';
+
+  let ownership;
+  let auth;
+
+  beforeEach(async () => {
+    ({ ownership, auth } = await deployContracts());
+  });
+
+  function commitment(types, values) {
+    return web3.utils.keccak256(web3.eth.abi.encodeParameters(types, values));
+  }
+
+  it('数据承诺等于事件中字符串的 keccak256(abi.encode(...))', async () => {
+    const receipt = await ownership.registerDataResourceCommitted(
+      web3.utils.randomHex(32), metadata, features, { from: alice }
+    );
+    const registered = eventArgs(receipt, 'DataRegistered');
+    const committed = eventArgs(receipt, 'DataMetadataCommitted');
+    expect(committed.dataId).to.equal(registered.dataId);
+    expect(registered.metadata).to.equal(metadata);
+    expect(committed.watermarkFeatures).to.equal(features);
+
+    const stored = await ownership.metadataCommitments(registered.dataId);
+    expect(stored).to.equal(commitment(['string', 'string'], [registered.metadata, committed.watermarkFeatures]));
+
+    // 仅事件模式下链上不保存字符串
+    const resource = await ownership.getDataResource(registered.dataId);
+    expect(resource.metadata).to.equal('');
+    expect(resource.watermarkFeatures).to.equal('');
+  });
+
+  it('授权承诺等于事件中字符串的 keccak256(abi.encode(...))', async () => {
+    const registered = eventArgs(
+      await ownership.registerDataResource(web3.utils.randomHex(32), metadata, features, { from: alice }),
+      'DataRegistered'
+    );
+    expect(await ownership.metadataCommitments(registered.dataId)).to.equal(ZERO_BYTES32);
+
+    const receipt = await auth.grantProcessingRightCommitted(
+      registered.dataId, bob, 86400, purpose, scope, constraints, { from: alice }
+    );
+    const granted = eventArgs(receipt, 'AuthorizationGranted');
+    const terms = eventArgs(receipt, 'AuthorizationTermsCommitted');
+    expect(terms.authId).to.equal(granted.authId);
+
+    const stored = await auth.authorizationCommitments(granted.authId);
+    expect(stored).to.equal(
+      commitment(['string', 'string', 'string'], [granted.purpose, terms.scope, terms.constraints])
+    );
+    expect(stored).to.equal(commitment(['string', 'string', 'string'], [purpose, scope, constraints]));
+  });
+});
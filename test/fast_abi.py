@@ -0,0 +1,426 @@
+"""Fast-path ABI encoder/decoder for hot contract view calls
+
+``contract.functions.f(*args).call()`` builds a new ContractFunction on every
+call, looks the function up in the ABI, runs the arguments through web3's
+normalizers and encodes/decodes through the generic eth_abi codecs. For the
+small, fixed set of functions the benchmark and our services call at high
+rates this machinery dominates client CPU time.
+
+FastContract compiles each ABI function once: the 4-byte selector is cached,
+static argument layouts are encoded by concatenating 32-byte words, and
+return values (including the ``DataResource``/``Authorization`` tuples) are
+decoded directly from the response bytes by a decoder tree built from the ABI.
+Functions whose types the compiled codecs do not cover are called through web3.
+
+Usage:
+    fast_ownership = FastContract(w3, OWNERSHIP_CONTRACT_ADDRESS, ownership_abi)
+    fast_ownership.call("verifyOwnership", data_id, account)
+
+Run this module directly to benchmark the fast path against standard web3.
+"""
+import random
+import time
+
+from web3 import Web3
+
+WORD = 32
+_ZERO_WORD = bytes(WORD)
+
+
+def _word_to_int(data, pos):
+    return int.from_bytes(data[pos:pos + WORD], "big")
+
+
+def _pad_right(raw):
+    return raw + bytes(-len(raw) % WORD)
+
+
+# =============================================================================
+# Encoders
+# =============================================================================
+
+def _encode_bytes32(value):
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    if len(value) != WORD:
+        raise ValueError(f"bytes32 value must be 32 bytes, got {len(value)}")
+    return bytes(value)
+
+
+def _encode_address(value):
+    return bytes(12) + bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+
+def _encode_uint(value):
+    return value.to_bytes(WORD, "big")
+
+
+def _encode_int(value):
+    return value.to_bytes(WORD, "big", signed=True)
+
+
+def _encode_bool(value):
+    return _encode_uint(1 if value else 0)
+
+
+def _encode_string(value):
+    raw = value.encode("utf-8")
+    return _encode_uint(len(raw)) + _pad_right(raw)
+
+
+def _encode_bytes(value):
+    return _encode_uint(len(value)) + _pad_right(bytes(value))
+
+
+_STATIC_ENCODERS = {
+    "bytes32": _encode_bytes32,
+    "address": _encode_address,
+    "bool": _encode_bool,
+}
+
+
+def _compile_encoder(param):
+    """Return (encode, is_dynamic) for an ABI input entry"""
+    abi_type = param["type"]
+    if abi_type.endswith("[]"):
+        element = dict(param, type=abi_type[:-2])
+        element_encoder, element_dynamic = _compile_encoder(element)
+        encode_elements = _tuple_encoder([(element_encoder, element_dynamic)])
+
+        def encode_array(values):
+            return _encode_uint(len(values)) + encode_elements(values, len(values))
+        return encode_array, True
+    if abi_type == "tuple":
+        compiled = [_compile_encoder(component) for component in param["components"]]
+        if not any(dynamic for _, dynamic in compiled):
+            raise TypeError("Static tuple arguments are not supported by the fast path")
+        return _tuple_encoder(compiled), True
+    if abi_type == "string":
+        return _encode_string, True
+    if abi_type == "bytes":
+        return _encode_bytes, True
+    if abi_type in _STATIC_ENCODERS:
+        return _STATIC_ENCODERS[abi_type], False
+    if abi_type.startswith("uint"):
+        return _encode_uint, False
+    if abi_type.startswith("int"):
+        return _encode_int, False
+    raise TypeError(f"ABI type '{abi_type}' is not supported by the fast path")
+
+
+def _tuple_encoder(compiled):
+    """Build a head/tail encoder; a single entry is repeated to encode array elements"""
+    def encode(values, repeat=None):
+        items = compiled * repeat if repeat is not None else compiled
+        heads = []
+        tails = []
+        tail_offset = WORD * len(items)
+        for (encode_item, dynamic), value in zip(items, values):
+            if dynamic:
+                tail = encode_item(value)
+                heads.append(_encode_uint(tail_offset))
+                tails.append(tail)
+                tail_offset += len(tail)
+            else:
+                heads.append(encode_item(value))
+        return b"".join(heads) + b"".join(tails)
+    return encode
+
+
+# =============================================================================
+# Decoders
+# =============================================================================
+
+def _decode_bytes32(data, pos):
+    return bytes(data[pos:pos + WORD])
+
+
+def _decode_uint(data, pos):
+    return _word_to_int(data, pos)
+
+
+def _decode_int(data, pos):
+    return int.from_bytes(data[pos:pos + WORD], "big", signed=True)
+
+
+def _decode_bool(data, pos):
+    return data[pos:pos + WORD] != _ZERO_WORD
+
+
+def _decode_string(data, pos):
+    length = _word_to_int(data, pos)
+    return bytes(data[pos + WORD:pos + WORD + length]).decode("utf-8", errors="replace")
+
+
+def _decode_bytes(data, pos):
+    length = _word_to_int(data, pos)
+    return bytes(data[pos + WORD:pos + WORD + length])
+
+
+def _make_address_decoder():
+    # The set of distinct addresses seen by a client is small; caching the
+    # checksummed form avoids a keccak per decoded address.
+    cache = {}
+
+    def decode_address(data, pos):
+        raw = bytes(data[pos + 12:pos + WORD])
+        address = cache.get(raw)
+        if address is None:
+            address = cache[raw] = Web3.to_checksum_address(raw)
+        return address
+    return decode_address
+
+
+_decode_address = _make_address_decoder()
+
+_STATIC_DECODERS = {
+    "bytes32": _decode_bytes32,
+    "address": _decode_address,
+    "bool": _decode_bool,
+}
+
+
+def _compile_decoder(param):
+    """Return (decode, is_dynamic, head_size) for an ABI output entry
+
+    ``decode(data, pos)`` reads a value whose encoding starts at ``pos``. For
+    dynamic values ``pos`` is where the offset in the enclosing head points to.
+    """
+    abi_type = param["type"]
+    if abi_type.endswith("[]"):
+        element_decoder, element_dynamic, element_size = _compile_decoder(dict(param, type=abi_type[:-2]))
+
+        if element_dynamic:
+            def decode_array(data, pos):
+                base = pos + WORD
+                return [element_decoder(data, base + _word_to_int(data, base + WORD * i))
+                        for i in range(_word_to_int(data, pos))]
+        else:
+            def decode_array(data, pos):
+                base = pos + WORD
+                return [element_decoder(data, base + element_size * i)
+                        for i in range(_word_to_int(data, pos))]
+        return decode_array, True, WORD
+    if abi_type == "tuple":
+        return _compile_tuple_decoder(param["components"])
+    if abi_type == "string":
+        return _decode_string, True, WORD
+    if abi_type == "bytes":
+        return _decode_bytes, True, WORD
+    if abi_type in _STATIC_DECODERS:
+        return _STATIC_DECODERS[abi_type], False, WORD
+    if abi_type.startswith("uint"):
+        return _decode_uint, False, WORD
+    if abi_type.startswith("int"):
+        return _decode_int, False, WORD
+    raise TypeError(f"ABI type '{abi_type}' is not supported by the fast path")
+
+
+def _compile_tuple_decoder(params):
+    fields = []
+    head_offset = 0
+    for param in params:
+        decode, dynamic, size = _compile_decoder(param)
+        fields.append((head_offset, decode, dynamic))
+        head_offset += WORD if dynamic else size
+    is_dynamic = any(dynamic for _, _, dynamic in fields)
+
+    def decode_tuple(data, pos):
+        return tuple(
+            decode(data, pos + _word_to_int(data, pos + offset)) if dynamic else decode(data, pos + offset)
+            for offset, decode, dynamic in fields
+        )
+    return decode_tuple, is_dynamic, head_offset
+
+
+# =============================================================================
+# Compiled functions and contracts
+# =============================================================================
+
+class FastFunction:
+    """A contract function compiled once into a selector, encoder and decoder"""
+
+    def __init__(self, fn_abi):
+        self.name = fn_abi["name"]
+        input_types = ",".join(_canonical_type(param) for param in fn_abi["inputs"])
+        self.signature = f"{self.name}({input_types})"
+        self.selector = bytes(Web3.keccak(text=self.signature)[:4])
+
+        encoders = [_compile_encoder(param) for param in fn_abi["inputs"]]
+        self.static_inputs = not any(dynamic for _, dynamic in encoders)
+        if self.static_inputs:
+            # Static layout: the calldata is simply selector + one word per argument
+            word_encoders = [encode for encode, _ in encoders]
+            self._encode_args = lambda args: b"".join(
+                encode(value) for encode, value in zip(word_encoders, args)
+            )
+        else:
+            self._encode_args = _tuple_encoder(encoders)
+
+        self._decode_outputs = _compile_tuple_decoder(fn_abi["outputs"])[0]
+        self.n_inputs = len(fn_abi["inputs"])
+        self.single_output = len(fn_abi["outputs"]) == 1
+
+    def encode(self, *args):
+        if len(args) != self.n_inputs:
+            raise TypeError(f"{self.signature} expects {self.n_inputs} arguments, got {len(args)}")
+        return "0x" + (self.selector + self._encode_args(args)).hex()
+
+    def decode(self, result):
+        data = bytes.fromhex(result[2:] if isinstance(result, str) else result.hex())
+        decoded = self._decode_outputs(data, 0)
+        return decoded[0] if self.single_output else decoded
+
+
+def _canonical_type(param):
+    abi_type = param["type"]
+    if abi_type.startswith("tuple"):
+        inner = ",".join(_canonical_type(component) for component in param["components"])
+        return f"({inner}){abi_type[len('tuple'):]}"
+    return abi_type
+
+
+class FastContract:
+    """eth_call client for one contract that bypasses web3's ContractFunction path"""
+
+    def __init__(self, w3, address, abi, block_identifier="latest"):
+        self.w3 = w3
+        self.address = Web3.to_checksum_address(address)
+        self.block_identifier = block_identifier
+        self.functions = {}
+        unsupported = []
+        for entry in abi:
+            if entry.get("type") != "function":
+                continue
+            try:
+                self.functions[entry["name"]] = FastFunction(entry)
+            except TypeError:
+                unsupported.append(entry)
+        # Functions with types the compiled codecs do not cover are called through web3
+        self.fallback_names = {entry["name"] for entry in unsupported}
+        self._fallback = w3.eth.contract(address=self.address, abi=unsupported) if unsupported else None
+        self._make_request = w3.provider.make_request
+
+    def call(self, fn_name, *args):
+        if fn_name in self.fallback_names:
+            return self._fallback.functions[fn_name](*args).call(block_identifier=self.block_identifier)
+        function = self.functions[fn_name]
+        response = self._make_request(
+            "eth_call", [{"to": self.address, "data": function.encode(*args)}, self.block_identifier]
+        )
+        if "error" in response:
+            raise RuntimeError(f"{fn_name} reverted: {response['error']}")
+        return function.decode(response["result"])
+
+    def call_batch(self, fn_name, args_list):
+        """Execute many calls of one function in a single JSON-RPC batch request
+
+        Returns one entry per call: the decoded value, or a RuntimeError for a
+        reverted call. Providers without batch support fall back to sequential calls.
+        """
+        return call_many(self.w3, [(self, fn_name, args) for args in args_list], self.block_identifier)
+
+
+def call_many(w3, calls, block_identifier="latest"):
+    """Execute (FastContract, fn_name, args) calls, possibly on different contracts, in one batch request"""
+    for contract, fn_name, _ in calls:
+        if fn_name in contract.fallback_names:
+            raise TypeError(f"{fn_name} uses ABI types the fast path cannot batch; call it with FastContract.call")
+    requests = [
+        ("eth_call", [{"to": contract.address, "data": contract.functions[fn_name].encode(*args)},
+                      block_identifier])
+        for contract, fn_name, args in calls
+    ]
+    if not requests:
+        return []
+    make_batch_request = getattr(w3.provider, "make_batch_request", None)
+    if make_batch_request is None:
+        responses = [w3.provider.make_request(method, params) for method, params in requests]
+    else:
+        responses = make_batch_request(requests)
+        if isinstance(responses, dict):
+            raise RuntimeError(f"Batch request failed: {responses.get('error')}")
+    return [
+        RuntimeError(f"{fn_name} reverted: {response['error']}") if "error" in response
+        else contract.functions[fn_name].decode(response["result"])
+        for (contract, fn_name, _), response in zip(calls, responses)
+    ]
+
+
+# =============================================================================
+# Benchmark against the standard web3 path
+# =============================================================================
+
+def _time_calls(call, args_list):
+    start = time.perf_counter()
+    results = [call(*args) for args in args_list]
+    return time.perf_counter() - start, results
+
+
+def benchmark_fast_path(n_calls=1000, n_resources=50):
+    """Compare standard web3 calls with FastContract calls for the hot view functions"""
+    import pandas as pd
+    import performance_test as pt
+
+    if not pt.registered_data_ids:
+        pt.setup_test_environment(n_transactions=n_resources, n_accounts=10)
+    accounts = pt.test_accounts
+
+    pt.enable_fast_calls()
+    fast = pt.fast_contracts
+
+    def data_id_args():
+        return [(pt.select_key(pt.registered_data_ids),) for _ in range(n_calls)]
+
+    def data_id_account_args():
+        return [(pt.select_key(pt.registered_data_ids), random.choice(accounts)) for _ in range(n_calls)]
+
+    cases = [
+        ("Ownership_Verify", pt.ownership_contract, "verifyOwnership", data_id_account_args),
+        ("Ownership_GetResource", pt.ownership_contract, "getDataResource", data_id_args),
+        ("Processing_Verify", pt.processing_right_contract, "verifyAuthorization", data_id_account_args),
+        ("Processing_GetActive", pt.processing_right_contract, "getActiveAuthorizations", data_id_args),
+    ]
+    if pt.product_ids:
+        cases.append(("Trading_GetHistory", pt.product_trading_contract, "getProductTransactionHistory",
+                      lambda: [(pt.select_key(pt.product_ids),) for _ in range(n_calls)]))
+
+    rows = []
+    for operation, contract, fn_name, make_args in cases:
+        args_list = make_args()
+        web3_time, web3_results = _time_calls(
+            lambda *args: contract.functions[fn_name](*args).call(), args_list
+        )
+        fast_time, fast_results = _time_calls(
+            lambda *args: fast[contract.address].call(fn_name, *args), args_list
+        )
+        matches = sum(_normalize(a) == _normalize(b) for a, b in zip(web3_results, fast_results))
+        rows.append({
+            "Operation": operation,
+            "Calls": n_calls,
+            "Web3_Latency_(ms)": web3_time / n_calls * 1000,
+            "Fast_Latency_(ms)": fast_time / n_calls * 1000,
+            "Web3_TPS": n_calls / web3_time,
+            "Fast_TPS": n_calls / fast_time,
+            "Speedup": web3_time / fast_time,
+            "Result_Match_Rate": matches / n_calls
+        })
+        print(f"{operation}: web3 {web3_time / n_calls * 1000:.3f} ms, "
+              f"fast {fast_time / n_calls * 1000:.3f} ms, speedup {web3_time / fast_time:.2f}x")
+
+    df = pd.DataFrame(rows)
+    df.to_csv("fast_path_benchmark.csv", index=False)
+    return df
+
+
+def _normalize(value):
+    """Normalize web3 and fast-path results (lists vs tuples, HexBytes vs bytes) for comparison"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return value
+
+
+if __name__ == "__main__":
+    print(benchmark_fast_path())
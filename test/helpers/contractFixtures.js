@@ -0,0 +1,96 @@
+// contractFixtures.js - 合约测试夹具：部署、注册数据、创建与出售数据产品
+// 仅在 truffle test 中使用，依赖 truffle 注入的全局 artifacts 与 web3
+const { expect } = require('chai');
+
+const PRICE = '1000000000000000'; // 0.001 ETH
+const MAX_UINT256 = '0x' + 'f'.repeat(64);
+
+// 每个测试部署一套新合约，避免共享 deployed() 实例的状态
+async function deployContracts() {
+  const OwnershipRegistration = artifacts.require('OwnershipRegistrationContract');
+  const ProcessingRightGranting = artifacts.require('ProcessingRightGrantingContract');
+  const ProductTrading = artifacts.require('ProductTradingContract');
+
+  const ownership = await OwnershipRegistration.new();
+  const auth = await ProcessingRightGranting.new(ownership.address);
+  const trading = await ProductTrading.new(ownership.address, auth.address);
+  return { ownership, auth, trading };
+}
+
+function eventArgs(receipt, name) {
+  const log = receipt.logs.find((entry) => entry.event === name);
+  if (!log) {
+    throw new Error(`交易未触发 ${name} 事件`);
+  }
+  return log.args;
+}
+
+async function registerData(ownership, owner) {
+  const receipt = await ownership.registerDataResource(
+    web3.utils.randomHex(32), 'fixture metadata', 'fixture features', { from: owner }
+  );
+  return eventArgs(receipt, 'DataRegistered').dataId;
+}
+
+async function grantRight(auth, dataId, grantor, grantee, duration) {
+  const receipt = await auth.grantProcessingRight(
+    dataId, grantee, duration, 'fixture purpose', 'fixture scope', 'fixture constraints', { from: grantor }
+  );
+  return eventArgs(receipt, 'AuthorizationGranted').authId;
+}
+
+async function createProduct(trading, dataId, creator, derivativeChain = []) {
+  // 元数据带随机后缀，同一区块内创建的产品ID也不会重复
+  const receipt = await trading.createDataProduct(
+    dataId, `fixture product ${web3.utils.randomHex(8)}`, derivativeChain, { from: creator }
+  );
+  return eventArgs(receipt, 'ProductCreated').productId;
+}
+
+async function listProduct(trading, productId, seller, price = PRICE) {
+  return trading.listProductForSale(productId, price, { from: seller });
+}
+
+async function sellProduct(trading, productId, seller, buyer, price = PRICE) {
+  await listProduct(trading, productId, seller, price);
+  return trading.purchaseProduct(productId, { from: buyer, value: price });
+}
+
+async function expectRevert(promise, reason) {
+  try {
+    await promise;
+  } catch (error) {
+    expect(error.message).to.include(reason);
+    return;
+  }
+  expect.fail(`交易应当以 "${reason}" 回滚`);
+}
+
+function rpc(method, params = []) {
+  return new Promise((resolve, reject) => {
+    web3.currentProvider.send(
+      { jsonrpc: '2.0', method, params, id: Date.now() },
+      (error, result) => (error ? reject(error) : resolve(result))
+    );
+  });
+}
+
+// 推进链上时间并出块，使新的 block.timestamp 生效
+async function increaseTime(seconds) {
+  await rpc('evm_increaseTime', [seconds]);
+  await rpc('evm_mine');
+}
+
+module.exports = {
+  PRICE,
+  MAX_UINT256,
+  deployContracts,
+  eventArgs,
+  registerData,
+  grantRight,
+  createProduct,
+  listProduct,
+  sellProduct,
+  expectRevert,
+  increaseTime
+};
@@ -0,0 +1,94 @@
+"""Key access distributions for selecting data IDs, product IDs and auth IDs in benchmark workloads"""
+import bisect
+import random
+
+DISTRIBUTIONS = ("uniform", "zipf", "hotspot", "sequential")
+
+
+class KeyDistribution:
+    """Chooses keys from a list according to a configurable access distribution.
+
+    Keys are ranked by their position in the list: index 0 is the most popular
+    key for ``zipf`` and the first ``hot_key_fraction`` of the list forms the hot
+    set for ``hotspot``. ``sequential`` walks each list in order and wraps around.
+    """
+
+    def __init__(self, name="uniform", zipf_exponent=1.0, hot_key_fraction=0.2,
+                 hot_access_fraction=0.8, seed=None):
+        if name not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown key distribution '{name}', expected one of {DISTRIBUTIONS}")
+        if zipf_exponent <= 0:
+            raise ValueError("zipf_exponent must be positive")
+        if not 0 < hot_key_fraction <= 1 or not 0 <= hot_access_fraction <= 1:
+            raise ValueError("hot_key_fraction must lie in (0, 1] and hot_access_fraction in [0, 1]")
+
+        self.name = name
+        self.zipf_exponent = zipf_exponent
+        self.hot_key_fraction = hot_key_fraction
+        self.hot_access_fraction = hot_access_fraction
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._zipf_cum_weights = []
+        self._cursors = {}
+
+    def choose(self, keys):
+        """Return one key from ``keys`` (a non-empty sequence)"""
+        n = len(keys)
+        if n == 0:
+            raise IndexError("Cannot choose from an empty key list")
+
+        if self.name == "uniform":
+            return keys[self._rng.randrange(n)]
+        if self.name == "zipf":
+            return keys[self._zipf_index(n)]
+        if self.name == "hotspot":
+            n_hot = max(1, int(n * self.hot_key_fraction))
+            if n_hot == n or self._rng.random() < self.hot_access_fraction:
+                return keys[self._rng.randrange(n_hot)]
+            return keys[self._rng.randrange(n_hot, n)]
+
+        # sequential scan, one cursor per key list
+        cursor = self._cursors.get(id(keys), 0)
+        self._cursors[id(keys)] = cursor + 1
+        return keys[cursor % n]
+
+    def _zipf_index(self, n):
+        """Sample a 0-based rank from a Zipf distribution truncated to n keys"""
+        cum_weights = self._zipf_cum_weights
+        if len(cum_weights) < n:
+            # Extend the cached CDF incrementally as key lists grow
+            start = len(cum_weights)
+            total = cum_weights[-1] if cum_weights else 0.0
+            for rank in range(start + 1, n + 1):
+                total += 1.0 / rank ** self.zipf_exponent
+                cum_weights.append(total)
+        target = self._rng.random() * cum_weights[n - 1]
+        return min(bisect.bisect_right(cum_weights, target, 0, n), n - 1)
+
+    def reset(self):
+        """Reset the random state and sequential cursors"""
+        self._rng = random.Random(self.seed)
+        self._cursors.clear()
+
+    def params(self):
+        """Return the distribution parameters relevant to the active distribution"""
+        if self.name == "zipf":
+            return {"zipf_exponent": self.zipf_exponent}
+        if self.name == "hotspot":
+            return {"hot_key_fraction": self.hot_key_fraction,
+                    "hot_access_fraction": self.hot_access_fraction}
+        return {}
+
+    def describe(self):
+        """Return a compact description for result rows, e.g. 'zipf(zipf_exponent=1.2)'"""
+        params = ", ".join(f"{key}={value}" for key, value in self.params().items())
+        return f"{self.name}({params})"
+
+    def result_fields(self):
+        """Return the columns recorded in each benchmark result row"""
+        return {
+            "Key_Distribution": self.name,
+            "Key_Distribution_Params": self.describe(),
+            "Key_Distribution_Seed": self.seed,
+        }
+
@@ -0,0 +1,277 @@
+"""Block-production control and on-chain throughput measurement
+
+By default Ganache mines one block per transaction. Every write measured by
+performance_test.py is therefore shaped by automining, and its TPS says
+little about how the contracts behave under realistic block intervals.
+BlockProducer switches the local node between three block-production
+policies:
+
+* automine - one block per transaction, the node's default
+* interval - automining off, a harness thread calls ``evm_mine`` every
+             ``interval`` seconds, like ``ganache --miner.blockTime``
+* manual   - automining off, ``evm_mine`` after every ``mine_every``
+             submitted transactions
+
+On-chain throughput is computed from the transaction count and timestamp of
+each block the benchmark produced. It can then be compared with the rate at
+which the client submitted transactions and observed them confirmed.
+Ganache block timestamps have one-second resolution, so Chain_TPS is only
+meaningful over windows that span several seconds.
+
+Usage:
+    python mining_modes.py --modes automine interval manual --transactions 500
+    python mining_modes.py --modes interval --interval 0.5 2 --transactions 300
+    python performance_test.py --mining-mode interval --block-interval 1
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from web3 import Web3
+
+from trace_export import maybe_span
+
+MINING_MODES = ("automine", "interval", "manual")
+
+
+# =============================================================================
+# Block production
+# =============================================================================
+
+class BlockProducer:
+    """Applies a block-production policy to the node for the duration of a with block"""
+
+    def __init__(self, w3, mode="automine", interval=1.0, mine_every=10, recorder=None):
+        if mode not in MINING_MODES:
+            raise ValueError(f"Unknown mining mode '{mode}', expected one of {MINING_MODES}")
+        self.w3 = w3
+        self.mode = mode
+        self.interval = interval
+        self.mine_every = mine_every
+        self.recorder = recorder
+        self.blocks_mined = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def describe(self):
+        if self.mode == "interval":
+            return f"interval ({self.interval:g}s)"
+        if self.mode == "manual":
+            return f"manual (every {self.mine_every} tx)"
+        return "automine"
+
+    def result_fields(self):
+        """Mining policy columns for a results row"""
+        return {
+            "Mining_Mode": self.mode,
+            "Block_Interval_(s)": self.interval if self.mode == "interval" else None,
+            "Mine_Every": self.mine_every if self.mode == "manual" else None
+        }
+
+    def _rpc(self, method, params=()):
+        response = self.w3.provider.make_request(method, list(params))
+        if "error" in response:
+            raise RuntimeError(f"{method} failed: {response['error']}")
+        return response.get("result")
+
+    def mine(self):
+        """Mine one block containing the pending transactions"""
+        with self._lock, maybe_span(self.recorder, "evm_mine", category="block"):
+            self._rpc("evm_mine")
+            self._pending = 0
+            self.blocks_mined += 1
+
+    def _tick(self):
+        while not self._stop.wait(self.interval):
+            self.mine()
+
+    def start(self):
+        if self.mode == "automine":
+            return self
+        self._rpc("miner_stop")
+        if self.mode == "interval":
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._tick, name="block-producer", daemon=True)
+            self._thread.start()
+        return self
+
+    def on_submitted(self, count=1):
+        """Tell the producer that transactions were sent; mines in manual mode once enough are pending"""
+        if self.mode == "automine":
+            return
+        with self._lock:
+            self._pending += count
+            due = self.mode == "manual" and self._pending >= self.mine_every
+        if due:
+            self.mine()
+
+    def flush(self):
+        """Mine the transactions still pending in manual mode"""
+        if self.mode == "manual" and self._pending:
+            self.mine()
+
+    def stop(self):
+        """Stop the interval thread, mine leftovers and restore automining"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        # Transactions sent after the last interval tick or below mine_every would wait for the next block otherwise
+        if self._pending:
+            self.mine()
+        if self.mode != "automine":
+            self._rpc("miner_start")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# =============================================================================
+# On-chain throughput
+# =============================================================================
+
+def block_stats(w3, first_block, last_block):
+    """Per-block transaction count, gas and timestamp for blocks first_block..last_block"""
+    rows = []
+    previous = w3.eth.get_block(first_block - 1)["timestamp"] if first_block > 0 else None
+    for number in range(first_block, last_block + 1):
+        block = w3.eth.get_block(number)
+        rows.append({
+            "Block": number,
+            "Timestamp": block["timestamp"],
+            "Transactions": len(block["transactions"]),
+            "Gas_Used": block["gasUsed"],
+            "Gas_Limit": block["gasLimit"],
+            "Block_Time_(s)": block["timestamp"] - previous if previous is not None else None
+        })
+        previous = block["timestamp"]
+    return pd.DataFrame(rows, columns=["Block", "Timestamp", "Transactions", "Gas_Used", "Gas_Limit",
+                                       "Block_Time_(s)"])
+
+
+def chain_throughput(w3, first_block, last_block):
+    """On-chain TPS of a block range, from its transaction counts and block timestamps"""
+    if last_block < first_block:
+        return {"Blocks": 0, "Included_Transactions": 0, "Chain_TPS": 0.0,
+                "Txs_per_Block": 0.0, "Gas_Utilization": 0.0}
+    blocks = block_stats(w3, first_block, last_block)
+    included = int(blocks["Transactions"].sum())
+    # The range starts when its parent block was sealed
+    span = blocks["Timestamp"].iloc[-1] - (blocks["Timestamp"].iloc[0] - (blocks["Block_Time_(s)"].iloc[0] or 0))
+    return {
+        "Blocks": len(blocks),
+        "Included_Transactions": included,
+        "Chain_TPS": float(included / span) if span > 0 else np.nan,
+        "Txs_per_Block": included / len(blocks),
+        "Gas_Utilization": float((blocks["Gas_Used"] / blocks["Gas_Limit"]).mean())
+    }
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+def _watch_blocks(w3, tx_hashes, first_block, timeout=120, poll_interval=0.01):
+    """Poll new blocks and return the wall time at which each transaction was first seen included"""
+    remaining = set(tx_hashes)
+    seen_at = {}
+    next_block = first_block
+    deadline = time.time() + timeout
+    while remaining and time.time() < deadline:
+        head = w3.eth.block_number
+        while next_block <= head:
+            now = time.time()
+            for tx_hash in w3.eth.get_block(next_block)["transactions"]:
+                tx_hash = bytes(tx_hash)
+                if tx_hash in remaining:
+                    remaining.discard(tx_hash)
+                    seen_at[tx_hash] = now
+            next_block += 1
+        if remaining:
+            time.sleep(poll_interval)
+    return seen_at
+
+
+def run_mode(w3, contract, accounts, producer, n_transactions, gas=300000):
+    """Submit n registrations without waiting, then measure client-side and on-chain throughput"""
+    first_block = w3.eth.block_number + 1
+    # Several transactions per account wait in the pool at once, so nonces are assigned locally
+    nonces = {account: w3.eth.get_transaction_count(account, "pending") for account in accounts}
+    submitted = []
+    with producer:
+        start = time.time()
+        for i in range(n_transactions):
+            sender = accounts[i % len(accounts)]
+            data_hash = Web3.keccak(text=f"mining-{producer.mode}-{time.time_ns()}-{i}")
+            tx_hash = contract.functions.registerDataResource(
+                data_hash, f"Mining mode benchmark {i}", "mining"
+            ).transact({"from": sender, "gas": gas, "nonce": nonces[sender]})
+            nonces[sender] += 1
+            submitted.append((bytes(tx_hash), time.time()))
+            producer.on_submitted()
+        submit_end = time.time()
+        producer.flush()
+        seen_at = _watch_blocks(w3, [tx_hash for tx_hash, _ in submitted], first_block)
+        last_block = w3.eth.block_number
+
+    statuses = [w3.eth.get_transaction_receipt(tx_hash)["status"] for tx_hash, _ in submitted
+                if tx_hash in seen_at]
+    latencies = np.array([(seen_at[tx_hash] - sent) * 1000 for tx_hash, sent in submitted if tx_hash in seen_at])
+    confirmed_end = max(seen_at.values()) if seen_at else submit_end
+    successful = int(sum(statuses))
+    return {
+        **producer.result_fields(),
+        "Submitted": n_transactions,
+        "Confirmed": len(seen_at),
+        "Successful": successful,
+        "Client_Submit_TPS": n_transactions / (submit_end - start),
+        "Client_Confirmed_TPS": successful / (confirmed_end - start),
+        **chain_throughput(w3, first_block, last_block),
+        "Inclusion_Latency_Mean_(ms)": latencies.mean() if len(latencies) else np.nan,
+        "Inclusion_Latency_P95_(ms)": np.percentile(latencies, 95) if len(latencies) else np.nan
+    }
+
+
+def run_mining_benchmark(w3, contract, accounts, modes=MINING_MODES, n_transactions=500,
+                         intervals=(1.0,), mine_every=(10,)):
+    """Run the same registration stream under each block-production policy"""
+    rows = []
+    for mode in modes:
+        if mode == "interval":
+            producers = [BlockProducer(w3, mode, interval=interval) for interval in intervals]
+        elif mode == "manual":
+            producers = [BlockProducer(w3, mode, mine_every=n) for n in mine_every]
+        else:
+            producers = [BlockProducer(w3, mode)]
+        for producer in producers:
+            print(f"Mining mode {producer.describe()}: {n_transactions} registrations")
+            row = run_mode(w3, contract, accounts, producer, n_transactions)
+            print(f"  client submit {row['Client_Submit_TPS']:.1f} TPS, confirmed {row['Client_Confirmed_TPS']:.1f} TPS, "
+                  f"chain {row['Chain_TPS']:.1f} TPS over {row['Blocks']} blocks")
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import performance_test as pt
+
+    parser = argparse.ArgumentParser(description="Compare client and on-chain throughput under each mining mode")
+    parser.add_argument("--modes", nargs="+", choices=MINING_MODES, default=list(MINING_MODES))
+    parser.add_argument("--transactions", type=int, default=500, help="Registrations per mining mode")
+    parser.add_argument("--interval", nargs="+", type=float, default=[1.0], help="Block intervals in seconds")
+    parser.add_argument("--mine-every", nargs="+", type=int, default=[10],
+                        help="Transactions per block in manual mode")
+    parser.add_argument("--accounts", type=int, default=10, help="Number of sending accounts")
+    args = parser.parse_args()
+
+    results = run_mining_benchmark(pt.w3, pt.ownership_contract, pt.w3.eth.accounts[:args.accounts],
+                                   args.modes, args.transactions, args.interval, args.mine_every)
+    results.to_csv("mining_mode_throughput.csv", index=False)
+    print(results.round(2).to_string(index=False))
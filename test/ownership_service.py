@@ -0,0 +1,392 @@
+"""Asyncio HTTP ownership/authorization verification service with request coalescing and micro-batching
+
+Endpoints (GET, JSON responses):
+
+* /ownership?dataId=0x..&address=0x..      - verifyOwnership(dataId, address)
+* /authorization?dataId=0x..&address=0x..  - verifyAuthorization(dataId, grantee)
+* /stats                                   - request, coalescing and batching counters
+* /health
+
+Identical queries that arrive while one is already in flight share its
+result instead of reaching the node again. Distinct queries are collected for
+up to ``window_ms`` milliseconds, or until ``max_batch`` are pending, and
+sent as a single JSON-RPC batch of eth_calls. The load test drives the
+service and the node itself with the same query stream, over the same number
+of concurrent connections, and reports QPS and tail latency for both.
+
+Usage:
+    python ownership_service.py --serve --port 8600 --window-ms 2
+    python ownership_service.py --load-test --requests 5000 --concurrency 64 --distribution zipf
+    python ownership_service.py --load-test --concurrency 64 --trace load_test_trace.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, web
+from web3 import Web3
+
+from fast_abi import FastContract, call_many
+from key_distributions import DISTRIBUTIONS, KeyDistribution
+from trace_export import SpanRecorder, maybe_span
+
+QUERIES = {
+    "ownership": ("ownership", "verifyOwnership"),
+    "authorization": ("processing", "verifyAuthorization")
+}
+DEFAULT_PORT = 8600
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 100
+
+
+class OwnershipService:
+    """Answers ownership and authorization queries with coalescing and micro-batching"""
+
+    def __init__(self, w3, ownership_address, processing_address, window_ms=DEFAULT_WINDOW_MS,
+                 max_batch=DEFAULT_MAX_BATCH, coalesce=True, rpc_threads=4):
+        import performance_test as pt
+        self.w3 = w3
+        self.contracts = {
+            "ownership": FastContract(w3, ownership_address, pt.ownership_abi),
+            "processing": FastContract(w3, processing_address, pt.processing_right_abi)
+        }
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.coalesce = coalesce
+        self._executor = ThreadPoolExecutor(max_workers=rpc_threads)
+        self._inflight = {}
+        self._pending = []
+        self._batch_tasks = set()
+        self._flush_handle = None
+        self.stats = {"requests": 0, "coalesced": 0, "upstream_calls": 0, "batches": 0, "errors": 0}
+
+    async def query(self, kind, data_id, address):
+        """Return the boolean answer of one query"""
+        self.stats["requests"] += 1
+        key = (kind, data_id.lower(), address.lower())
+        future = self._inflight.get(key) if self.coalesce else None
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        if self.coalesce:
+            self._inflight[key] = future
+        self._pending.append((key, future))
+        if len(self._pending) >= self.max_batch or self.window <= 0:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # The event loop only keeps weak references to tasks
+            task = asyncio.ensure_future(self._execute(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _execute(self, batch):
+        calls = []
+        for (kind, data_id, address), _ in batch:
+            contract_name, fn_name = QUERIES[kind]
+            calls.append((self.contracts[contract_name], fn_name, (data_id, Web3.to_checksum_address(address))))
+        self.stats["batches"] += 1
+        self.stats["upstream_calls"] += len(calls)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, call_many, self.w3, calls)
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (key, future), result in zip(batch, results):
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if isinstance(result, Exception):
+                self.stats["errors"] += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["mean_batch_size"] = stats["upstream_calls"] / stats["batches"] if stats["batches"] else 0
+        stats["upstream_calls_per_request"] = stats["upstream_calls"] / stats["requests"] if stats["requests"] else 0
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+# =============================================================================
+# HTTP layer
+# =============================================================================
+
+def _valid_hex(value, n_bytes):
+    return isinstance(value, str) and value.startswith("0x") and len(value) == 2 + 2 * n_bytes and \
+        all(c in "0123456789abcdefABCDEF" for c in value[2:])
+
+
+def make_app(service):
+    async def handle_query(request):
+        kind = request.match_info["kind"]
+        data_id, address = request.query.get("dataId"), request.query.get("address")
+        if not _valid_hex(data_id, 32) or not _valid_hex(address, 20):
+            return web.json_response({"error": "dataId must be bytes32 hex and address a 20-byte hex address"},
+                                     status=400)
+        try:
+            result = await service.query(kind, data_id, address)
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=502)
+        return web.json_response({"dataId": data_id, "address": address, kind: result})
+
+    async def handle_stats(request):
+        return web.json_response(service.snapshot())
+
+    async def handle_health(request):
+        return web.json_response({"status": "ok"})
+
+    async def on_cleanup(app):
+        service.close()
+
+    app = web.Application()
+    app.router.add_get("/{kind:ownership|authorization}", handle_query)
+    app.router.add_get("/stats", handle_stats)
+    app.router.add_get("/health", handle_health)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def serve(port=DEFAULT_PORT, ownership_address=None, processing_address=None, **service_kwargs):
+    import performance_test as pt
+    service = OwnershipService(
+        pt.w3,
+        ownership_address or pt.ownership_contract.address,
+        processing_address or pt.processing_right_contract.address,
+        **service_kwargs
+    )
+    print(f"Ownership service listening on http://127.0.0.1:{port} "
+          f"(window {service.window * 1000:.1f} ms, max batch {service.max_batch}, coalesce {service.coalesce})")
+    web.run_app(make_app(service), host="127.0.0.1", port=port, print=None)
+
+
+# =============================================================================
+# Load test
+# =============================================================================
+
+def build_queries(n_requests, data_ids, accounts, distribution, auth_fraction=0.3, seed=0):
+    """Generate (kind, dataId, address) queries with dataIds drawn from the key distribution"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_requests):
+        data_id = distribution.choose(data_ids)
+        kind = "authorization" if rng.random() < auth_fraction else "ownership"
+        queries.append((kind, Web3.to_hex(data_id), rng.choice(accounts)))
+    return queries
+
+
+async def _drive(queries, concurrency, send, recorder=None, label="load"):
+    """Send queries over `concurrency` workers and return (latencies in ms, errors, wall seconds)"""
+    latencies, errors = [], 0
+    position = 0
+
+    async def worker(index):
+        nonlocal position, errors
+        lane = f"{label} worker {index:03d}"
+        while position < len(queries):
+            query = queries[position]
+            position += 1
+            start = time.perf_counter()
+            try:
+                with maybe_span(recorder, query[0], account=query[2], category="call", lane=lane, dataId=query[1]):
+                    await send(query)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                errors += 1
+
+    if recorder is not None:
+        recorder.mark(label, lane=f"{label} worker 000")
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def _run_direct(queries, concurrency, node_url, contracts, recorder=None):
+    timeout = ClientTimeout(total=60)
+    async with ClientSession(connector=TCPConnector(limit=concurrency), timeout=timeout) as session:
+        async def send(query):
+            kind, data_id, address = query
+            contract_name, fn_name = QUERIES[kind]
+            contract = contracts[contract_name]
+            payload = {"jsonrpc": "2.0", "id": 1, "method": "eth_call", "params": [
+                {"to": contract.address, "data": contract.functions[fn_name].encode(data_id, address)}, "latest"
+            ]}
+            async with session.post(node_url, json=payload) as response:
+                body = await response.json()
+                if "error" in body:
+                    raise RuntimeError(body["error"])
+                return contract.functions[fn_name].decode(body["result"])
+
+        return await _drive(queries, concurrency, send, recorder, "node_direct")
+
+
+async def _run_service(queries, concurrency, service_url, recorder=None, label="service"):
+    timeout = ClientTimeout(total=60)
+    async with ClientSession(connector=TCPConnector(limit=concurrency), timeout=timeout) as session:
+        async def send(query):
+            kind, data_id, address = query
+            async with session.get(f"{service_url}/{kind}", params={"dataId": data_id, "address": address}) as response:
+                if response.status != 200:
+                    raise RuntimeError(await response.text())
+                return (await response.json())[kind]
+
+        latencies, errors, wall = await _drive(queries, concurrency, send, recorder, label)
+        async with session.get(f"{service_url}/stats") as response:
+            stats = await response.json()
+        return latencies, errors, wall, stats
+
+
+def _result_row(label, latencies, errors, wall, stats=None):
+    ordered = sorted(latencies) or [0.0]
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    row = {
+        "Target": label,
+        "Requests": len(latencies) + errors,
+        "Errors": errors,
+        "QPS": len(latencies) / wall if wall > 0 else 0,
+        "Mean_Latency_(ms)": statistics.fmean(ordered),
+        "P50_Latency_(ms)": percentile(0.50),
+        "P95_Latency_(ms)": percentile(0.95),
+        "P99_Latency_(ms)": percentile(0.99),
+        "Max_Latency_(ms)": ordered[-1]
+    }
+    if stats:
+        row.update({
+            "Upstream_Calls": stats["upstream_calls"],
+            "Upstream_Batches": stats["batches"],
+            "Coalesced": stats["coalesced"],
+            "Mean_Batch_Size": stats["mean_batch_size"]
+        })
+    return row
+
+
+def _start_service(port, ownership_address, processing_address, window_ms, max_batch, coalesce):
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+               "--ownership-address", ownership_address, "--processing-address", processing_address,
+               "--window-ms", str(window_ms), "--max-batch", str(max_batch)]
+    if not coalesce:
+        command.append("--no-coalesce")
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def wait_ready():
+        async with ClientSession() as session:
+            for _ in range(200):
+                try:
+                    async with session.get(f"http://127.0.0.1:{port}/health") as response:
+                        if response.status == 200:
+                            return
+                except OSError:
+                    pass
+                await asyncio.sleep(0.1)
+        raise RuntimeError("Ownership service did not start")
+
+    try:
+        asyncio.run(wait_ready())
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+
+def run_load_test(n_requests=5000, concurrency=64, distribution=None, auth_fraction=0.3,
+                  window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH, port=DEFAULT_PORT,
+                  n_resources=200, recorder=None):
+    """Compare direct node calls with the service without and with micro-batching"""
+    import performance_test as pt
+
+    if not pt.registered_data_ids:
+        pt.setup_test_environment(n_transactions=n_resources, n_accounts=10)
+    distribution = distribution or KeyDistribution("zipf", seed=0)
+    queries = build_queries(n_requests, pt.registered_data_ids, pt.test_accounts, distribution, auth_fraction)
+    ownership_address = pt.ownership_contract.address
+    processing_address = pt.processing_right_contract.address
+    contracts = {
+        "ownership": FastContract(pt.w3, ownership_address, pt.ownership_abi),
+        "processing": FastContract(pt.w3, processing_address, pt.processing_right_abi)
+    }
+
+    print(f"\nLoad test: {n_requests} requests, concurrency {concurrency}, keys {distribution.describe()}")
+    rows = [_result_row("node_direct", *asyncio.run(
+        _run_direct(queries, concurrency, pt.w3.provider.endpoint_uri, contracts, recorder)))]
+    print(f"node_direct: {rows[-1]['QPS']:.0f} QPS, p99 {rows[-1]['P99_Latency_(ms)']:.1f} ms")
+
+    variants = [
+        ("service_coalesce", 0, True),
+        (f"service_coalesce_batch_{window_ms:g}ms", window_ms, True)
+    ]
+    for label, window, coalesce in variants:
+        process = _start_service(port, ownership_address, processing_address, window, max_batch, coalesce)
+        try:
+            rows.append(_result_row(label, *asyncio.run(
+                _run_service(queries, concurrency, f"http://127.0.0.1:{port}", recorder, label))))
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{label}: {rows[-1]['QPS']:.0f} QPS, p99 {rows[-1]['P99_Latency_(ms)']:.1f} ms, "
+              f"{rows[-1]['Upstream_Calls']} upstream calls in {rows[-1]['Upstream_Batches']} batches")
+
+    df = pd.DataFrame(rows)
+    df["Key_Distribution"] = distribution.describe()
+    df["Concurrency"] = concurrency
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async ownership verification service")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--serve", action="store_true", help="Run the HTTP service")
+    mode.add_argument("--load-test", action="store_true", help="Compare the service with direct node calls")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ownership-address", default=None, help="Override the harness ownership contract")
+    parser.add_argument("--processing-address", default=None, help="Override the harness processing contract")
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS, help="Micro-batching window")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Flush once this many are pending")
+    parser.add_argument("--no-coalesce", action="store_true", help="Do not share results of identical requests")
+    parser.add_argument("--requests", type=int, default=5000, help="Load test requests")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent load test connections")
+    parser.add_argument("--auth-fraction", type=float, default=0.3, help="Share of authorization queries")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="zipf", help="dataId access distribution")
+    parser.add_argument("--zipf-exponent", type=float, default=1.0)
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                        help="Write a Chrome trace-event JSON timeline of the load test requests")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.ownership_address, args.processing_address, window_ms=args.window_ms,
+              max_batch=args.max_batch, coalesce=not args.no_coalesce)
+    else:
+        recorder = SpanRecorder("ownership_service load test").track_gc() if args.trace else None
+        results = run_load_test(
+            args.requests, args.concurrency,
+            KeyDistribution(args.distribution, zipf_exponent=args.zipf_exponent, seed=0),
+            args.auth_fraction, args.window_ms, args.max_batch, args.port, recorder=recorder
+        )
+        if recorder is not None:
+            recorder.untrack_gc()
+            print(f"Wrote {recorder.export_chrome_trace(args.trace)} trace events to {args.trace}")
+        results.to_csv("ownership_service_load_test.csv", index=False)
+        print(results.round(2).to_string(index=False))
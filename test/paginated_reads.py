@@ -0,0 +1,265 @@
+"""Paginated history and portfolio reads with page prefetching
+
+getProductTransactionHistory and getUserProducts return whole lists in one
+eth_call, so their cost grows with the history and eventually hits the
+node's call gas cap. The contracts now keep per-product sale and per-owner
+product indexes and expose offset/limit views that return one page plus the
+total length:
+
+* ProductTradingContract.getProductTransactionHistoryPage(productId, offset, limit)
+* ProductTradingContract.getUserProductsPage(user, offset, limit)
+* ProductTradingContract.getUserTransactionsPage(user, offset, limit)
+* OwnershipRegistrationContract.getOwnerDataIdsPage(owner, offset, limit)
+
+PageIterator walks such a view page by page. With prefetch on, a worker
+thread fetches the next page while the caller processes the current one, so
+a full scan waits for roughly one round trip per page less than a
+sequential one.
+
+The benchmark grows one product's sale history (alternating listing and
+purchase between two accounts) and one account's portfolio, and at each
+size measures head- and tail-page latency, full-scan throughput with and
+without prefetch, and the unpaginated call.
+
+Usage:
+    python paginated_reads.py --sizes 10 100 1000 --page-size 50
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from web3 import Web3
+
+from contract_events import PRODUCT_CREATED_TOPIC
+from workload_model import GAS_LIMITS, FailureLog, transact_checked
+
+DEFAULT_PAGE_SIZE = 50
+PRICE = 1000000000000000
+
+
+# =============================================================================
+# Page iteration
+# =============================================================================
+
+class PageIterator:
+    """Iterates the pages of an offset/limit view, optionally fetching page k+1 while page k is consumed"""
+
+    def __init__(self, fetch_page, page_size=DEFAULT_PAGE_SIZE, prefetch=True, offset=0):
+        if page_size <= 0:
+            raise ValueError("page_size must be positive")
+        # fetch_page(offset, limit) returns (items, total)
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.offset = offset
+        self.total = None
+        self.page_latencies = []
+
+    def _fetch(self, offset):
+        start = time.perf_counter()
+        items, total = self.fetch_page(offset, self.page_size)
+        self.page_latencies.append((time.perf_counter() - start) * 1000)
+        return offset, list(items), total
+
+    def __iter__(self):
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-prefetch") if self.prefetch else None
+        try:
+            page = self._fetch(self.offset)
+            while page is not None:
+                offset, items, self.total = page
+                next_offset = offset + len(items)
+                # A short or empty page means the end, even if the list grew meanwhile
+                has_next = len(items) == self.page_size and next_offset < self.total
+                pending = executor.submit(self._fetch, next_offset) if executor and has_next else None
+                if items:
+                    yield items
+                if pending is not None:
+                    page = pending.result()
+                else:
+                    page = self._fetch(next_offset) if has_next else None
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    def items(self):
+        """Iterate over single items across all pages"""
+        for page in self:
+            yield from page
+
+
+def product_history_pages(trading, product_id, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+    """Pages of a product's sale transactions, oldest first"""
+    return PageIterator(lambda offset, limit: trading.functions.getProductTransactionHistoryPage(
+        product_id, offset, limit).call(), page_size, prefetch)
+
+
+def user_product_pages(trading, user, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+    """Pages of the products currently owned by a user"""
+    return PageIterator(lambda offset, limit: trading.functions.getUserProductsPage(
+        user, offset, limit).call(), page_size, prefetch)
+
+
+def user_transaction_pages(trading, user, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+    """Pages of the sales a user took part in as buyer or seller"""
+    return PageIterator(lambda offset, limit: trading.functions.getUserTransactionsPage(
+        user, offset, limit).call(), page_size, prefetch)
+
+
+def owner_data_id_pages(ownership, owner, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+    """Pages of the dataIds registered by an owner"""
+    return PageIterator(lambda offset, limit: ownership.functions.getOwnerDataIdsPage(
+        owner, offset, limit).call(), page_size, prefetch)
+
+
+# =============================================================================
+# History growth
+# =============================================================================
+
+def _send(w3, function, params, operation, failure_log):
+    receipt = transact_checked(w3, function, {**params, "gas": GAS_LIMITS[operation]}, operation, failure_log)
+    if receipt is None:
+        raise RuntimeError(f"{operation} failed while growing the benchmark state")
+    return receipt
+
+
+def register_source(w3, ownership, owner, failure_log):
+    """Register a fresh data resource for owner and return its dataId"""
+    data_hash = Web3.keccak(text=f"pagination-source-{owner}-{time.time_ns()}")
+    _send(w3, ownership.functions.registerDataResource(data_hash, "Pagination benchmark source", "pagination"),
+          {"from": owner}, "Ownership_Register", failure_log)
+    return ownership.functions.getDataResourceByHash(data_hash).call()[5]
+
+
+def create_product(w3, trading, data_id, creator, failure_log):
+    """Create a product from data_id and return its productId"""
+    receipt = _send(w3, trading.functions.createDataProduct(
+        data_id, f"Pagination benchmark product {time.time_ns()}", []
+    ), {"from": creator}, "Trading_CreateProduct", failure_log)
+    for log in receipt["logs"]:
+        if log["topics"] and Web3.to_hex(log["topics"][0]) == PRODUCT_CREATED_TOPIC:
+            return bytes(log["topics"][1])
+    raise RuntimeError("ProductCreated event not found in receipt")
+
+
+def grow_history(w3, trading, product_id, owner, other, n_sales, failure_log):
+    """Sell a product back and forth between two accounts n_sales times; return its final owner"""
+    for _ in range(n_sales):
+        _send(w3, trading.functions.listProductForSale(product_id, PRICE), {"from": owner},
+              "Trading_ListProduct", failure_log)
+        _send(w3, trading.functions.purchaseProduct(product_id), {"from": other, "value": PRICE},
+              "Trading_PurchaseProduct", failure_log)
+        owner, other = other, owner
+    return owner
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+def _latency_stats(fetch, offset, page_size, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fetch(offset, page_size)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.mean(latencies), np.percentile(latencies, 95)
+
+
+def _scan_rate(make_iterator, prefetch):
+    start = time.perf_counter()
+    count = sum(len(page) for page in make_iterator(prefetch))
+    duration = time.perf_counter() - start
+    return count / duration if duration > 0 else np.nan
+
+
+def measure_reads(name, fetch, make_iterator, unpaginated, size, page_size, repeats):
+    """Page latency, scan throughput and unpaginated latency of one list at its current size"""
+    total = fetch(0, 0)[1]
+    head_mean, head_p95 = _latency_stats(fetch, 0, page_size, repeats)
+    tail_mean, tail_p95 = _latency_stats(fetch, max(total - page_size, 0), page_size, repeats)
+    sequential = _scan_rate(make_iterator, False)
+    prefetched = _scan_rate(make_iterator, True)
+    row = {
+        "Read": name,
+        "Size": size,
+        "Length": total,
+        "Page_Size": page_size,
+        "Head_Page_Mean_(ms)": head_mean,
+        "Head_Page_P95_(ms)": head_p95,
+        "Tail_Page_Mean_(ms)": tail_mean,
+        "Tail_Page_P95_(ms)": tail_p95,
+        "Scan_Items_per_s": sequential,
+        "Scan_Prefetch_Items_per_s": prefetched,
+        "Prefetch_Speedup": prefetched / sequential if sequential else np.nan,
+        "Unpaginated_(ms)": np.nan,
+        "Unpaginated_Error": None
+    }
+    if unpaginated is not None:
+        try:
+            row["Unpaginated_(ms)"] = _latency_stats(lambda *_: unpaginated(), 0, 0, repeats)[0]
+        except Exception as e:
+            # Long lists run into the node's gas cap for eth_call
+            row["Unpaginated_Error"] = str(e)[:200]
+    return row
+
+
+def run_pagination_benchmark(w3, ownership, trading, accounts, sizes=(10, 100, 1000),
+                             page_size=DEFAULT_PAGE_SIZE, repeats=20):
+    """Grow a sale history and a portfolio to each size and measure paginated and unpaginated reads"""
+    failure_log = FailureLog()
+    seller, buyer, collector = accounts[0], accounts[1], accounts[2]
+    product_id = create_product(w3, trading, register_source(w3, ownership, seller, failure_log),
+                                seller, failure_log)
+    portfolio_source = register_source(w3, ownership, collector, failure_log)
+    owner, other = seller, buyer
+
+    history_reads = {
+        "Product_History": (
+            lambda offset, limit: trading.functions.getProductTransactionHistoryPage(product_id, offset, limit).call(),
+            lambda prefetch: product_history_pages(trading, product_id, page_size, prefetch),
+            lambda: trading.functions.getProductTransactionHistory(product_id).call()),
+        "User_Transactions": (
+            lambda offset, limit: trading.functions.getUserTransactionsPage(seller, offset, limit).call(),
+            lambda prefetch: user_transaction_pages(trading, seller, page_size, prefetch),
+            None)
+    }
+    portfolio_read = (
+        lambda offset, limit: trading.functions.getUserProductsPage(collector, offset, limit).call(),
+        lambda prefetch: user_product_pages(trading, collector, page_size, prefetch),
+        lambda: trading.functions.getUserProducts(collector).call())
+
+    rows = []
+    history = portfolio = 0
+    for size in sorted(sizes):
+        print(f"Growing product history and portfolio to {size}")
+        owner = grow_history(w3, trading, product_id, owner, other, size - history, failure_log)
+        other = buyer if owner == seller else seller
+        for _ in range(size - portfolio):
+            create_product(w3, trading, portfolio_source, collector, failure_log)
+        history = portfolio = size
+
+        for name, (fetch, make_iterator, unpaginated) in history_reads.items():
+            rows.append(measure_reads(name, fetch, make_iterator, unpaginated, size, page_size, repeats))
+        rows.append(measure_reads("User_Products", *portfolio_read, size, page_size, repeats))
+        for row in rows[-3:]:
+            print(f"  {row['Read']}: head {row['Head_Page_Mean_(ms)']:.2f} ms, tail {row['Tail_Page_Mean_(ms)']:.2f} ms, "
+                  f"scan {row['Scan_Items_per_s']:.0f} items/s, prefetch {row['Scan_Prefetch_Items_per_s']:.0f} items/s")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import performance_test as pt
+
+    parser = argparse.ArgumentParser(description="Benchmark paginated history and portfolio reads")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1000],
+                        help="Sale history and portfolio lengths to measure at")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Items per page")
+    parser.add_argument("--repeats", type=int, default=20, help="Calls per page latency measurement")
+    args = parser.parse_args()
+
+    results = run_pagination_benchmark(pt.w3, pt.ownership_contract, pt.product_trading_contract,
+                                       pt.w3.eth.accounts[:3], args.sizes, args.page_size, args.repeats)
+    results.to_csv("paginated_reads.csv", index=False)
+    print(results.round(2).to_string(index=False))
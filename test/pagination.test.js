@@ -0,0 +1,154 @@
+const { expect } = require('chai');
+const {
+  MAX_UINT256,
+  deployContracts,
+  registerData,
+  createProduct,
+  sellProduct
+} = require('./helpers/contractFixtures');
+
+contract('分页读取测试', (accounts) => {
+  const [alice, bob] = accounts;
+
+  let ownership;
+  let trading;
+
+  beforeEach(async () => {
+    ({ ownership, trading } = await deployContracts());
+  });
+
+  describe('持有产品索引', () => {
+    it('卖出列表末尾的产品后索引正确', async () => {
+      const [p1, p2, p3] = await createProducts(alice, 3);
+
+      await sellProduct(trading, p3, alice, bob);
+
+      expect(await userProductIds(alice)).to.deep.equal([p1, p2]);
+      expect(await userProductIds(bob)).to.deep.equal([p3]);
+
+      // 只剩一个产品时，它既是末尾也是唯一元素
+      await sellProduct(trading, p2, alice, bob);
+      await sellProduct(trading, p1, alice, bob);
+
+      expect(await userProductIds(alice)).to.deep.equal([]);
+      expect(await userProductIds(bob)).to.deep.equal([p3, p2, p1]);
+    });
+
+    it('卖出列表中间的产品后由末尾产品补位', async () => {
+      const [p1, p2, p3, p4] = await createProducts(alice, 4);
+
+      await sellProduct(trading, p2, alice, bob);
+
+      expect(await userProductIds(alice)).to.deep.equal([p1, p4, p3]);
+      expect(await userProductIds(bob)).to.deep.equal([p2]);
+
+      // 补位后的位置记录必须正确，否则再次移除会删错元素
+      await sellProduct(trading, p4, alice, bob);
+
+      expect(await userProductIds(alice)).to.deep.equal([p1, p3]);
+      expect(await userProductIds(bob)).to.deep.equal([p2, p4]);
+    });
+
+    it('产品卖回原所有者后只出现一次', async () => {
+      const [p1, p2] = await createProducts(alice, 2);
+
+      await sellProduct(trading, p1, alice, bob);
+      await sellProduct(trading, p1, bob, alice);
+
+      expect(await userProductIds(alice)).to.deep.equal([p2, p1]);
+      expect(await userProductIds(bob)).to.deep.equal([]);
+
+      const { page, total } = await trading.getProductTransactionHistoryPage(p1, 0, MAX_UINT256);
+      expect(total.toString()).to.equal('2');
+      expect(page.map((tx) => [tx.seller, tx.buyer])).to.deep.equal([[alice, bob], [bob, alice]]);
+
+      const aliceTransactions = await trading.getUserTransactionsPage(alice, 0, MAX_UINT256);
+      expect(aliceTransactions.total.toString()).to.equal('2');
+    });
+  });
+
+  describe('分页边界', () => {
+    let productIds;
+    let dataIds;
+    let soldProduct;
+
+    beforeEach(async () => {
+      productIds = await createProducts(alice, 3);
+      dataIds = [await registerData(ownership, alice), await registerData(ownership, alice)];
+      soldProduct = productIds[0];
+      await sellProduct(trading, soldProduct, alice, bob);
+      await sellProduct(trading, soldProduct, bob, alice);
+    });
+
+    it('offset 超过总数时返回空页和总数', async () => {
+      const products = await trading.getUserProductsPage(alice, 10, 2);
+      expect(products.page).to.have.length(0);
+      expect(products.total.toString()).to.equal('3');
+
+      const history = await trading.getProductTransactionHistoryPage(soldProduct, 3, 1);
+      expect(history.page).to.have.length(0);
+      expect(history.total.toString()).to.equal('2');
+
+      // offset 取最大值也不能溢出
+      const owned = await ownership.getOwnerDataIdsPage(alice, MAX_UINT256, MAX_UINT256);
+      expect(owned.page).to.have.length(0);
+      expect(owned.total.toString()).to.equal('3');
+    });
+
+    it('limit 为 0 时返回空页和总数', async () => {
+      const products = await trading.getUserProductsPage(alice, 0, 0);
+      expect(products.page).to.have.length(0);
+      expect(products.total.toString()).to.equal('3');
+
+      const transactions = await trading.getUserTransactionsPage(bob, 1, 0);
+      expect(transactions.page).to.have.length(0);
+      expect(transactions.total.toString()).to.equal('2');
+
+      const owned = await ownership.getOwnerDataIdsPage(alice, 0, 0);
+      expect(owned.page).to.have.length(0);
+      expect(owned.total.toString()).to.equal('3');
+    });
+
+    it('limit 为 uint256 最大值时返回 offset 之后的全部元素', async () => {
+      const products = await trading.getUserProductsPage(alice, 1, MAX_UINT256);
+      expect(products.page).to.have.length(2);
+      expect(products.total.toString()).to.equal('3');
+
+      const owned = await ownership.getOwnerDataIdsPage(alice, 0, MAX_UINT256);
+      expect(owned.page.slice(1)).to.deep.equal(dataIds);
+      expect(owned.total.toString()).to.equal('3');
+
+      // 不分页的旧接口以 type(uint256).max 调用分页实现
+      const allProducts = await trading.getUserProducts(alice);
+      expect(allProducts.map((product) => product.productId))
+        .to.deep.equal(await userProductIds(alice));
+
+      const history = await trading.getProductTransactionHistory(soldProduct);
+      expect(history).to.have.length(2);
+    });
+
+    it('逐页读取拼接结果与整表一致', async () => {
+      const pages = [];
+      for (let offset = 0; offset < 3; offset += 2) {
+        const { page } = await trading.getUserProductsPage(alice, offset, 2);
+        pages.push(...page.map((product) => product.productId));
+      }
+      expect(pages).to.deep.equal(await userProductIds(alice));
+    });
+  });
+
+  async function createProducts(owner, count) {
+    const dataId = await registerData(ownership, owner);
+    const productIds = [];
+    for (let i = 0; i < count; i++) {
+      productIds.push(await createProduct(trading, dataId, owner));
+    }
+    return productIds;
+  }
+
+  async function userProductIds(user) {
+    const { page, total } = await trading.getUserProductsPage(user, 0, MAX_UINT256);
+    expect(total.toString()).to.equal(String(page.length));
+    return page.map((product) => product.productId);
+  }
+});
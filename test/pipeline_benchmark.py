@@ -0,0 +1,330 @@
+"""End-to-end rights-confirmation pipeline benchmark with per-stage timings
+
+Each image goes through the same flow as FixedDCTWatermark.embedWatermark
+followed by verifyOwnership:
+
+1. hash     - SHA-256 image hash and keccak256 dataHash of the file (chunked)
+2. register - registerDataResource on the ownership contract, waiting for the receipt
+3. embed    - embed the watermark carrying the dataId/txHash and write the output image
+4. verify   - extract the watermark from the output and check the on-chain owner
+
+In pipelined mode every stage runs in its own worker thread(s), connected by
+bounded queues, so image N+1 is hashed while image N is registering. The
+sequential mode runs each image through all stages before starting the next
+and serves as the baseline. By default a per-run salt is mixed into every
+dataHash, so both modes, and repeated runs against the same chain, register
+new resources. The report has, per stage, the latency, busy
+time, utilization and throughput, plus the end-to-end throughput. The stage
+with the highest busy time per worker limits ingest.
+
+Usage:
+    python pipeline_benchmark.py --input ../tif ../dataset --mode both
+    python pipeline_benchmark.py --input ../tif --stage-workers embed=2 verify=2
+"""
+import argparse
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+
+import pandas as pd
+from PIL import Image
+from web3 import Web3
+
+import dct_watermark
+from contract_events import DATA_REGISTERED_TOPIC
+
+STAGES = ("hash", "register", "embed", "verify")
+QUEUE_SIZE = 4
+
+
+class PipelineContext:
+    """Chain handles and settings shared by the stage functions"""
+
+    def __init__(self, output_dir, n_accounts=10, salt=None):
+        import performance_test as pt
+        self.w3 = pt.w3
+        self.ownership = pt.ownership_contract
+        self.accounts = pt.w3.eth.accounts[:n_accounts]
+        self.output_dir = output_dir
+        self.salt = salt
+
+
+# =============================================================================
+# Stages
+# =============================================================================
+
+def stage_hash(ctx, item):
+    image_hash, data_hash = dct_watermark.hash_file(item["Image"])
+    if ctx.salt:
+        # Repeated runs against one chain would otherwise find every image registered
+        data_hash = Web3.to_hex(Web3.keccak(hexstr=data_hash[2:] + ctx.salt))
+    with Image.open(item["Image"]) as image:
+        item["Size"] = f"{image.width}x{image.height}"
+    item.update({"Image_Hash": image_hash, "Data_Hash": data_hash})
+
+
+def stage_register(ctx, item):
+    owner = item["Owner"]
+    if ctx.ownership.functions.isDataRegistered(item["Data_Hash"]).call():
+        # Same as embedWatermark: reuse the existing registration
+        item.update({
+            "Data_Id": Web3.to_hex(ctx.ownership.functions.getDataResourceByHash(item["Data_Hash"]).call()[5]),
+            "Tx_Hash": "already_registered",
+            "Already_Registered": True
+        })
+        return
+
+    metadata = json.dumps({
+        "path": item["Image"],
+        "size": item["Size"],
+        "format": "tif",
+        "timestamp": int(time.time() * 1000),
+        "owner": owner,
+        "imageHash": item["Image_Hash"][:16]
+    })
+    watermark_features = json.dumps({
+        "algorithm": "DCT", "blockSize": dct_watermark.BLOCK_SIZE, "alpha": dct_watermark.ALPHA
+    })
+    tx_hash = ctx.ownership.functions.registerDataResource(
+        item["Data_Hash"], metadata, watermark_features
+    ).transact({"from": owner, "gas": 5000000})
+    receipt = ctx.w3.eth.wait_for_transaction_receipt(tx_hash)
+    if receipt["status"] != 1:
+        raise RuntimeError(f"registerDataResource reverted in {Web3.to_hex(tx_hash)}")
+    event = next(log for log in receipt["logs"] if Web3.to_hex(log["topics"][0]) == DATA_REGISTERED_TOPIC)
+    item.update({
+        "Data_Id": Web3.to_hex(event["topics"][1]),
+        "Tx_Hash": Web3.to_hex(tx_hash),
+        "Gas_Used": receipt["gasUsed"],
+        "Already_Registered": False
+    })
+
+
+def stage_embed(ctx, item):
+    name, ext = os.path.splitext(os.path.basename(item["Image"]))
+    output_path = os.path.join(ctx.output_dir, f"{name}_{item['Index']}_registered{ext}")
+    # The hash stage already read the file; embed_watermark would hash it a second time
+    watermark_info = dct_watermark.generate_watermark_info(item["Owner"], item["Image_Hash"], {
+        "registered": True,
+        "dataId": item["Data_Id"],
+        "txHash": item["Tx_Hash"],
+        "dataHash": item["Data_Hash"]
+    })
+    bits = dct_watermark.encode_watermark_bits(watermark_info["encoded_string"])
+    watermarked, embedded_bits = dct_watermark.embed_bits(dct_watermark.load_pixels(item["Image"]), bits)
+    if embedded_bits != len(bits):
+        raise RuntimeError(f"only {embedded_bits}/{len(bits)} bits embedded")
+    dct_watermark.save_pixels(watermarked, output_path, source_path=item["Image"])
+    item["Output"] = output_path
+
+
+def stage_verify(ctx, item):
+    extracted = dct_watermark.extract_watermark(item["Output"])
+    if not extracted["success"]:
+        raise RuntimeError(f"watermark extraction failed: {extracted['error']}")
+    # A damaged bitstream can still parse as JSON, but to a number, a string or a list
+    data = extracted["data"] if isinstance(extracted["data"], dict) else {}
+    blockchain_data = data.get("bc") if isinstance(data.get("bc"), dict) else {}
+    data_hash = blockchain_data.get("dataHash", "")
+    if not (isinstance(data_hash, str) and data_hash.startswith("0x") and len(data_hash) == 66):
+        raise RuntimeError("watermark carries no dataHash")
+    owner = item["Owner"]
+    # DataResource: (dataHash, metadata, watermarkFeatures, owner, registrationTime, dataId, isRegistered)
+    resource = ctx.ownership.functions.getDataResourceByHash(data_hash).call()
+    item["Verified"] = str(data.get("o", "")).lower() == owner[2:10].lower() and resource[3] == owner
+
+
+STAGE_FUNCTIONS = {
+    "hash": stage_hash,
+    "register": stage_register,
+    "embed": stage_embed,
+    "verify": stage_verify
+}
+
+
+def _run_stage(ctx, stage, item):
+    """Run one stage on an item, recording its start/end time and any error"""
+    item[f"{stage}_start"] = time.perf_counter()
+    try:
+        if not item.get("Error"):
+            STAGE_FUNCTIONS[stage](ctx, item)
+    except Exception as e:
+        item["Error"] = f"{stage}: {e}"
+    item[f"{stage}_end"] = time.perf_counter()
+
+
+# =============================================================================
+# Execution modes
+# =============================================================================
+
+def _make_items(image_paths, ctx):
+    return [
+        {"Index": i, "Image": path, "Owner": ctx.accounts[i % len(ctx.accounts)], "Error": ""}
+        for i, path in enumerate(image_paths)
+    ]
+
+
+def run_sequential(ctx, image_paths):
+    items = _make_items(image_paths, ctx)
+    for item in items:
+        for stage in STAGES:
+            _run_stage(ctx, stage, item)
+    return items
+
+
+def run_pipelined(ctx, image_paths, stage_workers=None):
+    """Run the stages concurrently, each with its own worker threads and input queue"""
+    stage_workers = {stage: 1 for stage in STAGES} | (stage_workers or {})
+    queues = [queue.Queue(maxsize=QUEUE_SIZE) for _ in STAGES] + [queue.Queue()]
+    done = object()
+
+    def worker(index, stage):
+        inbox, outbox = queues[index], queues[index + 1]
+        while True:
+            item = inbox.get()
+            if item is done:
+                # Pass the sentinel back for sibling workers, the last one forwards it
+                inbox.put(done)
+                break
+            _run_stage(ctx, stage, item)
+            outbox.put(item)
+
+    items = _make_items(image_paths, ctx)
+    stage_threads = []
+    for index, stage in enumerate(STAGES):
+        threads = [threading.Thread(target=worker, args=(index, stage), daemon=True)
+                   for _ in range(stage_workers[stage])]
+        for thread in threads:
+            thread.start()
+        stage_threads.append(threads)
+
+    for item in items:
+        queues[0].put(item)
+    queues[0].put(done)
+    for index, threads in enumerate(stage_threads):
+        for thread in threads:
+            thread.join()
+        queues[index + 1].put(done)
+    return items
+
+
+# =============================================================================
+# Reporting
+# =============================================================================
+
+def summarize(items, mode, wall_time, stage_workers=None):
+    """Return (per-item DataFrame, per-stage DataFrame) for one run"""
+    stage_workers = {stage: 1 for stage in STAGES} | (stage_workers or {})
+    df = pd.DataFrame(items)
+    df["Mode"] = mode
+    for stage in STAGES:
+        df[f"{stage.capitalize()}_(ms)"] = (df[f"{stage}_end"] - df[f"{stage}_start"]) * 1000
+    run_start = df["hash_start"].min()
+    df["End_To_End_(ms)"] = (df["verify_end"] - df["hash_start"]) * 1000
+    df["Completed_At_(s)"] = df["verify_end"] - run_start
+
+    ok = df[df["Error"] == ""]
+    rows = []
+    for stage in STAGES:
+        latencies = ok[f"{stage.capitalize()}_(ms)"]
+        busy = latencies.sum() / 1000
+        workers = stage_workers[stage] if mode == "pipelined" else 1
+        rows.append({
+            "Mode": mode,
+            "Stage": stage,
+            "Workers": workers,
+            "Items": len(ok),
+            "Mean_Latency_(ms)": latencies.mean(),
+            "P95_Latency_(ms)": latencies.quantile(0.95),
+            "Busy_(s)": busy,
+            "Utilization": busy / (wall_time * workers) if wall_time > 0 else 0,
+            "Stage_Throughput_(img/s)": len(ok) * workers / busy if busy > 0 else 0
+        })
+    rows.append({
+        "Mode": mode,
+        "Stage": "total",
+        "Workers": sum(stage_workers.values()) if mode == "pipelined" else 1,
+        "Items": len(ok),
+        "Mean_Latency_(ms)": ok["End_To_End_(ms)"].mean(),
+        "P95_Latency_(ms)": ok["End_To_End_(ms)"].quantile(0.95),
+        "Busy_(s)": wall_time,
+        "Utilization": None,
+        "Stage_Throughput_(img/s)": len(ok) / wall_time if wall_time > 0 else 0
+    })
+    stages = pd.DataFrame(rows)
+    per_stage = stages[stages["Stage"] != "total"]
+    bottleneck = per_stage.loc[per_stage["Stage_Throughput_(img/s)"].idxmin(), "Stage"] if len(ok) else None
+    stages["Bottleneck"] = stages["Stage"] == bottleneck
+
+    drop = [f"{stage}_{edge}" for stage in STAGES for edge in ("start", "end")]
+    return df.drop(columns=drop), stages
+
+
+def run_pipeline_benchmark(inputs, mode="both", stage_workers=None, output_dir=None,
+                           n_accounts=10, salt=True):
+    """Benchmark the rights-confirmation flow over the images in inputs"""
+    image_paths = [path for target in inputs for path in dct_watermark.list_images(target)]
+    if not image_paths:
+        raise ValueError(f"No images found in {inputs}")
+    modes = ("sequential", "pipelined") if mode == "both" else (mode,)
+
+    item_frames, stage_frames = [], []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for run_mode in modes:
+            # A fresh salt per run keeps the registrations of both modes comparable
+            ctx = PipelineContext(output_dir or tmp_dir, n_accounts, uuid.uuid4().hex if salt else None)
+            print(f"\nRunning {run_mode} pipeline over {len(image_paths)} images...")
+            start = time.perf_counter()
+            if run_mode == "sequential":
+                items = run_sequential(ctx, image_paths)
+            else:
+                items = run_pipelined(ctx, image_paths, stage_workers)
+            wall_time = time.perf_counter() - start
+
+            item_df, stage_df = summarize(items, run_mode, wall_time, stage_workers)
+            item_frames.append(item_df)
+            stage_frames.append(stage_df)
+            failed = item_df[item_df["Error"] != ""]
+            print(f"{run_mode}: {len(items) - len(failed)}/{len(items)} images in {wall_time:.2f}s "
+                  f"({(len(items) - len(failed)) / wall_time:.2f} img/s), "
+                  f"bottleneck: {stage_df.loc[stage_df['Bottleneck'], 'Stage'].tolist()}")
+            for error in failed["Error"].head(5):
+                print(f"  error: {error}")
+
+    return pd.concat(item_frames, ignore_index=True), pd.concat(stage_frames, ignore_index=True)
+
+
+def parse_stage_workers(values):
+    """Parse ['embed=2', 'verify=2'] into {'embed': 2, 'verify': 2}"""
+    stage_workers = {}
+    for value in values or []:
+        stage, _, count = value.partition("=")
+        if stage not in STAGES or not count.isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(f"Invalid stage worker spec '{value}', expected e.g. embed=2")
+        stage_workers[stage] = int(count)
+    return stage_workers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end rights-confirmation pipeline benchmark")
+    parser.add_argument("--input", nargs="+", default=["../tif", "../dataset"], help="Image files or directories")
+    parser.add_argument("--mode", choices=("sequential", "pipelined", "both"), default="both")
+    parser.add_argument("--stage-workers", nargs="*", default=[], help="Worker threads per stage, e.g. embed=2")
+    parser.add_argument("--accounts", type=int, default=10, help="Number of owner accounts used round-robin")
+    parser.add_argument("--plain-hashes", action="store_true",
+                        help="Register the plain file dataHashes instead of salting them per run")
+    parser.add_argument("--output-dir", default=None, help="Keep watermarked images here (default: temporary)")
+    args = parser.parse_args()
+
+    items_df, stages_df = run_pipeline_benchmark(
+        args.input, args.mode, parse_stage_workers(args.stage_workers),
+        args.output_dir, args.accounts, salt=not args.plain_hashes
+    )
+    items_df.to_csv("pipeline_benchmark_items.csv", index=False)
+    stages_df.to_csv("pipeline_benchmark_stages.csv", index=False)
+    print("\n" + stages_df.round(3).to_string(index=False))
+    print("\nResults saved to 'pipeline_benchmark_items.csv' and 'pipeline_benchmark_stages.csv'")
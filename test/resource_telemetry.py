@@ -0,0 +1,207 @@
+"""Client and node resource telemetry sampled during benchmark runs
+
+A TPS number alone does not say whether the Python harness or the Ganache
+process was CPU-bound, swapping, or running out of sockets or file
+descriptors. ResourceSampler runs a background thread that samples, at a
+fixed interval, for both the harness process and the node process:
+
+* CPU utilization (percent of one core, so a saturated single-threaded
+  process shows ~100)
+* resident set size
+* thread count
+* open inet sockets and file descriptors
+
+It also samples system-wide CPU and swap usage. The node process is found
+by the port of the JSON-RPC endpoint, or can be given by PID. Samples are
+tagged with the benchmark step that was running. step() returns per-step
+aggregates to merge into a result row, and attribute_limit() names the
+resource that most likely capped the step's throughput.
+
+Usage:
+    python performance_test.py --telemetry --telemetry-interval 0.2
+    python resource_telemetry.py --pid 12345 --duration 30
+"""
+import argparse
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import psutil
+
+PROCESS_ROLES = ("Client", "Node")
+# A process above this share of one core is treated as CPU-bound
+CPU_SATURATION = 90.0
+# Fraction of the file descriptor limit treated as exhausted
+FD_PRESSURE = 0.9
+# Swap growth during a step, in MB, treated as memory pressure rather than page-out noise
+SWAP_GROWTH_MB = 64.0
+
+try:
+    import resource
+    FD_LIMIT = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+except ImportError:  # Windows
+    FD_LIMIT = None
+
+
+def find_listening_process(port):
+    """Return the process listening on a local TCP port, or None"""
+    try:
+        connections = psutil.net_connections(kind="tcp")
+    except psutil.AccessDenied:
+        return None
+    for conn in connections:
+        if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port and conn.pid:
+            return psutil.Process(conn.pid)
+    return None
+
+
+def find_node_process(w3):
+    """Return the process serving the HTTP endpoint of a web3 instance, if it runs locally"""
+    endpoint = urlparse(getattr(w3.provider, "endpoint_uri", "") or "")
+    if endpoint.hostname not in ("localhost", "127.0.0.1", "::1") or endpoint.port is None:
+        return None
+    return find_listening_process(endpoint.port)
+
+
+def _process_sample(process):
+    """One measurement of a process, with NaN for values the OS does not expose"""
+    try:
+        with process.oneshot():
+            sample = {
+                "CPU_(%)": process.cpu_percent(interval=None),
+                "RSS_(MB)": process.memory_info().rss / 2**20,
+                "Threads": process.num_threads()
+            }
+            try:
+                sample["Sockets"] = len(process.net_connections(kind="inet"))
+            except psutil.AccessDenied:
+                sample["Sockets"] = np.nan
+            sample["FDs"] = process.num_fds() if hasattr(process, "num_fds") else process.num_handles()
+            return sample
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return {"CPU_(%)": np.nan, "RSS_(MB)": np.nan, "Threads": np.nan, "Sockets": np.nan, "FDs": np.nan}
+
+
+class ResourceSampler:
+    """Background sampler of harness and node resource usage, tagged by benchmark step"""
+
+    def __init__(self, node_process=None, interval=0.2):
+        self.processes = {"Client": psutil.Process(os.getpid()), "Node": node_process}
+        self.interval = interval
+        self.samples = []
+        self._label = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """Record one sample of both processes and the system"""
+        row = {"Time": time.time(), "Step": self._label,
+               "System_CPU_(%)": psutil.cpu_percent(interval=None),
+               "System_Swap_Used_(MB)": psutil.swap_memory().used / 2**20}
+        for role, process in self.processes.items():
+            if process is None:
+                continue
+            for key, value in _process_sample(process).items():
+                row[f"{role}_{key}"] = value
+        self.samples.append(row)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        # cpu_percent measures since the previous call, so prime every counter first
+        psutil.cpu_percent(interval=None)
+        for process in self.processes.values():
+            if process is not None:
+                _process_sample(process)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @contextmanager
+    def step(self, label):
+        """Tag samples with label while the block runs; yields a dict filled with the step summary"""
+        fields = {}
+        self._label = label
+        first = len(self.samples)
+        self.sample()
+        try:
+            yield fields
+        finally:
+            self.sample()
+            self._label = None
+            fields.update(self.summarize(self.samples[first:]))
+
+    def summarize(self, samples):
+        """Mean/max aggregates of a list of samples, as result row fields"""
+        df = pd.DataFrame(samples)
+        fields = {"Telemetry_Samples": len(df)}
+        for role, process in self.processes.items():
+            if process is None or f"{role}_CPU_(%)" not in df:
+                continue
+            fields[f"{role}_CPU_Mean_(%)"] = df[f"{role}_CPU_(%)"].mean()
+            fields[f"{role}_CPU_Max_(%)"] = df[f"{role}_CPU_(%)"].max()
+            fields[f"{role}_RSS_Max_(MB)"] = df[f"{role}_RSS_(MB)"].max()
+            fields[f"{role}_Threads_Max"] = df[f"{role}_Threads"].max()
+            fields[f"{role}_Sockets_Max"] = df[f"{role}_Sockets"].max()
+            fields[f"{role}_FDs_Max"] = df[f"{role}_FDs"].max()
+        fields["System_CPU_Mean_(%)"] = df["System_CPU_(%)"].mean()
+        fields["System_Swap_Growth_(MB)"] = df["System_Swap_Used_(MB)"].iloc[-1] - df["System_Swap_Used_(MB)"].iloc[0]
+        fields["Resource_Limit"] = attribute_limit(fields)
+        return fields
+
+    def samples_frame(self):
+        return pd.DataFrame(self.samples)
+
+
+def attribute_limit(fields):
+    """Name the resource that most likely capped a step, from its summary fields"""
+    if fields.get("System_Swap_Growth_(MB)", 0) >= SWAP_GROWTH_MB:
+        return "swap"
+    for role in PROCESS_ROLES:
+        fds = fields.get(f"{role}_FDs_Max")
+        if FD_LIMIT and fds is not None and fds >= FD_PRESSURE * FD_LIMIT:
+            return f"{role.lower()} file descriptors"
+    for role in ("Node", "Client"):
+        if fields.get(f"{role}_CPU_Mean_(%)", 0) >= CPU_SATURATION:
+            return f"{role.lower()} CPU"
+    if fields.get("System_CPU_Mean_(%)", 0) >= CPU_SATURATION:
+        return "system CPU"
+    return "latency"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sample the resource usage of a node process")
+    parser.add_argument("--pid", type=int, default=None, help="Node process ID (default: process on --port)")
+    parser.add_argument("--port", type=int, default=8545, help="JSON-RPC port of the node")
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between samples")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to sample")
+    args = parser.parse_args()
+
+    node = psutil.Process(args.pid) if args.pid else find_listening_process(args.port)
+    if node is None:
+        print(f"No process found listening on port {args.port}")
+    sampler = ResourceSampler(node, args.interval)
+    with sampler, sampler.step("idle") as summary:
+        time.sleep(args.duration)
+    sampler.samples_frame().to_csv("resource_telemetry_samples.csv", index=False)
+    for key, value in summary.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
@@ -0,0 +1,137 @@
+const { expect } = require('chai');
+const {
+  PRICE,
+  deployContracts,
+  registerData,
+  grantRight,
+  createProduct,
+  listProduct,
+  sellProduct,
+  expectRevert,
+  increaseTime
+} = require('./helpers/contractFixtures');
+
+contract('权利检查点测试', (accounts) => {
+  const [alice, bob, carol, dave] = accounts;
+  const ONE_DAY = 86400;
+  const MAX_UINT64 = '18446744073709551615';
+
+  let ownership;
+  let auth;
+  let trading;
+
+  beforeEach(async () => {
+    ({ ownership, auth, trading } = await deployContracts());
+  });
+
+  it('普通购买不写检查点，每次都完整验证权利链', async () => {
+    const dataId = await registerData(ownership, alice);
+    const authId = await grantRight(auth, dataId, alice, bob, ONE_DAY);
+    const productId = await createProduct(trading, dataId, bob);
+
+    await sellProduct(trading, productId, bob, carol);
+    expect((await trading.rightsCheckpoints(productId)).validUntil.toString()).to.equal('0');
+
+    await auth.revokeAuthorization(authId, { from: alice });
+    await listProduct(trading, productId, carol);
+    await expectRevert(
+      trading.purchaseProduct(productId, { from: dave, value: PRICE }),
+      'Invalid rights chain'
+    );
+  });
+
+  it('所有权转让后检查点失效，其他数据的转让不影响', async () => {
+    const dataId = await registerData(ownership, alice);
+    const otherDataId = await registerData(ownership, alice);
+    const productId = await createProduct(trading, dataId, alice);
+
+    await sellCheckpointed(productId, alice, carol);
+    const checkpoint = await trading.rightsCheckpoints(productId);
+    expect(checkpoint.validUntil.toString()).to.equal(MAX_UINT64);
+
+    // 纪元按 dataId 计数，转让另一份数据不会使该产品的检查点失效
+    await ownership.transferOwnership(otherDataId, dave, { from: alice });
+    expect((await ownership.rightsEpoch(otherDataId)).toString()).to.equal('1');
+    expect((await ownership.rightsEpoch(dataId)).toString()).to.equal('0');
+    await sellCheckpointed(productId, carol, dave);
+
+    // 创作者转让原始数据后失去权利，检查点必须被拒绝
+    await ownership.transferOwnership(dataId, bob, { from: alice });
+    expect((await ownership.rightsEpoch(dataId)).toString()).to.equal('1');
+
+    await listProduct(trading, productId, dave);
+    await expectRevert(
+      trading.purchaseProductCheckpointed(productId, { from: carol, value: PRICE }),
+      'Invalid rights chain'
+    );
+    expect(await trading.verifyRightsChain(productId)).to.equal(false);
+  });
+
+  it('撤销授权后检查点失效', async () => {
+    const dataId = await registerData(ownership, alice);
+    const authId = await grantRight(auth, dataId, alice, bob, ONE_DAY);
+    const productId = await createProduct(trading, dataId, bob);
+
+    await sellCheckpointed(productId, bob, carol);
+    const [grant, checkpoint] = await Promise.all([
+      auth.authorizations(authId),
+      trading.rightsCheckpoints(productId)
+    ]);
+    expect(checkpoint.validUntil.toString()).to.equal(grant.expirationTime.toString());
+
+    await auth.revokeAuthorization(authId, { from: alice });
+    expect((await auth.rightsEpoch(dataId)).toString()).to.equal('1');
+
+    await listProduct(trading, productId, carol);
+    await expectRevert(
+      trading.purchaseProductCheckpointed(productId, { from: dave, value: PRICE }),
+      'Invalid rights chain'
+    );
+  });
+
+  it('授权到期后检查点失效，重新授权后恢复', async () => {
+    const dataId = await registerData(ownership, alice);
+    await grantRight(auth, dataId, alice, bob, ONE_DAY);
+    const productId = await createProduct(trading, dataId, bob);
+
+    await sellCheckpointed(productId, bob, carol);
+
+    // 到期不改变任何纪元，仅靠 validUntil 拒绝检查点
+    await increaseTime(2 * ONE_DAY);
+    expect((await ownership.rightsEpoch(dataId)).toString()).to.equal('0');
+    expect((await auth.rightsEpoch(dataId)).toString()).to.equal('0');
+
+    await listProduct(trading, productId, carol);
+    await expectRevert(
+      trading.purchaseProductCheckpointed(productId, { from: dave, value: PRICE }),
+      'Invalid rights chain'
+    );
+
+    await grantRight(auth, dataId, alice, bob, ONE_DAY);
+    await trading.purchaseProductCheckpointed(productId, { from: dave, value: PRICE });
+    expect((await trading.dataProducts(productId)).currentOwner).to.equal(dave);
+  });
+
+  it('衍生链中任一环节失去权利时购买被拒绝', async () => {
+    const dataId = await registerData(ownership, alice);
+    const authId = await grantRight(auth, dataId, alice, bob, ONE_DAY);
+    const link = await createProduct(trading, dataId, bob);
+    const productId = await createProduct(trading, dataId, alice, [link]);
+
+    await sellCheckpointed(productId, alice, carol);
+    expect((await trading.rightsCheckpoints(link)).validUntil.toString()).to.not.equal('0');
+
+    await auth.revokeAuthorization(authId, { from: alice });
+
+    await listProduct(trading, productId, carol);
+    await expectRevert(
+      trading.purchaseProductCheckpointed(productId, { from: dave, value: PRICE }),
+      'Invalid rights chain'
+    );
+  });
+
+  async function sellCheckpointed(productId, seller, buyer) {
+    await listProduct(trading, productId, seller);
+    return trading.purchaseProductCheckpointed(productId, { from: buyer, value: PRICE });
+  }
+});
@@ -0,0 +1,287 @@
+"""Batched settlement of product sales versus inline seller payouts
+
+purchaseProduct pays the seller inside every buyer's transaction
+(seller.transfer) and stores a Transaction record, indexed per buyer, seller
+and product. purchaseProductDeferred makes the same ownership change but
+only credits the price to pendingProceeds[seller]. It stores no record:
+its ProductSold event is the only trace of the sale. Sellers collect their
+accumulated proceeds with withdrawProceeds, or anyone pays out a list of
+sellers in one transaction with settleProceeds(address[]). Both pay with a
+plain call, so contract-wallet sellers work too: withdrawProceeds forwards
+all gas, settleProceeds a bounded SETTLE_PAYOUT_GAS per seller. A seller
+whose payout fails keeps its balance for withdrawProceeds and does not block
+the rest of the batch.
+
+SettlementDriver follows the ProductSold events of deferred purchases,
+tracks which sellers hold unpaid proceeds, and pays them out with
+settleProceeds in batches of batch_size sellers. Payouts run either every
+settle_every sales or once when settle() is called.
+
+The benchmark runs a many-buyers/many-sellers workload in both modes. Each
+seller registers a data resource and lists products, and in every round
+each buyer buys one product, with the round's purchases in flight together.
+For each mode it reports purchase TPS, gas per sale and the transaction
+records stored on-chain. In deferred mode the gas of the settlement
+transactions is amortized over the sales, end-to-end TPS includes the time
+spent settling, and Purchase_Gas_Saved_per_Sale is the purchase gas saved
+relative to inline mode.
+
+Usage:
+    python settlement.py --sales 400 --sellers 4 --buyers 4 --batch-size 50
+    python settlement.py --sales 400 --settle-every 100
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from web3 import Web3
+
+from contract_events import PROCEEDS_WITHDRAWN_TOPIC, PRODUCT_CREATED_TOPIC, PRODUCT_LISTED_TOPIC, PRODUCT_SOLD_TOPIC
+from workload_model import GAS_LIMITS, FailureLog, transact_checked
+
+SETTLEMENT_MODES = ("inline", "deferred")
+PURCHASE_FUNCTIONS = {"inline": "purchaseProduct", "deferred": "purchaseProductDeferred"}
+DEFAULT_BATCH_SIZE = 50
+PRICE = 1000000000000000
+# settleProceeds: fixed overhead, plus per seller the SETTLE_PAYOUT_GAS (50000) forwarded to its
+# wallet and the storage reset, value call and event, or the balance restore when the payout fails
+SETTLE_BASE_GAS = 50000
+SETTLE_GAS_PER_SELLER = 100000
+RECEIPT_TIMEOUT = 300
+
+
+# =============================================================================
+# Settlement driver
+# =============================================================================
+
+class SettlementDriver:
+    """Tracks sellers credited by deferred sales and pays them out with batched settleProceeds calls"""
+
+    def __init__(self, w3, trading, operator, batch_size=DEFAULT_BATCH_SIZE, settle_every=None, failure_log=None):
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+        self.w3 = w3
+        self.trading = trading
+        self.operator = operator
+        self.batch_size = batch_size
+        self.settle_every = settle_every
+        self.failure_log = failure_log or FailureLog()
+        # seller -> [credited wei, sales] since its last payout, in order of first credit
+        self.pending = {}
+        self.pending_sales = 0
+        self.paid = 0
+        self.receipts = []
+
+    def observe(self, receipt):
+        """Record the sellers credited by the ProductSold events of a deferred purchase receipt"""
+        for log in receipt["logs"]:
+            if log["topics"] and Web3.to_hex(log["topics"][0]) == PRODUCT_SOLD_TOPIC:
+                seller = Web3.to_checksum_address(bytes(log["topics"][2])[-20:])
+                credit = self.pending.setdefault(seller, [0, 0])
+                credit[0] += int.from_bytes(bytes(log["data"])[:32], "big")
+                credit[1] += 1
+                self.pending_sales += 1
+
+    @property
+    def due(self):
+        return self.settle_every is not None and self.pending_sales >= self.settle_every
+
+    def _settle_batch(self, sellers):
+        receipt = transact_checked(self.w3, self.trading.functions.settleProceeds(sellers), {
+            "from": self.operator, "gas": SETTLE_BASE_GAS + SETTLE_GAS_PER_SELLER * len(sellers)
+        }, "Trading_SettleProceeds", self.failure_log, RECEIPT_TIMEOUT)
+        if receipt is None:
+            return None
+        for log in receipt["logs"]:
+            if log["topics"] and Web3.to_hex(log["topics"][0]) == PROCEEDS_WITHDRAWN_TOPIC:
+                seller = Web3.to_checksum_address(bytes(log["topics"][1])[-20:])
+                amount, sales = self.pending.pop(seller, (0, 0))
+                self.pending_sales -= sales
+                self.paid += amount
+        return receipt
+
+    def settle(self):
+        """Pay out every pending seller, batch_size sellers per transaction; return the receipts
+
+        Sellers whose payout failed stay pending and are retried on the next call.
+        """
+        sellers = list(self.pending)
+        receipts = []
+        for start in range(0, len(sellers), self.batch_size):
+            receipt = self._settle_batch(sellers[start:start + self.batch_size])
+            if receipt is not None:
+                receipts.append(receipt)
+        self.receipts.extend(receipts)
+        return receipts
+
+    def maybe_settle(self):
+        """settle() once settle_every sales are pending"""
+        return self.settle() if self.due else []
+
+
+# =============================================================================
+# Marketplace workload
+# =============================================================================
+
+def send_round(w3, calls, operation, failure_log):
+    """Submit one transaction per (function, params) without waiting, then collect the successful receipts"""
+    tx_hashes = []
+    for function, params in calls:
+        try:
+            tx_hashes.append(function.transact({**params, "gas": GAS_LIMITS[operation]}))
+        except Exception as e:
+            failure_log.record(operation, e)
+    receipts = []
+    for tx_hash in tx_hashes:
+        try:
+            receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=RECEIPT_TIMEOUT)
+        except Exception as e:
+            failure_log.record(operation, e)
+            continue
+        if receipt["status"] == 1:
+            receipts.append(receipt)
+        else:
+            failure_log.record(operation, kind="revert", reason="reverted in round", gas_used=receipt["gasUsed"])
+    return receipts
+
+
+def _event_ids(receipts, topic):
+    return [bytes(log["topics"][1]) for receipt in receipts for log in receipt["logs"]
+            if log["topics"] and Web3.to_hex(log["topics"][0]) == topic]
+
+
+def register_sources(w3, ownership, sellers, failure_log):
+    """Register one data resource per seller and return {seller: dataId}"""
+    hashes = {seller: Web3.keccak(text=f"settlement-source-{seller}-{time.time_ns()}") for seller in sellers}
+    send_round(w3, [(ownership.functions.registerDataResource(data_hash, "Settlement benchmark source", "sales"),
+                     {"from": seller}) for seller, data_hash in hashes.items()], "Ownership_Register", failure_log)
+    return {seller: ownership.functions.getDataResourceByHash(data_hash).call()[5]
+            for seller, data_hash in hashes.items()}
+
+
+def stock_products(w3, trading, sources, per_seller, failure_log):
+    """Create and list per_seller products for every seller; return (seller, productId) interleaved by seller"""
+    stock = {seller: [] for seller in sources}
+    for i in range(per_seller):
+        receipts = send_round(w3, [(trading.functions.createDataProduct(
+            data_id, f"Settlement benchmark product {i}-{time.time_ns()}", []
+        ), {"from": seller}) for seller, data_id in sources.items()], "Trading_CreateProduct", failure_log)
+        created = [(receipt["from"], product_id)
+                   for receipt in receipts for product_id in _event_ids([receipt], PRODUCT_CREATED_TOPIC)]
+        listed = send_round(w3, [(trading.functions.listProductForSale(product_id, PRICE), {"from": seller})
+                                 for seller, product_id in created], "Trading_ListProduct", failure_log)
+        listed_ids = set(_event_ids(listed, PRODUCT_LISTED_TOPIC))
+        for seller, product_id in created:
+            if product_id in listed_ids:
+                stock[seller].append((seller, product_id))
+    return [item for group in zip(*stock.values()) for item in group]
+
+
+def run_sales(w3, trading, mode, products, buyers, failure_log, driver=None):
+    """Buy every product, one purchase per buyer per round; return (receipts, purchase seconds, settle seconds)"""
+    purchase = getattr(trading.functions, PURCHASE_FUNCTIONS[mode])
+    receipts = []
+    purchase_s = settle_s = 0.0
+    for start in range(0, len(products), len(buyers)):
+        batch = products[start:start + len(buyers)]
+        round_start = time.perf_counter()
+        round_receipts = send_round(w3, [(purchase(product_id), {"from": buyer, "value": PRICE})
+                                         for buyer, (_, product_id) in zip(buyers, batch)],
+                                    "Trading_PurchaseProduct", failure_log)
+        purchase_s += time.perf_counter() - round_start
+        receipts.extend(round_receipts)
+        if driver is not None:
+            for receipt in round_receipts:
+                driver.observe(receipt)
+            settle_start = time.perf_counter()
+            driver.maybe_settle()
+            settle_s += time.perf_counter() - settle_start
+    if driver is not None:
+        settle_start = time.perf_counter()
+        driver.settle()
+        settle_s += time.perf_counter() - settle_start
+    return receipts, purchase_s, settle_s
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+def run_settlement_benchmark(w3, ownership, trading, accounts, sales=400, n_sellers=4, n_buyers=4,
+                             batch_size=DEFAULT_BATCH_SIZE, settle_every=None):
+    """Purchase TPS and gas per sale of inline payouts and deferred, batch-settled payouts"""
+    if len(accounts) < n_sellers + n_buyers + 1:
+        raise ValueError(f"{n_sellers} sellers, {n_buyers} buyers and an operator need "
+                         f"{n_sellers + n_buyers + 1} accounts, got {len(accounts)}")
+    sellers = accounts[:n_sellers]
+    buyers = accounts[n_sellers:n_sellers + n_buyers]
+    operator = accounts[n_sellers + n_buyers]
+    failure_log = FailureLog()
+    sources = register_sources(w3, ownership, sellers, failure_log)
+
+    rows = []
+    for mode in SETTLEMENT_MODES:
+        print(f"{mode} settlement: stocking {sales} products from {n_sellers} sellers")
+        products = stock_products(w3, trading, sources, -(-sales // n_sellers), failure_log)[:sales]
+        driver = SettlementDriver(w3, trading, operator, batch_size, settle_every, failure_log) \
+            if mode == "deferred" else None
+
+        print(f"{mode} settlement: {len(products)} purchases by {n_buyers} buyers")
+        receipts, purchase_s, settle_s = run_sales(w3, trading, mode, products, buyers, failure_log, driver)
+        successful = len(receipts)
+        purchase_gas = np.mean([receipt["gasUsed"] for receipt in receipts]) if receipts else np.nan
+        settle_receipts = driver.receipts if driver else []
+        settle_gas = sum(receipt["gasUsed"] for receipt in settle_receipts)
+        unsettled = sum(trading.functions.pendingProceeds(seller).call() for seller in sellers) \
+            if mode == "deferred" else 0
+        stored = sum(trading.functions.getProductTransactionHistoryPage(product_id, 0, 0).call()[1]
+                     for _, product_id in products)
+
+        rows.append({
+            "Mode": mode,
+            "Sales": len(products),
+            "Sellers": n_sellers,
+            "Buyers": n_buyers,
+            "Successful": successful,
+            "Purchase_TPS": successful / purchase_s if purchase_s > 0 else np.nan,
+            "Purchase_Gas_per_Sale": purchase_gas,
+            "Stored_Records": stored,
+            "Settlement_Transactions": len(settle_receipts),
+            "Settlement_Gas_per_Sale": settle_gas / successful if successful else np.nan,
+            "Total_Gas_per_Sale": purchase_gas + (settle_gas / successful if successful else 0),
+            "End_to_End_TPS": successful / (purchase_s + settle_s) if purchase_s + settle_s > 0 else np.nan,
+            "Settle_Batch_Size": batch_size if mode == "deferred" else np.nan,
+            "Settle_Every": settle_every if mode == "deferred" and settle_every else np.nan,
+            "Unsettled_(wei)": unsettled,
+            "Settlement_Failures": failure_log.take("Trading_SettleProceeds")["Failed_Operations"],
+            **failure_log.take("Trading_PurchaseProduct")
+        })
+        row = rows[-1]
+        print(f"  {row['Purchase_TPS']:.2f} purchases/s, {row['Purchase_Gas_per_Sale']:.0f} gas per purchase, "
+              f"{row['Total_Gas_per_Sale']:.0f} gas per sale with settlement, {stored} records stored")
+
+    inline, deferred = rows
+    deferred["Purchase_Gas_Saved_per_Sale"] = inline["Purchase_Gas_per_Sale"] - deferred["Purchase_Gas_per_Sale"]
+    print(f"Deferred purchases use {deferred['Purchase_Gas_Saved_per_Sale']:.0f} gas less per sale than inline ones")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import performance_test as pt
+
+    parser = argparse.ArgumentParser(description="Benchmark inline seller payouts against batched settlement")
+    parser.add_argument("--sales", type=int, default=400, help="Purchases per settlement mode")
+    parser.add_argument("--sellers", type=int, default=4, help="Selling accounts")
+    parser.add_argument("--buyers", type=int, default=4, help="Buying accounts, one purchase each per round")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Sellers paid out per settleProceeds transaction")
+    parser.add_argument("--settle-every", type=int, default=None,
+                        help="Settle after this many deferred sales (default: once after all sales)")
+    args = parser.parse_args()
+
+    results = run_settlement_benchmark(pt.w3, pt.ownership_contract, pt.product_trading_contract,
+                                       pt.w3.eth.accounts, args.sales, args.sellers, args.buyers,
+                                       args.batch_size, args.settle_every)
+    results.to_csv("settlement_benchmark.csv", index=False)
+    print(results.round(2).to_string(index=False))
@@ -0,0 +1,157 @@
+const { expect } = require('chai');
+const {
+  PRICE,
+  deployContracts,
+  eventArgs,
+  registerData,
+  createProduct,
+  listProduct,
+  expectRevert
+} = require('./helpers/contractFixtures');
+
+contract('延迟结算测试', (accounts) => {
+  const [alice, bob, buyer, operator] = accounts;
+  const SellerWalletMock = artifacts.require('SellerWalletMock');
+  const ReceiveMode = { Accept: 0, Reject: 1, Expensive: 2 };
+  const ZERO_ADDRESS = '0x' + '0'.repeat(40);
+
+  let ownership;
+  let trading;
+  let rejectingWallet;
+  let expensiveWallet;
+
+  beforeEach(async () => {
+    ({ ownership, trading } = await deployContracts());
+    rejectingWallet = await SellerWalletMock.new();
+    await rejectingWallet.setReceiveMode(ReceiveMode.Reject);
+    expensiveWallet = await SellerWalletMock.new();
+    await expensiveWallet.setReceiveMode(ReceiveMode.Expensive);
+  });
+
+  it('延迟购买只记入待结算余额并触发事件，不写交易记录', async () => {
+    const sold = eventArgs(await deferredSale(alice), 'ProductSold');
+    expect(sold.seller).to.equal(alice);
+    expect(sold.buyer).to.equal(buyer);
+    expect(await pending(alice)).to.equal(PRICE);
+
+    // 所有权和产品列表照常更新
+    expect((await trading.dataProducts(sold.productId)).currentOwner).to.equal(buyer);
+    const owned = await trading.getUserProducts(buyer);
+    expect(owned.map((product) => product.productId)).to.deep.equal([sold.productId]);
+
+    expect((await trading.getProductTransactionHistoryPage(sold.productId, 0, 10)).total.toString()).to.equal('0');
+    expect((await trading.getUserTransactionsPage(buyer, 0, 10)).total.toString()).to.equal('0');
+    expect((await trading.getUserTransactionsPage(alice, 0, 10)).total.toString()).to.equal('0');
+    expect((await trading.transactions(sold.transactionId)).buyer).to.equal(ZERO_ADDRESS);
+  });
+
+  it('拒收转账的合约卖家提现失败但余额保留', async () => {
+    await walletDeferredSale(rejectingWallet);
+
+    await expectRevert(walletWithdraw(rejectingWallet), 'Withdrawal failed');
+    expect(await pending(rejectingWallet.address)).to.equal(PRICE);
+
+    // 批量结算跳过失败的卖家，不回滚整个交易
+    const receipt = await trading.settleProceeds([rejectingWallet.address], { from: operator });
+    expect(receipt.logs.filter((log) => log.event === 'ProceedsWithdrawn')).to.have.length(0);
+    expect(await pending(rejectingWallet.address)).to.equal(PRICE);
+
+    await rejectingWallet.setReceiveMode(ReceiveMode.Accept);
+    await walletWithdraw(rejectingWallet);
+    expect(await pending(rejectingWallet.address)).to.equal('0');
+    expect(await web3.eth.getBalance(rejectingWallet.address)).to.equal(PRICE);
+  });
+
+  it('接收逻辑超过 2300 gas 的合约卖家可以结算和提现', async () => {
+    expect((await trading.SETTLE_PAYOUT_GAS()).toNumber()).to.be.greaterThan(2300);
+
+    await walletDeferredSale(expensiveWallet);
+    const receipt = await trading.settleProceeds([expensiveWallet.address], { from: operator });
+    expect(eventArgs(receipt, 'ProceedsWithdrawn').seller).to.equal(expensiveWallet.address);
+    expect((await expensiveWallet.totalReceived()).toString()).to.equal(PRICE);
+
+    await walletDeferredSale(expensiveWallet);
+    await walletWithdraw(expensiveWallet);
+    expect(await pending(expensiveWallet.address)).to.equal('0');
+    expect((await expensiveWallet.totalReceived()).toString()).to.equal(times(PRICE, 2));
+  });
+
+  it('余额为零时再次提现被拒绝', async () => {
+    await deferredSale(alice);
+
+    const receipt = await trading.withdrawProceeds({ from: alice });
+    expect(eventArgs(receipt, 'ProceedsWithdrawn').amount.toString()).to.equal(PRICE);
+    expect(await pending(alice)).to.equal('0');
+
+    await expectRevert(trading.withdrawProceeds({ from: alice }), 'No proceeds to withdraw');
+    await expectRevert(trading.withdrawProceeds({ from: bob }), 'No proceeds to withdraw');
+  });
+
+  it('混合批量结算只支付能收款的卖家', async () => {
+    await deferredSale(alice);
+    await deferredSale(alice);
+    await walletDeferredSale(rejectingWallet);
+    await walletDeferredSale(expensiveWallet);
+    const aliceBefore = web3.utils.toBN(await web3.eth.getBalance(alice));
+
+    // bob 没有余额，alice 重复出现，第二次时余额已为零
+    const receipt = await trading.settleProceeds(
+      [alice, rejectingWallet.address, bob, expensiveWallet.address, alice],
+      { from: operator }
+    );
+
+    const paid = receipt.logs
+      .filter((log) => log.event === 'ProceedsWithdrawn')
+      .map((log) => [log.args.seller, log.args.amount.toString()]);
+    expect(paid).to.deep.equal([[alice, times(PRICE, 2)], [expensiveWallet.address, PRICE]]);
+
+    expect(await pending(alice)).to.equal('0');
+    expect(await pending(rejectingWallet.address)).to.equal(PRICE);
+    expect(await pending(expensiveWallet.address)).to.equal('0');
+    expect(await pending(bob)).to.equal('0');
+
+    const aliceAfter = web3.utils.toBN(await web3.eth.getBalance(alice));
+    expect(aliceAfter.sub(aliceBefore).toString()).to.equal(times(PRICE, 2));
+    expect(await web3.eth.getBalance(trading.address)).to.equal(PRICE);
+  });
+
+  function times(amount, factor) {
+    return web3.utils.toBN(amount).muln(factor).toString();
+  }
+
+  async function pending(seller) {
+    return (await trading.pendingProceeds(seller)).toString();
+  }
+
+  async function deferredSale(seller) {
+    const dataId = await registerData(ownership, seller);
+    const productId = await createProduct(trading, dataId, seller);
+    await listProduct(trading, productId, seller);
+    return trading.purchaseProductDeferred(productId, { from: buyer, value: PRICE });
+  }
+
+  // 合约钱包通过 execute 以自身地址注册数据、创建并上架产品
+  async function walletDeferredSale(wallet) {
+    const dataHash = web3.utils.randomHex(32);
+    await wallet.execute(
+      ownership.address,
+      ownership.contract.methods.registerDataResource(dataHash, 'wallet metadata', 'wallet features').encodeABI()
+    );
+    const dataId = await ownership.getDataIdByHash(dataHash);
+    await wallet.execute(
+      trading.address,
+      trading.contract.methods.createDataProduct(dataId, `wallet product ${web3.utils.randomHex(8)}`, []).encodeABI()
+    );
+    const products = await trading.getUserProducts(wallet.address);
+    const productId = products[products.length - 1].productId;
+    await wallet.execute(
+      trading.address,
+      trading.contract.methods.listProductForSale(productId, PRICE).encodeABI()
+    );
+    return trading.purchaseProductDeferred(productId, { from: buyer, value: PRICE });
+  }
+
+  async function walletWithdraw(wallet) {
+    return wallet.execute(trading.address, trading.contract.methods.withdrawProceeds().encodeABI());
+  }
+});
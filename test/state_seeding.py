@@ -0,0 +1,419 @@
+"""Bulk, resumable seeding of registry state for large-scale benchmarks
+
+setup_test_environment in performance_test.py registers 500 resources, one
+blocking transaction at a time. That is far too little state to show how
+the contracts behave as their storage grows. StateSeeder populates
+10^5-10^6 resources, grants and products instead:
+
+* Transactions are encoded once per function with fast_abi and sent from
+  all accounts as JSON-RPC batches. Nonces are assigned locally, so the
+  client never waits for a receipt before sending the next batch.
+  Receipts are collected in batches once ``max_in_flight`` transactions
+  are outstanding. A transaction the node rejects leaves a nonce gap, which
+  is filled with a zero-value self-transfer so the sender's later
+  transactions can still be mined. Transactions without a receipt after
+  ``receipt_timeout`` seconds without progress are counted as failed.
+* With ``pack_blocks``, automining is turned off and one block is mined
+  per batch (mining_modes.BlockProducer manual mode). Ganache then seals
+  a few large blocks instead of one block per transaction.
+* Every confirmed item is checkpointed to SQLite with its on-chain ID. The
+  item index is encoded in the metadata or purpose string. A restarted run
+  first replays the events mined since the previous run started, records
+  items that were confirmed after the last checkpoint, and skips them.
+* After seeding, the chain state is captured with ``evm_snapshot``.
+  ``--restore`` reverts a benchmark-modified chain to the seeded state. To
+  reuse the state after a node restart, run Ganache with a persistent
+  ``--database.dbPath`` and the same ``--wallet.deterministic`` accounts.
+
+Resource i is owned by accounts[i % n]. Grant j authorizes accounts[(k + 1) % n]
+on resource j % n_resources, where k is the owner's account index. Product j
+is created by the owner of resource j % n_resources. This is the same layout
+as setup_test_environment, so ``python performance_test.py --seed-state
+seed_state.sqlite`` runs the existing benchmarks against the seeded state.
+
+Usage:
+    python state_seeding.py --resources 100000 --grants 20000 --products 20000 --pack-blocks
+    python state_seeding.py --restore
+    python performance_test.py --seed-state seed_state.sqlite
+"""
+import argparse
+import json
+import re
+import sqlite3
+import time
+
+from tqdm import tqdm
+from web3 import Web3
+
+from contract_events import AUTHORIZATION_GRANTED_TOPIC, DATA_REGISTERED_TOPIC, PRODUCT_CREATED_TOPIC
+from fast_abi import FastContract
+from mining_modes import BlockProducer
+
+DEFAULT_STATE_PATH = "seed_state.sqlite"
+
+PHASES = ("resources", "grants", "products")
+PHASE_TOPICS = {
+    "resources": DATA_REGISTERED_TOPIC,
+    "grants": AUTHORIZATION_GRANTED_TOPIC,
+    "products": PRODUCT_CREATED_TOPIC
+}
+# Metadata (resources, products) or purpose (grants) strings carry the item index
+LABEL_PATTERN = re.compile(r"^seed-(resource|grant|product)-(\d+)$")
+LABEL_PHASES = {"resource": "resources", "grant": "grants", "product": "products"}
+
+GAS_LIMITS = {"resources": 300000, "grants": 400000, "products": 500000}
+# Seeded grants must outlive the snapshot they are stored in
+GRANT_DURATION = 10 * 365 * 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS items (
+    phase TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    account TEXT NOT NULL,
+    data_id TEXT,
+    PRIMARY KEY (phase, idx)
+);
+"""
+
+
+class StateSeeder:
+    """Seeds resources, grants and products in pipelined batches with a SQLite checkpoint"""
+
+    def __init__(self, w3, ownership_address, processing_address, trading_address, ownership_abi,
+                 processing_abi, trading_abi, accounts, path=DEFAULT_STATE_PATH,
+                 batch_size=200, max_in_flight=2000, pack_blocks=False, receipt_timeout=120):
+        self.w3 = w3
+        self.ownership = FastContract(w3, ownership_address, ownership_abi)
+        self.processing = FastContract(w3, processing_address, processing_abi)
+        self.trading = FastContract(w3, trading_address, trading_abi)
+        self.accounts = [Web3.to_checksum_address(a) for a in accounts]
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.receipt_timeout = receipt_timeout
+        self.producer = BlockProducer(w3, "manual" if pack_blocks else "automine", mine_every=batch_size)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.failures = 0
+        self._nonces = {}
+        self._check_contracts()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _contracts_key(self):
+        return ",".join((self.ownership.address, self.processing.address, self.trading.address))
+
+    def _check_contracts(self):
+        """Drop the checkpoint if it belongs to other contracts or to a restarted chain"""
+        stale = self._meta("contracts") not in (None, self._contracts_key())
+        start_block = self._meta("run_start_block")
+        if not stale and start_block is not None:
+            start_block = int(start_block)
+            stale = start_block > self.w3.eth.block_number or \
+                Web3.to_hex(self.w3.eth.get_block(start_block)["hash"]) != self._meta("run_start_hash")
+        if stale:
+            print("Seed checkpoint belongs to another chain or contracts, starting over")
+            with self.db:
+                self.db.execute("DELETE FROM items")
+                self.db.execute("DELETE FROM meta")
+
+    def count(self, phase):
+        return self.db.execute("SELECT COUNT(*) FROM items WHERE phase = ?", (phase,)).fetchone()[0]
+
+    def _done(self, phase):
+        return {row[0] for row in self.db.execute("SELECT idx FROM items WHERE phase = ?", (phase,))}
+
+    # -------------------------------------------------------------------------
+    # Transactions
+    # -------------------------------------------------------------------------
+
+    def _resource(self, idx):
+        row = self.db.execute("SELECT item_id, account FROM items WHERE phase = 'resources' AND idx = ?",
+                              (idx,)).fetchone()
+        if row is None:
+            raise RuntimeError(f"Resource {idx} has not been seeded")
+        return row
+
+    def _build(self, phase, idx, n_resources):
+        """Return (sender, transaction dict, data_id) for item idx of a phase"""
+        if phase == "resources":
+            sender = self.accounts[idx % len(self.accounts)]
+            data_hash = Web3.keccak(text=f"seed-resource-{idx}")
+            data = self.ownership.functions["registerDataResource"].encode(
+                data_hash, f"seed-resource-{idx}", "seed")
+            return sender, {"to": self.ownership.address, "data": data}, None
+
+        data_id, owner = self._resource(idx % n_resources)
+        if phase == "grants":
+            grantee = self.accounts[(self.accounts.index(owner) + 1) % len(self.accounts)]
+            data = self.processing.functions["grantProcessingRight"].encode(
+                bytes.fromhex(data_id[2:]), grantee, GRANT_DURATION, f"seed-grant-{idx}", "Full scope", "None")
+            return owner, {"to": self.processing.address, "data": data}, data_id
+        data = self.trading.functions["createDataProduct"].encode(
+            bytes.fromhex(data_id[2:]), f"seed-product-{idx}", [])
+        return owner, {"to": self.trading.address, "data": data}, data_id
+
+    def _next_nonce(self, sender):
+        if sender not in self._nonces:
+            self._nonces[sender] = self.w3.eth.get_transaction_count(sender, "pending")
+        nonce = self._nonces[sender]
+        self._nonces[sender] += 1
+        return nonce
+
+    def _batch(self, requests):
+        make_batch_request = getattr(self.w3.provider, "make_batch_request", None)
+        if make_batch_request is None:
+            return [self.w3.provider.make_request(method, params) for method, params in requests]
+        responses = make_batch_request(requests)
+        if isinstance(responses, dict):
+            raise RuntimeError(f"Batch request failed: {responses.get('error')}")
+        return responses
+
+    def _send(self, phase, indices, n_resources, in_flight):
+        """Send one batch and add the accepted transactions to in_flight"""
+        built = [(idx, *self._build(phase, idx, n_resources)) for idx in indices]
+        requests, nonces = [], []
+        for idx, sender, tx, _ in built:
+            nonces.append(self._next_nonce(sender))
+            tx = {**tx, "from": sender, "gas": hex(GAS_LIMITS[phase]), "nonce": hex(nonces[-1])}
+            requests.append(("eth_sendTransaction", [tx]))
+        retry, gaps = [], []
+        for (idx, sender, _, data_id), nonce, response in zip(built, nonces, self._batch(requests)):
+            if "error" in response:
+                if "nonce" in str(response["error"]).lower():
+                    # The local nonce is stale, so resynchronize the sender and send the item again
+                    self._nonces.pop(sender, None)
+                    retry.append(idx)
+                else:
+                    # The sender's later transactions of this batch are queued behind the unused nonce
+                    self.failures += 1
+                    gaps.append((sender, nonce))
+                continue
+            in_flight[response["result"]] = (idx, sender, data_id)
+        self._fill_gaps(gaps)
+        self.producer.on_submitted(len(indices) + len(gaps))
+        return retry
+
+    def _fill_gaps(self, gaps):
+        """Use each (sender, nonce) gap for a zero-value self-transfer, releasing the transactions behind it"""
+        if not gaps:
+            return
+        requests = [("eth_sendTransaction", [{"from": sender, "to": sender, "value": "0x0", "gas": hex(21000),
+                                               "nonce": hex(nonce)}]) for sender, nonce in gaps]
+        for (sender, _), response in zip(gaps, self._batch(requests)):
+            if "error" in response:
+                # The gap stays open; _confirm gives up on the queued transactions after receipt_timeout
+                self._nonces.pop(sender, None)
+
+    def _confirm(self, phase, in_flight, wait=False, poll_interval=0.05):
+        """Collect receipts of in-flight transactions and checkpoint the confirmed items"""
+        deadline = time.time() + self.receipt_timeout
+        while in_flight:
+            pending = len(in_flight)
+            hashes = list(in_flight)
+            rows = []
+            for start in range(0, len(hashes), self.batch_size):
+                chunk = hashes[start:start + self.batch_size]
+                responses = self._batch([("eth_getTransactionReceipt", [tx_hash]) for tx_hash in chunk])
+                for tx_hash, response in zip(chunk, responses):
+                    receipt = response.get("result")
+                    if not receipt:
+                        continue
+                    idx, sender, data_id = in_flight.pop(tx_hash)
+                    log = next((l for l in receipt["logs"] if l["topics"][0] == PHASE_TOPICS[phase]), None)
+                    status = receipt["status"]
+                    if (int(status, 16) if isinstance(status, str) else status) != 1 or log is None:
+                        self.failures += 1
+                        continue
+                    rows.append((phase, idx, log["topics"][1], sender, data_id))
+            with self.db:
+                self.db.executemany("INSERT OR IGNORE INTO items VALUES (?, ?, ?, ?, ?)", rows)
+            if not wait or not in_flight:
+                return
+            if len(in_flight) < pending:
+                deadline = time.time() + self.receipt_timeout
+            elif time.time() >= deadline:
+                # Nothing was mined for receipt_timeout seconds; the rest would never confirm
+                print(f"  {len(in_flight)} {phase} transactions got no receipt within {self.receipt_timeout}s")
+                self.failures += len(in_flight)
+                for _, sender, _ in in_flight.values():
+                    self._nonces.pop(sender, None)
+                in_flight.clear()
+                return
+            self.producer.flush()
+            time.sleep(poll_interval)
+
+    def _run_phase(self, phase, count, n_resources):
+        done = self._done(phase)
+        todo = [idx for idx in range(count) if idx not in done]
+        if not todo:
+            return
+        in_flight = {}
+        with tqdm(total=len(todo), desc=f"Seeding {phase}") as progress:
+            position = 0
+            while position < len(todo):
+                batch = todo[position:position + self.batch_size]
+                position += len(batch)
+                todo.extend(self._send(phase, batch, n_resources, in_flight))
+                progress.update(len(batch))
+                if len(in_flight) >= self.max_in_flight:
+                    self._confirm(phase, in_flight, wait=True)
+            self._confirm(phase, in_flight, wait=True)
+
+    # -------------------------------------------------------------------------
+    # Resume
+    # -------------------------------------------------------------------------
+
+    def recover(self, chunk_size=5000):
+        """Record seeded items mined after the last checkpoint of an interrupted run"""
+        from_block = self._meta("run_start_block")
+        if from_block is None:
+            return 0
+        head = self.w3.eth.block_number
+        recovered = 0
+        addresses = [self.ownership.address, self.processing.address, self.trading.address]
+        for start in range(int(from_block), head + 1, chunk_size):
+            logs = self.w3.eth.get_logs({
+                "fromBlock": start, "toBlock": min(start + chunk_size - 1, head), "address": addresses,
+                "topics": [list(PHASE_TOPICS.values())]
+            })
+            rows = [row for row in (self._recover_log(log) for log in logs) if row is not None]
+            with self.db:
+                recovered += sum(self.db.execute("INSERT OR IGNORE INTO items VALUES (?, ?, ?, ?, ?)",
+                                                 row).rowcount for row in rows)
+        return recovered
+
+    def _recover_log(self, log):
+        topics = log["topics"]
+        topic = Web3.to_hex(topics[0])
+        if topic == DATA_REGISTERED_TOPIC:
+            _, label, _ = self.w3.codec.decode(["bytes32", "string", "uint256"], bytes(log["data"]))
+            account, data_id = Web3.to_checksum_address(bytes(topics[2])[-20:]), None
+        elif topic == AUTHORIZATION_GRANTED_TOPIC:
+            _, label, _ = self.w3.codec.decode(["address", "string", "uint256"], bytes(log["data"]))
+            account, data_id = Web3.to_checksum_address(bytes(topics[3])[-20:]), Web3.to_hex(topics[2])
+        else:
+            label, _ = self.w3.codec.decode(["string", "uint256"], bytes(log["data"]))
+            account, data_id = Web3.to_checksum_address(bytes(topics[3])[-20:]), Web3.to_hex(topics[2])
+        match = LABEL_PATTERN.match(label)
+        if match is None:
+            return None
+        return LABEL_PHASES[match.group(1)], int(match.group(2)), Web3.to_hex(topics[1]), account, data_id
+
+    # -------------------------------------------------------------------------
+    # Seeding and snapshots
+    # -------------------------------------------------------------------------
+
+    def seed(self, n_resources, n_grants=0, n_products=0):
+        """Seed up to the requested counts, resuming from the checkpoint; return the elapsed seconds"""
+        recovered = self.recover()
+        if recovered:
+            print(f"Recovered {recovered} items confirmed after the last checkpoint")
+        head = self.w3.eth.block_number
+        with self.db:
+            self._set_meta("contracts", self._contracts_key())
+            self._set_meta("run_start_block", head)
+            self._set_meta("run_start_hash", Web3.to_hex(self.w3.eth.get_block(head)["hash"]))
+            self._set_meta("n_resources", n_resources)
+
+        start = time.time()
+        with self.producer:
+            for phase, count in zip(PHASES, (n_resources, n_grants, n_products)):
+                phase_start = time.time()
+                before = self.count(phase)
+                self._run_phase(phase, count, n_resources)
+                seeded = self.count(phase) - before
+                elapsed = time.time() - phase_start
+                if seeded:
+                    print(f"  {phase}: {seeded} seeded in {elapsed:.1f}s ({seeded / elapsed:.1f} tx/s)")
+        if self.failures:
+            print(f"  {self.failures} transactions failed and were not checkpointed")
+        return time.time() - start
+
+    def _rpc(self, method, params=()):
+        response = self.w3.provider.make_request(method, list(params))
+        if "error" in response:
+            raise RuntimeError(f"{method} failed: {response['error']}")
+        return response["result"]
+
+    def snapshot(self):
+        """Snapshot the seeded chain state and remember the snapshot ID"""
+        snapshot_id = self._rpc("evm_snapshot")
+        with self.db:
+            # JSON keeps the ID type the node returned (hex string on Ganache)
+            self._set_meta("snapshot_id", json.dumps(snapshot_id))
+        return snapshot_id
+
+    def restore(self):
+        """Revert the chain to the seeded snapshot and take a new one (Ganache consumes reverted snapshots)"""
+        snapshot_id = self._meta("snapshot_id")
+        # Ganache answers false for unknown snapshots
+        if snapshot_id is None or self._rpc("evm_revert", [json.loads(snapshot_id)]) is False:
+            raise RuntimeError("No usable snapshot of the seeded state; seed again")
+        return self.snapshot()
+
+
+def load_seeded_state(path=DEFAULT_STATE_PATH):
+    """Return the seeded accounts and IDs in the layout of performance_test's globals"""
+    db = sqlite3.connect(path)
+    try:
+        def ids(phase):
+            return [bytes.fromhex(item_id[2:]) for (item_id,) in db.execute(
+                "SELECT item_id FROM items WHERE phase = ? ORDER BY idx", (phase,))]
+
+        accounts = [account for (account,) in db.execute(
+            "SELECT account FROM items WHERE phase = 'resources' ORDER BY idx")]
+        n_accounts = len(set(accounts))
+        return {
+            "test_accounts": accounts[:n_accounts],
+            "registered_data_ids": ids("resources"),
+            "authorization_ids": ids("grants"),
+            "product_ids": ids("products")
+        }
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import performance_test as pt
+
+    parser = argparse.ArgumentParser(description="Seed large registry state for benchmarks")
+    parser.add_argument("--resources", type=int, default=100000, help="Data resources to register")
+    parser.add_argument("--grants", type=int, default=20000, help="Processing-right grants to create")
+    parser.add_argument("--products", type=int, default=20000, help="Data products to create")
+    parser.add_argument("--accounts", type=int, default=None, help="Sending accounts (default: all node accounts)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Transactions per JSON-RPC batch")
+    parser.add_argument("--max-in-flight", type=int, default=2000, help="Unconfirmed transactions before waiting")
+    parser.add_argument("--pack-blocks", action="store_true", help="Disable automining and mine one block per batch")
+    parser.add_argument("--receipt-timeout", type=float, default=120,
+                        help="Seconds without a new receipt before unconfirmed transactions count as failed")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="Checkpoint database")
+    parser.add_argument("--restore", action="store_true", help="Revert the chain to the seeded snapshot")
+    args = parser.parse_args()
+
+    accounts = pt.w3.eth.accounts[:args.accounts] if args.accounts else pt.w3.eth.accounts
+    with StateSeeder(pt.w3, pt.OWNERSHIP_CONTRACT_ADDRESS, pt.PROCESSING_RIGHT_CONTRACT_ADDRESS,
+                     pt.PRODUCT_TRADING_CONTRACT_ADDRESS, pt.ownership_abi, pt.processing_right_abi,
+                     pt.product_trading_abi, accounts, args.state, args.batch_size, args.max_in_flight,
+                     args.pack_blocks, args.receipt_timeout) as seeder:
+        if args.restore:
+            print(f"Restored seeded state, new snapshot {seeder.restore()}")
+        else:
+            elapsed = seeder.seed(args.resources, args.grants, args.products)
+            print(f"Seeded state in {elapsed:.1f}s: " + ", ".join(f"{seeder.count(p)} {p}" for p in PHASES))
+            print(f"Snapshot {seeder.snapshot()} saved to '{args.state}'")
@@ -0,0 +1,159 @@
+"""Per-operation span recording and Chrome trace-event export
+
+The result CSVs aggregate every test into a few numbers, which hides
+queueing, stalls and periodic hiccups such as block production, garbage
+collection pauses or tqdm redraws. SpanRecorder keeps one span per
+operation: name, account, intended start, actual start, end and outcome.
+Spans are appended as plain tuples to an in-memory list, and nothing is
+formatted until the run ends. export_chrome_trace() then writes them in
+the Chrome trace-event JSON format. The file opens in chrome://tracing,
+Perfetto (ui.perfetto.dev) or speedscope, without a connection to the node.
+
+The intended start is when the harness meant to issue the operation. By
+default this is the end of the previous operation on the same lane, since
+the harness loops are closed-loop. The gap up to the actual start (key
+selection, transaction building, progress-bar redraws) is drawn as a
+separate "queued" slice. Lanes are threads, or asyncio workers when a
+lane is passed explicitly. They can be regrouped by account on export.
+Garbage collections and mined blocks are recorded as their own slices,
+and test steps as instant markers.
+
+Usage:
+    python performance_test.py --trace benchmark_trace.json
+    python ownership_service.py --load-test --trace load_test_trace.json
+"""
+import gc
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Categories whose spans are harness operations and define the next intended start
+OPERATION_CATEGORIES = ("write", "call")
+TRACE_LANES = ("thread", "account")
+
+
+class SpanRecorder:
+    """Low-overhead in-memory buffer of operation spans and markers"""
+
+    def __init__(self, process_name="benchmark"):
+        self.process_name = process_name
+        self.origin = time.perf_counter_ns()
+        self.origin_unix_time = time.time()
+        # (lane, name, category, account, intended, start, end, outcome, args)
+        self.spans = []
+        # (lane, name, category, timestamp, args)
+        self.markers = []
+        self._last_end = {}
+        self._gc_start = {}
+
+    @staticmethod
+    def _lane(lane):
+        return lane if lane is not None else threading.current_thread().name
+
+    def record(self, name, start, end, intended=None, account=None, outcome="ok", category="write", lane=None,
+               **args):
+        """Append one span; times are perf_counter_ns() values"""
+        lane = self._lane(lane)
+        if category in OPERATION_CATEGORIES:
+            if intended is None:
+                intended = self._last_end.get(lane, start)
+            self._last_end[lane] = end
+        self.spans.append((lane, name, category, account, intended if intended is not None else start,
+                           start, end, outcome, args))
+
+    @contextmanager
+    def span(self, name, account=None, intended=None, category="write", lane=None, **args):
+        """Record the with block as a span; set "outcome" in the yielded dict, other keys become args"""
+        fields = {"outcome": "ok"}
+        start = time.perf_counter_ns()
+        try:
+            yield fields
+        except BaseException:
+            fields["outcome"] = "error"
+            raise
+        finally:
+            outcome = fields.pop("outcome")
+            self.record(name, start, time.perf_counter_ns(), intended, account, outcome, category, lane,
+                        **args, **fields)
+
+    def mark(self, name, category="step", lane=None, **args):
+        """Record an instant marker, e.g. the start of a test step, and restart intended-start tracking"""
+        self.markers.append((self._lane(lane), name, category, time.perf_counter_ns(), args))
+        self._last_end.clear()
+
+    def _on_gc(self, phase, info):
+        # Collections run on the thread that triggered them
+        lane = threading.current_thread().name
+        if phase == "start":
+            self._gc_start[lane] = time.perf_counter_ns()
+            return
+        start = self._gc_start.pop(lane, None)
+        if start is not None:
+            self.spans.append((lane, f"gc gen{info['generation']}", "gc", None, start, start,
+                               time.perf_counter_ns(), "ok", {"collected": info["collected"]}))
+
+    def track_gc(self):
+        """Record every garbage collection as a span"""
+        if self._on_gc not in gc.callbacks:
+            gc.callbacks.append(self._on_gc)
+        return self
+
+    def untrack_gc(self):
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    def __len__(self):
+        return len(self.spans)
+
+    def _us(self, ns):
+        return (ns - self.origin) / 1000
+
+    def trace_events(self, lanes="thread"):
+        """Chrome trace events for the recorded spans and markers"""
+        if lanes not in TRACE_LANES:
+            raise ValueError(f"Unknown lane grouping '{lanes}', expected one of {TRACE_LANES}")
+        tids = {}
+
+        def tid(lane):
+            if lane not in tids:
+                tids[lane] = len(tids) + 1
+            return tids[lane]
+
+        events = []
+        for lane, name, category, account, intended, start, end, outcome, args in self.spans:
+            if lanes == "account" and account is not None:
+                lane = str(account)
+            thread = tid(lane)
+            if start > intended:
+                events.append({"name": f"{name} queued", "cat": "queue", "ph": "X", "pid": 1, "tid": thread,
+                               "ts": self._us(intended), "dur": (start - intended) / 1000})
+            events.append({
+                "name": name, "cat": category, "ph": "X", "pid": 1, "tid": thread,
+                "ts": self._us(start), "dur": (end - start) / 1000,
+                "args": {"account": account, "outcome": outcome,
+                         "queue_ms": (start - intended) / 1e6, **args}
+            })
+        for lane, name, category, timestamp, args in self.markers:
+            events.append({"name": name, "cat": category, "ph": "i", "s": "g", "pid": 1, "tid": tid(lane),
+                           "ts": self._us(timestamp), "args": args})
+
+        metadata = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": self.process_name}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": thread, "args": {"name": str(lane)}}
+                     for lane, thread in tids.items()]
+        return metadata + sorted(events, key=lambda event: event["ts"])
+
+    def export_chrome_trace(self, path, lanes="thread"):
+        """Write the trace as Chrome trace-event JSON and return the number of events"""
+        events = self.trace_events(lanes)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"origin_unix_time": self.origin_unix_time}}, f, separators=(",", ":"))
+        return len(events)
+
+
+def maybe_span(recorder, name, **kwargs):
+    """recorder.span(...) when tracing is enabled, otherwise a no-op context yielding a throwaway dict"""
+    if recorder is None:
+        return nullcontext({})
+    return recorder.span(name, **kwargs)
@@ -0,0 +1,472 @@
+"""State-aware workload model that only issues valid contract transactions
+
+The write tests in performance_test.py pick senders round-robin and IDs at
+random. Most transfers, revocations and listings therefore come from an
+account that is not the owner or grantor, and revert. The reverts are
+swallowed, so the reported TPS mixes useful work with the cost of failed
+calls.
+
+WorkloadModel keeps an off-chain copy of the state that decides whether a
+write is valid: the current owner of every dataId, the active grants, and
+the owner, creator and listing price of every product. It is built from the
+contract events and updated from the logs of every mined receipt. Each
+operation is planned against this state, so the sender is always the owner,
+grantor or a valid buyer. If no valid operation exists, for example when no
+product is listed, the operation is counted as skipped instead of being sent.
+
+Failures that still occur are classified as revert (with the revert reason),
+nonce, timeout, out_of_gas or error by FailureLog. Goodput (successful
+operations per second) is reported separately from the raw rate of
+submitted transactions.
+
+Usage:
+    python performance_test.py --valid-only
+    python workload_model.py --operations 100
+"""
+import argparse
+import random
+import time
+from collections import Counter, defaultdict
+
+import pandas as pd
+from tqdm import tqdm
+from web3 import Web3
+from web3.exceptions import ContractLogicError, TimeExhausted
+
+from contract_events import (AUTHORIZATION_GRANTED_TOPIC, AUTHORIZATION_REVOKED_TOPIC, DATA_REGISTERED_TOPIC,
+                             OWNERSHIP_TRANSFERRED_TOPIC, PRODUCT_CREATED_TOPIC, PRODUCT_LISTED_TOPIC, PRODUCT_SOLD_TOPIC)
+from trace_export import maybe_span
+
+FAILURE_KINDS = ("revert", "nonce", "timeout", "out_of_gas", "error")
+
+# Gas limits of the corresponding tests in performance_test.py
+GAS_LIMITS = {
+    "Ownership_Register": 300000,
+    "Ownership_Transfer": 200000,
+    "Processing_GrantRight": 400000,
+    "Processing_Revoke": 200000,
+    "Trading_CreateProduct": 500000,
+    "Trading_ListProduct": 200000,
+    # Worst case: a product's first sale to a buyer with no products or sales yet (about 410k gas)
+    "Trading_PurchaseProduct": 450000
+}
+VALID_OPERATIONS = tuple(GAS_LIMITS)
+
+GRANT_DURATION = 86400
+MIN_PRICE = 1000000000000000
+MAX_PRICE = 10000000000000000
+
+
+# =============================================================================
+# Failure classification
+# =============================================================================
+
+def classify_failure(exc):
+    """Return (kind, reason) for an exception raised by a transaction"""
+    if isinstance(exc, ContractLogicError):
+        reason = str(exc.message or exc).removeprefix("execution reverted").removeprefix(": ")
+        return "revert", reason or "no reason given"
+    if isinstance(exc, (TimeExhausted, TimeoutError)):
+        return "timeout", type(exc).__name__
+    message = str(exc)
+    lowered = message.lower()
+    if "nonce" in lowered:
+        return "nonce", message[:120]
+    if "out of gas" in lowered or "intrinsic gas" in lowered or "exceeds block gas limit" in lowered:
+        return "out_of_gas", message[:120]
+    if "revert" in lowered:
+        return "revert", message[:120]
+    if "timeout" in lowered or "timed out" in lowered:
+        return "timeout", message[:120]
+    return "error", f"{type(exc).__name__}: {message[:120]}"
+
+
+class FailureLog:
+    """Failure, skip and wasted-gas counts per operation, drained once per result row"""
+
+    def __init__(self):
+        self.kinds = defaultdict(Counter)
+        self.reasons = Counter()
+        self.skipped = Counter()
+        self.gas_wasted = Counter()
+
+    def record(self, operation, exc=None, kind=None, reason=None, gas_used=0):
+        """Record one failed operation, classifying exc unless kind is given"""
+        if kind is None:
+            kind, reason = classify_failure(exc)
+        self.kinds[operation][kind] += 1
+        self.reasons[(operation, kind, reason)] += 1
+        self.gas_wasted[operation] += gas_used
+
+    def skip(self, operation):
+        """Record an operation that was not sent because no valid one existed"""
+        self.skipped[operation] += 1
+
+    def take(self, operation):
+        """Return and reset the counts of one operation as result row fields"""
+        kinds = self.kinds.pop(operation, Counter())
+        fields = {
+            "Skipped_Operations": self.skipped.pop(operation, 0),
+            "Failed_Operations": sum(kinds.values()),
+            "Gas_Used_Failed": self.gas_wasted.pop(operation, 0)
+        }
+        for kind in FAILURE_KINDS:
+            fields[f"Failures_{kind.title()}"] = kinds.get(kind, 0)
+        return fields
+
+    def reasons_frame(self):
+        """All failure reasons recorded so far, most frequent first"""
+        rows = [{"Operation": op, "Kind": kind, "Reason": reason, "Count": count}
+                for (op, kind, reason), count in self.reasons.most_common()]
+        return pd.DataFrame(rows, columns=["Operation", "Kind", "Reason", "Count"])
+
+
+def _revert_reason(function, params, receipt):
+    """Replay a mined, reverted transaction as a call on its parent block"""
+    try:
+        function.call(params, block_identifier=receipt["blockNumber"] - 1)
+    except ContractLogicError as e:
+        return classify_failure(e)[1]
+    except Exception:
+        pass
+    return "status 0"
+
+
+def transact_checked(w3, function, params, operation, failure_log, timeout=120):
+    """Send a transaction and wait for its receipt; return the receipt, or None after logging the failure"""
+    try:
+        tx_hash = function.transact(params)
+        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+    except Exception as e:
+        failure_log.record(operation, e)
+        return None
+    if receipt["status"] != 1:
+        # Ganache 7 and eth-tester mine reverted transactions; only the receipt tells
+        failure_log.record(operation, kind="revert", reason=_revert_reason(function, params, receipt),
+                           gas_used=receipt["gasUsed"])
+        return None
+    return receipt
+
+
+# =============================================================================
+# Off-chain state
+# =============================================================================
+
+class _KeySet:
+    """Insertion-ordered set with O(1) removal, used as select_key candidates"""
+
+    def __init__(self):
+        self.keys = []
+        self._positions = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def add(self, key):
+        if key not in self._positions:
+            self._positions[key] = len(self.keys)
+            self.keys.append(key)
+
+    def discard(self, key):
+        position = self._positions.pop(key, None)
+        if position is None:
+            return
+        last = self.keys.pop()
+        if position < len(self.keys):
+            self.keys[position] = last
+            self._positions[last] = position
+
+
+def _address(topic):
+    return Web3.to_checksum_address(bytes(topic)[-20:])
+
+
+class WorkloadState:
+    """Owners, active grants and products of the three contracts, rebuilt from events"""
+
+    def __init__(self, accounts):
+        self.accounts = list(accounts)
+        self._local = set(self.accounts)
+        self.owners = {}
+        self.grants = {}
+        self.grants_by_data = defaultdict(set)
+        self.products = {}
+        # Candidate keys, restricted to state the local accounts can act on
+        self.data_ids = _KeySet()
+        self.active_grants = _KeySet()
+        self.owned_products = _KeySet()
+        self.listed_products = _KeySet()
+        self.chain_time = 0
+        self._synced_at = time.time()
+
+    def now(self):
+        """Estimated chain time, advanced with the wall clock since the last sync"""
+        return self.chain_time + (time.time() - self._synced_at)
+
+    def has_rights(self, account, data_id):
+        """Mirror of verifyOwnership || verifyAuthorization"""
+        if self.owners.get(data_id) == account:
+            return True
+        now = self.now()
+        for auth_id in self.grants_by_data.get(data_id, ()):
+            grant = self.grants[auth_id]
+            if grant["grantee"] == account and grant["expires"] > now:
+                return True
+        return False
+
+    def apply_log(self, w3, log):
+        topics = log["topics"]
+        topic = Web3.to_hex(topics[0])
+        key = bytes(topics[1])
+
+        if topic == DATA_REGISTERED_TOPIC:
+            self._set_owner(key, _address(topics[2]))
+        elif topic == OWNERSHIP_TRANSFERRED_TOPIC:
+            self._set_owner(key, _address(topics[3]))
+        elif topic == AUTHORIZATION_GRANTED_TOPIC:
+            grantee, _, expires = w3.codec.decode(["address", "string", "uint256"], bytes(log["data"]))
+            data_id = bytes(topics[2])
+            self.grants[key] = {"data_id": data_id, "grantor": _address(topics[3]),
+                                "grantee": Web3.to_checksum_address(grantee), "expires": expires}
+            self.grants_by_data[data_id].add(key)
+            if self.grants[key]["grantor"] in self._local:
+                self.active_grants.add(key)
+        elif topic == AUTHORIZATION_REVOKED_TOPIC:
+            grant = self.grants.pop(key, None)
+            if grant is not None:
+                self.grants_by_data[grant["data_id"]].discard(key)
+            self.active_grants.discard(key)
+        elif topic == PRODUCT_CREATED_TOPIC:
+            creator = _address(topics[3])
+            self.products[key] = {"data_id": bytes(topics[2]), "creator": creator, "owner": creator, "price": 0}
+            self._update_product(key)
+        elif topic == PRODUCT_LISTED_TOPIC and key in self.products:
+            (price,) = w3.codec.decode(["uint256"], bytes(log["data"]))
+            self.products[key]["price"] = price
+            self._update_product(key)
+        elif topic == PRODUCT_SOLD_TOPIC and key in self.products:
+            self.products[key].update(owner=_address(topics[3]), price=0)
+            self._update_product(key)
+
+    def _set_owner(self, data_id, owner):
+        self.owners[data_id] = owner
+        if owner in self._local:
+            self.data_ids.add(data_id)
+        else:
+            self.data_ids.discard(data_id)
+
+    def _update_product(self, product_id):
+        product = self.products[product_id]
+        if product["owner"] in self._local:
+            self.owned_products.add(product_id)
+        else:
+            self.owned_products.discard(product_id)
+        if product["price"] > 0:
+            self.listed_products.add(product_id)
+        else:
+            self.listed_products.discard(product_id)
+
+    def sync(self, w3, addresses, from_block=0, chunk_size=5000):
+        """Replay the events of the given contract addresses and return the number applied"""
+        head = w3.eth.block_number
+        logs = []
+        for start in range(from_block, head + 1, chunk_size):
+            logs.extend(w3.eth.get_logs({
+                "fromBlock": start, "toBlock": min(start + chunk_size - 1, head),
+                "address": [Web3.to_checksum_address(a) for a in addresses]
+            }))
+        for log in sorted(logs, key=lambda l: (l["blockNumber"], l["logIndex"])):
+            self.apply_log(w3, log)
+        self.chain_time = w3.eth.get_block(head)["timestamp"]
+        self._synced_at = time.time()
+        return len(logs)
+
+
+# =============================================================================
+# Valid operation planning and execution
+# =============================================================================
+
+class WorkloadModel:
+    """Plans only valid write operations against WorkloadState and sends them"""
+
+    def __init__(self, w3, ownership_contract, processing_right_contract, product_trading_contract,
+                 accounts, select_key=random.choice, failure_log=None, receipt_timeout=120, max_tries=8,
+                 span_recorder=None):
+        self.w3 = w3
+        self.ownership = ownership_contract
+        self.processing = processing_right_contract
+        self.trading = product_trading_contract
+        self.state = WorkloadState(accounts)
+        self.select_key = select_key
+        self.failure_log = failure_log if failure_log is not None else FailureLog()
+        self.receipt_timeout = receipt_timeout
+        self.max_tries = max_tries
+        self.span_recorder = span_recorder
+        self._counter = 0
+        self._planners = {
+            "Ownership_Register": self.plan_register,
+            "Ownership_Transfer": self.plan_transfer,
+            "Processing_GrantRight": self.plan_grant,
+            "Processing_Revoke": self.plan_revoke,
+            "Trading_CreateProduct": self.plan_create_product,
+            "Trading_ListProduct": self.plan_list_product,
+            "Trading_PurchaseProduct": self.plan_purchase
+        }
+
+    def sync(self):
+        """Build the off-chain state from the events of the three contracts"""
+        addresses = (self.ownership.address, self.processing.address, self.trading.address)
+        return self.state.sync(self.w3, addresses)
+
+    def _other_account(self, account):
+        others = [a for a in self.state.accounts if a != account]
+        return random.choice(others)
+
+    def _select(self, keyset, valid):
+        """Select a key satisfying valid, giving up after max_tries draws"""
+        for _ in range(self.max_tries):
+            if not keyset:
+                return None
+            key = self.select_key(keyset.keys)
+            if valid(key):
+                return key
+        return None
+
+    # Each planner returns (contract function, transaction params) or None
+
+    def plan_register(self):
+        owner = random.choice(self.state.accounts)
+        data_hash = Web3.keccak(text=f"workload-{time.time_ns()}-{random.random()}")
+        return self.ownership.functions.registerDataResource(
+            data_hash, f"Workload resource {self._counter}", "workload"), {"from": owner}
+
+    def plan_transfer(self):
+        data_id = self._select(self.state.data_ids, lambda key: True)
+        if data_id is None:
+            return None
+        owner = self.state.owners[data_id]
+        return self.ownership.functions.transferOwnership(
+            data_id, self._other_account(owner)), {"from": owner}
+
+    def plan_grant(self):
+        data_id = self._select(self.state.data_ids, lambda key: True)
+        if data_id is None:
+            return None
+        owner = self.state.owners[data_id]
+        return self.processing.functions.grantProcessingRight(
+            data_id, self._other_account(owner), GRANT_DURATION,
+            "Test purpose", "Full scope", "No constraints"), {"from": owner}
+
+    def plan_revoke(self):
+        auth_id = self._select(self.state.active_grants, lambda key: True)
+        if auth_id is None:
+            return None
+        return self.processing.functions.revokeAuthorization(
+            auth_id), {"from": self.state.grants[auth_id]["grantor"]}
+
+    def plan_create_product(self):
+        data_id = self._select(self.state.data_ids, lambda key: True)
+        if data_id is None:
+            return None
+        # A unique description keeps the productId (hash of data, metadata, time, creator) unique
+        return self.trading.functions.createDataProduct(
+            data_id, f"Workload product {self._counter}-{time.time_ns()}", []
+        ), {"from": self.state.owners[data_id]}
+
+    def plan_list_product(self):
+        product_id = self._select(self.state.owned_products, lambda key: True)
+        if product_id is None:
+            return None
+        return self.trading.functions.listProductForSale(
+            product_id, random.randint(MIN_PRICE, MAX_PRICE)
+        ), {"from": self.state.products[product_id]["owner"]}
+
+    def plan_purchase(self):
+        def purchasable(product_id):
+            product = self.state.products[product_id]
+            # validateRightsChain: the creator must still own, or be authorized on, the source data
+            return self.state.has_rights(product["creator"], product["data_id"])
+
+        product_id = self._select(self.state.listed_products, purchasable)
+        if product_id is None:
+            return None
+        product = self.state.products[product_id]
+        return self.trading.functions.purchaseProduct(product_id), {
+            "from": self._other_account(product["owner"]), "value": product["price"]}
+
+    def execute(self, operation):
+        """Plan and send one operation; return True on success, False on failure, None if skipped"""
+        planned = time.perf_counter_ns()
+        self._counter += 1
+        plan = self._planners[operation]()
+        if plan is None:
+            self.failure_log.skip(operation)
+            if self.span_recorder is not None:
+                self.span_recorder.record(operation, planned, time.perf_counter_ns(), outcome="skipped")
+            return None
+        function, params = plan
+        with maybe_span(self.span_recorder, operation, account=params["from"]) as span:
+            receipt = transact_checked(self.w3, function, {**params, "gas": GAS_LIMITS[operation]},
+                                       operation, self.failure_log, self.receipt_timeout)
+            span["outcome"] = "ok" if receipt is not None else "failed"
+        if receipt is None:
+            return False
+        for log in receipt["logs"]:
+            self.state.apply_log(self.w3, log)
+        return True
+
+    def run(self, operation, n_operations):
+        """Run n_operations valid operations; return (goodput, duration, successful_ops, avg_latency)"""
+        start_time = time.time()
+        successful_ops = 0
+        for _ in tqdm(range(n_operations), desc=f"{operation} (valid only)"):
+            if self.execute(operation):
+                successful_ops += 1
+
+        duration = time.time() - start_time
+        tps = successful_ops / duration if duration > 0 else 0
+        avg_latency = (duration / successful_ops * 1000) if successful_ops > 0 else 0
+        return tps, duration, successful_ops, avg_latency
+
+    def test_function(self, operation):
+        """Adapter with the signature of the performance_test.py test functions"""
+        return lambda n_operations: self.run(operation, n_operations)
+
+
+def throughput_fields(requested, successful_ops, duration, failures):
+    """Raw TPS over sent transactions and goodput over successful ones"""
+    attempted = requested - failures["Skipped_Operations"]
+    return {
+        "Attempted_Operations": attempted,
+        "Raw_TPS": attempted / duration if duration > 0 else 0,
+        "Goodput_TPS": successful_ops / duration if duration > 0 else 0
+    }
+
+
+if __name__ == "__main__":
+    import performance_test as pt
+
+    parser = argparse.ArgumentParser(description="Run every write operation with valid-only transactions")
+    parser.add_argument("--operations", type=int, default=100, help="Operations per write function")
+    parser.add_argument("--accounts", type=int, default=10, help="Number of test accounts")
+    args = parser.parse_args()
+
+    model = WorkloadModel(pt.w3, pt.ownership_contract, pt.processing_right_contract,
+                          pt.product_trading_contract, pt.w3.eth.accounts[:args.accounts])
+    print(f"Replayed {model.sync()} events")
+    rows = []
+    for operation in VALID_OPERATIONS:
+        tps, duration, successful_ops, avg_latency = model.run(operation, args.operations)
+        failures = model.failure_log.take(operation)
+        rows.append({"Operation": operation, "Requested_Operations": args.operations,
+                     "Successful_Operations": successful_ops, "Total_Duration_(s)": duration,
+                     "Avg_Latency_per_Op_(ms)": avg_latency,
+                     **throughput_fields(args.operations, successful_ops, duration, failures), **failures})
+    df = pd.DataFrame(rows)
+    df.to_csv("valid_workload_results.csv", index=False)
+    model.failure_log.reasons_frame().to_csv("valid_workload_failures.csv", index=False)
+    print(df[["Operation", "Successful_Operations", "Skipped_Operations", "Failed_Operations",
+              "Raw_TPS", "Goodput_TPS"]].round(2).to_string(index=False))